@@ -7,6 +7,7 @@
 # License:      wxWindows license
 #----------------------------------------------------------------------------
 # Change log:
+# 2026/10/19  CPC   Added CompletionIndex. AutoCompleteHelper no longer scans every possible value.
 # 2021/09/07  CPC   Removed LongEditor and changed refernces to FloatEditor. Longs are depricated in Python 3.x. 
 # 2009/06/09  JPP   All cell editors start life 0 sized to prevent flickering
 # 2008/05/26  JPP   Fixed pyLint annoyances
@@ -48,6 +49,7 @@ Editor Registry
 __author__ = "Phillip Piper"
 __date__ = "3 May 2008"
 
+import bisect
 import datetime
 import wx
 
@@ -515,18 +517,23 @@ class TimeEditor(BaseCellTextEditor):
 # Auto complete controls
 
 
-def MakeAutoCompleteTextBox(olv, columnIndex, maxObjectsToConsider=10000):
+def MakeAutoCompleteTextBox(olv, columnIndex, maxObjectsToConsider=10000, completionIndex=None):
     """
-    Return a TextCtrl that lets the user choose from all existing values in this column.
-    Do not call for large lists
+    Return a TextCtrl that lets the user choose from all existing values in this column,
+    or from the values in the given CompletionIndex.
+    Without a completionIndex, do not call for large lists
     """
+    tb = BaseCellTextEditor(olv, columnIndex)
+    if completionIndex is not None:
+        AutoCompleteHelper(tb, completionIndex=completionIndex)
+        return tb
+
     col = olv.columns[columnIndex]
     # THINK: We could make this time based, i.e. it escapes after 1 second.
     maxObjectsToConsider = min(maxObjectsToConsider, olv.GetItemCount())
     options = set(
         col.GetStringValue(olv.GetObjectAt(i))
         for i in range(maxObjectsToConsider))
-    tb = BaseCellTextEditor(olv, columnIndex)
     AutoCompleteHelper(tb, list(options))
     return tb
 
@@ -553,19 +560,21 @@ class AutoCompleteHelper(object):
 
     """
     This class operates on a text control or combobox, and automatically completes the
-    text typed by the user from a list of entries in a given list.
+    text typed by the user from a list of entries in a given list, or from a
+    CompletionIndex that can be shared between editors.
 
     """
 
-    def __init__(self, control, possibleValues=None):
+    def __init__(self, control, possibleValues=None, completionIndex=None):
         self.control = control
         self.lastUserEnteredString = self.control.GetValue()
         self.control.Bind(wx.EVT_TEXT, self._OnTextEvent)
-        if isinstance(self.control, wx.ComboBox):
-            self.possibleValues = self.control.GetStrings()
+        if completionIndex is not None:
+            self.completionIndex = completionIndex
+        elif isinstance(self.control, wx.ComboBox):
+            self.completionIndex = CompletionIndex(self.control.GetStrings())
         else:
-            self.possibleValues = possibleValues or []
-        self.lowerCasePossibleValues = [x.lower() for x in self.possibleValues]
+            self.completionIndex = CompletionIndex(possibleValues or [])
 
     def _OnTextEvent(self, evt):
         evt.Skip()
@@ -583,11 +592,9 @@ class AutoCompleteHelper(object):
             return
 
         self.lastUserEnteredString = evt.GetString()
-        s = evt.GetString().lower()
-        for i, x in enumerate(self.lowerCasePossibleValues):
-            if x.startswith(s):
-                self._AutocompleteWith(self.possibleValues[i])
-                break
+        completion = self.completionIndex.Complete(evt.GetString())
+        if completion is not None:
+            self._AutocompleteWith(completion)
 
     def _AutocompleteWith(self, newValue):
         """Suggest the given value by autocompleting it."""
@@ -600,3 +607,79 @@ class AutoCompleteHelper(object):
             # Seems that under linux, selecting only seems to work here if we do it
             # outside of the text event
             wx.CallAfter(self.control.SetSelection, insertIndex, len(newValue))
+
+
+class CompletionIndex(object):
+
+    """
+    A CompletionIndex holds the values that text can be completed to, and finds the
+    completions of a prefix without looking at every value.
+
+    The values are kept sorted without regard to case, so the values that start with a
+    prefix are next to each other and are found by binary search. Values can be added
+    and removed as they are edited. A value that is added more than once must be removed
+    as many times before it stops being a completion.
+    """
+
+    def __init__(self, values=()):
+        self.counts = dict()
+        for x in values:
+            if x:
+                self.counts[x] = self.counts.get(x, 0) + 1
+        self.keys = sorted((x.lower(), x) for x in self.counts)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, value):
+        return value in self.counts
+
+    def Add(self, value):
+        """
+        Add the given value to those that text can be completed to
+        """
+        if not value:
+            return
+        count = self.counts.get(value, 0)
+        self.counts[value] = count + 1
+        if not count:
+            bisect.insort(self.keys, (value.lower(), value))
+
+    def Remove(self, value):
+        """
+        Remove the given value from those that text can be completed to
+        """
+        count = self.counts.get(value, 0)
+        if count > 1:
+            self.counts[value] = count - 1
+        elif count:
+            del self.counts[value]
+            del self.keys[bisect.bisect_left(self.keys, (value.lower(), value))]
+
+    def Replace(self, oldValue, newValue):
+        """
+        Replace one value with another, e.g. when a value has been edited
+        """
+        self.Remove(oldValue)
+        self.Add(newValue)
+
+    def Complete(self, prefix):
+        """
+        Return the first value (ignoring case) that starts with the given prefix, or None
+        """
+        completions = self.GetCompletions(prefix, 1)
+        return completions[0] if completions else None
+
+    def GetCompletions(self, prefix, maxCompletions=None):
+        """
+        Return the values that start with the given prefix, ignoring case, in order
+        """
+        prefix = prefix.lower()
+        i = bisect.bisect_left(self.keys, (prefix,))
+        completions = list()
+        while i < len(self.keys) and self.keys[i][0].startswith(prefix):
+            if maxCompletions is not None and len(completions) == maxCompletions:
+                break
+            completions.append(self.keys[i][1])
+            i += 1
+        return completions
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections.abc
+
+import numpy as np
+import wx
+
+from .ObjectListView import AbstractVirtualObjectListView
+from .search_index import SearchIndex, next_hit
+
+
+class DataFrameRow(collections.abc.Mapping):
+    """A read-only view of one row of a DataFrameListView, mapping column names to the values of the row. Rows are
+    only made when they are asked for, e.g. for the selected rows, and two rows are equal if they are at the same
+    position of the same data."""
+    __slots__ = ('columns', 'position')
+
+    def __init__(self, columns, position):
+        self.columns = columns
+        self.position = position
+
+    def __getitem__(self, name):
+        return self.columns[name][self.position]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __eq__(self, other):
+        return isinstance(other, DataFrameRow) and other.columns is self.columns and other.position == self.position
+
+    def __hash__(self):
+        return hash((id(self.columns), self.position))
+
+    def __repr__(self):
+        return f'DataFrameRow({self.position}, {dict(self)})'
+
+
+class DataFrameListView(AbstractVirtualObjectListView):
+    """
+    A virtual ObjectListView whose model is a pandas DataFrame, or a dict of equal length NumPy arrays, rather than
+    a list of model objects.
+
+    Rows are addressed by their position in the model. The list keeps the positions of the rows it shows as an array
+    in display order, so sorting is an argsort of the sort column and filtering is a boolean mask over the columns.
+    No Python object is made for a row unless it is asked for by GetObjectAt() or the selection methods, which
+    return DataFrameRow views. FindNext() searches columns through a SearchIndex, so that searching does not depend
+    on the sort order or on the number of rows.
+
+    The valueGetter of every ColumnDefn must be the name of a column of the model, and the stringConverter is given
+    the values of that column. A filter is a callable that is given the dict of column arrays and returns a boolean
+    mask (or an array of the positions) of the rows to show.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.columnData = {}
+        self.rowOrder = np.arange(0)  # positions of the shown rows in display order
+        self.rowIndexes = None  # position -> row of the list, built when needed
+        self.searchIndex = SearchIndex()
+
+        AbstractVirtualObjectListView.__init__(self, *args, **kwargs)
+
+        self.SetObjectGetter(lambda index: DataFrameRow(self.columnData, int(self.rowOrder[index])))
+
+    #-------------------------------------------------------------------------
+    # Commands
+
+    def SetObjects(self, modelObjects, preserveSelection=False):
+        """
+        Set the DataFrame or dict of column arrays to be displayed by the control.
+        """
+        if preserveSelection:
+            selection = self.GetSelectedPositions()
+
+        if modelObjects is None:
+            modelObjects = {}
+
+        self.modelObjects = modelObjects
+        self.columnData = {name: np.asarray(modelObjects[name]) for name in modelObjects}
+        self.cellTextCache.Clear()
+        self.searchIndex.update(self.columnData)
+
+        self.RepopulateList()
+
+        if preserveSelection:
+            self.SelectPositions(selection)
+
+    SetValue = SetObjects
+
+    def AddObjects(self, modelObjects):
+        """
+        Rows cannot be added to the model of a DataFrameListView, give SetObjects() the new data instead.
+        """
+        pass
+
+    def RemoveObjects(self, modelObjects):
+        """
+        Rows cannot be removed from the model of a DataFrameListView, give SetObjects() the new data instead.
+        """
+        pass
+
+    def RepopulateList(self):
+        """
+        Completely rebuild the contents of the list control
+        """
+        self.lastGetObjectIndex = -1
+        self.Freeze()
+        try:
+            self._BuildInnerList()
+            wx.ListCtrl.DeleteAllItems(self)
+            self.SetItemCount(len(self.rowOrder))
+            self.RefreshObjects()
+            self.AutoSizeColumns()
+        finally:
+            self.Thaw()
+
+    def RefreshObjects(self, aList=None):
+        """
+        Refresh the given rows, or all the rows if none are given. Use this after the values in the model have been
+        changed.
+        """
+        self.lastGetObjectIndex = -1
+        self._DiscardCellText(aList)
+
+        if aList:
+            for x in aList:
+                idx = self.GetIndexOf(x)
+                if idx != -1:
+                    self.RefreshItem(idx)
+        elif self.GetItemCount():
+            self.RefreshItems(0, self.GetItemCount() - 1)
+
+    def RefreshPositions(self, positions):
+        """
+        Refresh the rows at the given positions of the model
+        """
+        self.RefreshObjects([DataFrameRow(self.columnData, int(x)) for x in positions])
+
+    def SelectPositions(self, positions, deselectOthers=True):
+        """
+        Select the rows at the given positions of the model
+        """
+        if deselectOthers:
+            self.DeselectAll()
+
+        for x in positions:
+            idx = self.GetIndexOf(x)
+            if idx != -1:
+                self.SetItemState(idx, wx.LIST_STATE_SELECTED, wx.LIST_STATE_SELECTED)
+
+    def _BuildInnerList(self):
+        """
+        Work out which rows are shown, and in which order
+        """
+        numRows = len(next(iter(self.columnData.values()))) if self.columnData else 0
+
+        if self.filter:
+            shown = np.asarray(self.filter(self.columnData))
+            positions = np.flatnonzero(shown) if shown.dtype == bool else shown.astype(np.intp)
+        else:
+            positions = np.arange(numRows)
+
+        self.rowOrder = self._SortPositions(positions)
+        self.rowIndexes = None
+
+    def _SortPositions(self, positions):
+        """
+        Return the given positions in the order of the sort column
+        """
+        sortColumn = self.GetSortColumn()
+        if sortColumn is None or not len(positions):
+            return positions
+
+        values = self.columnData[sortColumn.valueGetter][positions]
+        if values.dtype == object:  # sort on the shown text, without regard to case, as in ObjectListView
+            toText = sortColumn.ValueToString if sortColumn.stringConverter else (lambda x: '' if x is None else str(x))
+            values = np.array([toText(x).lower() for x in values.tolist()], dtype=str)
+
+        order = positions[np.argsort(values, kind='stable')]
+        return order if self.sortAscending else order[::-1]
+
+    def _SortItemsNow(self):
+        """
+        Sort the rows by our current settings, keeping the selection
+        """
+        selection = self.GetSelectedPositions()
+        self.rowOrder = self._SortPositions(self.rowOrder)
+        self.rowIndexes = None
+
+        self.SelectPositions(selection)
+        self.RefreshObjects()
+
+    def _SortObjects(self, modelObjects=None, sortColumn=None, secondarySortColumn=None):
+        """
+        The model is never sorted in place, only the order in which its rows are shown
+        """
+        pass
+
+    def _DiscardCellText(self, modelObjects=None):
+        """
+        Forget the formatted text of the given rows, or of all rows if none are given
+        """
+        if modelObjects:
+            self.cellTextCache.DiscardKeys([x.position for x in modelObjects], len(self.columns))
+        else:
+            self.cellTextCache.Clear()
+
+    #-------------------------------------------------------------------------
+    # Accessing
+
+    def GetColumnData(self, name):
+        """
+        Return the array of values of the named column of the model
+        """
+        return self.columnData[name]
+
+    def GetFilteredObjects(self):
+        """
+        Return the part of the model that is shown in the control, in display order.
+        """
+        if hasattr(self.modelObjects, 'iloc'):
+            return self.modelObjects.iloc[self.rowOrder]
+        return {name: values[self.rowOrder] for name, values in self.columnData.items()}
+
+    def GetFilteredPositions(self):
+        """
+        Return the positions in the model of the rows that are shown, in display order
+        """
+        return self.rowOrder
+
+    def GetIndexOf(self, modelObject):
+        """
+        Return the index in the list of a DataFrameRow or of a position in the model, or -1 if it is not shown
+        """
+        position = modelObject.position if isinstance(modelObject, DataFrameRow) else modelObject
+
+        try:
+            return int(self._GetRowIndexes()[position])
+        except IndexError:
+            return -1
+
+    def _GetRowIndexes(self):
+        """
+        Return an array of the index in the list of every position in the model, -1 for rows that are not shown
+        """
+        if self.rowIndexes is None:
+            numRows = len(next(iter(self.columnData.values()))) if self.columnData else 0
+            self.rowIndexes = np.full(numRows, -1, dtype=np.intp)
+            self.rowIndexes[self.rowOrder] = np.arange(len(self.rowOrder))
+
+        return self.rowIndexes
+
+    def GetSelectedPositions(self):
+        """
+        Return the positions in the model of the selected rows
+        """
+        indexes = []
+        i = self.GetNextItem(-1, wx.LIST_NEXT_ALL, wx.LIST_STATE_SELECTED)
+        while i != -1:
+            indexes.append(i)
+            i = self.GetNextItem(i, wx.LIST_NEXT_ALL, wx.LIST_STATE_SELECTED)
+
+        return self.rowOrder[indexes]
+
+    #-------------------------------------------------------------------------
+    # Searching
+
+    def FindRows(self, column, query):
+        """
+        Return the positions in the model of the rows that match query in the given column. Numeric columns match
+        a value (e.g. '15234.1', which finds 15234.1 <= x < 15234.2) or a range ('15234.1 +- 0.05'), other columns
+        match if their text contains query, ignoring case.
+        """
+        toText = column.ValueToString if column.stringConverter else None
+        return self.searchIndex.find(column.valueGetter, query, toText)
+
+    def FindNext(self, columns, query, forward=True, includeCurrent=False):
+        """
+        Select and show the next row after the focused row (or the previous one if forward is False) that matches
+        query in any of the given columns, wrapping round at the ends of the list. If includeCurrent is True, the
+        focused row is kept if it matches. Return False if no row matches.
+        """
+        if not self.columnData:
+            return False
+
+        positions = np.concatenate([self.FindRows(x, query) for x in columns])
+        indexes = self._GetRowIndexes()[positions]
+        hits = np.unique(indexes[indexes != -1])
+
+        index = next_hit(hits, max(self.GetFocusedRow(), 0), forward, includeCurrent)
+        if index == -1:
+            return False
+
+        self._SelectAndFocus(index)
+        self.EnsureVisible(index)
+        return True
+
+    def _MapModelIndexToListIndex(self, modelIndex):
+        """
+        Return the index in the list where the given model index lives
+        """
+        return modelIndex
+
+    #-------------------------------------------------------------------------
+    # Virtual list callbacks.
+
+    def OnGetItemText(self, itemIdx, colIdx):
+        """
+        Return the text that should be shown at the given cell
+        """
+        return self.cellTextCache.GetByKey(int(self.rowOrder[itemIdx]), colIdx, self._FormatCell)
+
+    def _FormatCell(self, position, colIdx):
+        """
+        Return the text of the cell at the given position of the model and column of the list
+        """
+        column = self.columns[colIdx]
+        return column.ValueToString(self.columnData[column.valueGetter][position])
+
+    def OnGetItemImage(self, itemIdx):
+        """
+        Return the image index that should be shown on the primary column of the given item
+        """
+        return self.OnGetItemColumnImage(itemIdx, 0)
+
+    def OnGetItemColumnImage(self, itemIdx, colIdx):
+        """
+        Return the image index at should be shown at the given cell
+        """
+        if not self.columns or (self.columns[colIdx].imageGetter is None and not self.columns[colIdx].HasCheckState()):
+            return -1
+        return self.GetImageAt(self.GetObjectAt(itemIdx), colIdx)
@@ -27,8 +27,19 @@ Filters almost always impose a performance penalty on the ObjectListView.
 The penalty is normally O(n) since the filter normally examines each model
 object to see if it should be included. Head() and Tail() are exceptions
 to this observation.
+
+MaskFilters avoid most of that penalty. They work on whole columns of data
+with NumPy, and remember the mask they made, so a MaskChain only recomputes
+the masks of the filters whose condition has changed. Given a dict of
+column arrays (as a DataFrameListView does) they return a boolean mask; given
+a list of model objects they return the chosen objects, making the columns
+they need from the objects once for each list.
 """
 
+import collections.abc
+
+import numpy as np
+
 
 def Predicate(predicate):
     """
@@ -137,3 +148,326 @@ class Chain(object):
         for filter in self.filters:
             modelObjects = filter(modelObjects)
         return modelObjects
+
+
+class ObjectColumns(collections.abc.Mapping):
+
+    """
+    A read-only mapping of column names to arrays made from a list of model objects,
+    which are either dictionaries or have the columns as attributes. A column is only
+    made the first time it is asked for.
+    """
+
+    def __init__(self, modelObjects):
+        self.modelObjects = modelObjects
+        self.columns = {}
+
+    def __getitem__(self, name):
+        try:
+            return self.columns[name]
+        except KeyError:
+            pass
+
+        if self.modelObjects and isinstance(self.modelObjects[0], collections.abc.Mapping):
+            values = [x.get(name) for x in self.modelObjects]
+        else:
+            values = [getattr(x, name, None) for x in self.modelObjects]
+
+        # Lists (e.g. designations) must stay one object per row rather than becoming a 2D array
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        if not any(isinstance(x, (list, tuple, dict, str)) or x is None for x in values):
+            column = np.array(values)
+
+        self.columns[name] = column
+        return column
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.modelObjects)
+
+
+class MaskFilter(object):
+
+    """
+    Base class of the filters that choose rows with a boolean mask computed from whole
+    columns. Subclasses implement ComputeMask(columns) and call Invalidate() when their
+    condition changes. A filter that is disabled, or has no condition, chooses every row.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.mask = None
+        self.maskColumns = None
+        self.objectColumns = None
+
+    def __call__(self, modelObjects):
+        """
+        Return a boolean mask over the given dict of column arrays, or the chosen model objects
+        from a list of them
+        """
+        if isinstance(modelObjects, collections.abc.Mapping):
+            mask = self.GetMask(modelObjects)
+            if mask is None:
+                return np.ones(_NumRows(modelObjects), dtype=bool)
+            return mask
+
+        if self.objectColumns is None or self.objectColumns.modelObjects is not modelObjects:
+            self.objectColumns = ObjectColumns(modelObjects)
+
+        mask = self.GetMask(self.objectColumns)
+        if mask is None:
+            return modelObjects
+        return [modelObjects[i] for i in np.flatnonzero(mask)]
+
+    def GetMask(self, columns):
+        """
+        Return the boolean mask of the rows of columns this filter chooses, or None if it
+        chooses all of them. The mask is remembered until the columns or the condition change.
+        """
+        if not self.IsActive():
+            return None
+
+        if self.mask is None or self.maskColumns is not columns:
+            self.mask = np.asarray(self.ComputeMask(columns), dtype=bool)
+            self.maskColumns = columns
+        return self.mask
+
+    def ComputeMask(self, columns):
+        """
+        Return the boolean mask of the rows that match this filter
+        """
+        raise NotImplementedError
+
+    def Invalidate(self):
+        """
+        Forget the remembered mask, e.g. because the values in the columns have been changed
+        """
+        self.mask = None
+
+    def IsActive(self):
+        """
+        Does this filter choose only some of the rows?
+        """
+        return self.enabled
+
+    def SetEnabled(self, enabled=True):
+        """
+        Switch this filter on or off
+        """
+        self.enabled = enabled
+
+
+class Range(MaskFilter):
+
+    """
+    Choose the rows whose value in a numeric column is between low and high (inclusive).
+    Either limit can be None.
+
+    Example::
+        self.olv.SetFilter(Filter.Range("wavenumber", 15000, 16000))
+    """
+
+    def __init__(self, column, low=None, high=None, enabled=True):
+        MaskFilter.__init__(self, enabled)
+        self.column = column
+        self.low = low
+        self.high = high
+
+    def SetRange(self, low=None, high=None):
+        """
+        Set the limits of the range. Set both to None to disable the filter.
+        """
+        if (low, high) != (self.low, self.high):
+            self.low = low
+            self.high = high
+            self.Invalidate()
+
+    def IsActive(self):
+        return self.enabled and (self.low is not None or self.high is not None)
+
+    def ComputeMask(self, columns):
+        values = np.asarray(columns[self.column], dtype=float)
+        mask = np.ones(len(values), dtype=bool)
+        if self.low is not None:
+            mask &= values >= self.low
+        if self.high is not None:
+            mask &= values <= self.high
+        return mask
+
+
+class TagBits(MaskFilter):
+
+    """
+    Choose the rows that have any of the given bits set in an integer column of flags
+    (or, if present is False, the rows that have none of them set).
+    """
+
+    def __init__(self, column, bits=0, present=True, enabled=True):
+        MaskFilter.__init__(self, enabled)
+        self.column = column
+        self.bits = bits
+        self.present = present
+
+    def SetBits(self, bits):
+        """
+        Set the bits to look for. Set this to 0 to disable the filter.
+        """
+        if bits != self.bits:
+            self.bits = bits
+            self.Invalidate()
+
+    def IsActive(self):
+        return self.enabled and bool(self.bits)
+
+    def ComputeMask(self, columns):
+        hasBits = (np.asarray(columns[self.column]).astype(np.int64) & self.bits) != 0
+        return hasBits if self.present else ~hasBits
+
+
+class Truth(MaskFilter):
+
+    """
+    Choose the rows whose value in a boolean column is true, e.g. the starred lines of a LOPT
+    fit.
+    """
+
+    def __init__(self, column, enabled=True):
+        MaskFilter.__init__(self, enabled)
+        self.column = column
+
+    def ComputeMask(self, columns):
+        values = np.asarray(columns[self.column])
+        if values.dtype == object:  # virtual lines have no value
+            return np.fromiter((bool(x) and x == x for x in values), dtype=bool, count=len(values))
+        if values.dtype.kind == "f":
+            return (values != 0) & ~np.isnan(values)
+        return values.astype(bool)
+
+
+class Designations(MaskFilter):
+
+    """
+    Choose rows by the number of designations they have in one or more columns of lists of
+    designations, e.g. the unassigned lines (count 0) or the lines identified as more than one
+    transition (minimum 2).
+    """
+
+    def __init__(self, columns, minimum=None, maximum=None, enabled=True):
+        MaskFilter.__init__(self, enabled)
+        self.columns = columns
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def ComputeMask(self, columns):
+        counts = sum(_Lengths(columns[x]) for x in self.columns)
+        mask = np.ones(len(counts), dtype=bool)
+        if self.minimum is not None:
+            mask &= counts >= self.minimum
+        if self.maximum is not None:
+            mask &= counts <= self.maximum
+        return mask
+
+
+def Unassigned(columns=("main_desig",), enabled=True):
+    """
+    Choose the rows that have no designations in the given columns
+    """
+    return Designations(columns, maximum=0, enabled=enabled)
+
+
+def MultiplyIdentified(columns=("main_desig", "other_desig"), enabled=True):
+    """
+    Choose the rows that have more than one designation in the given columns
+    """
+    return Designations(columns, minimum=2, enabled=enabled)
+
+
+class Element(MaskFilter):
+
+    """
+    Choose the rows that have a designation of the given element in one or more columns of
+    lists of designation dicts.
+    """
+
+    def __init__(self, columns=("main_desig", "other_desig"), name=None, enabled=True):
+        MaskFilter.__init__(self, enabled)
+        self.columns = columns
+        self.name = name
+
+    def SetName(self, name):
+        """
+        Set the name of the element. Set this to None or "" to disable the filter.
+        """
+        if name != self.name:
+            self.name = name
+            self.Invalidate()
+
+    def IsActive(self):
+        return self.enabled and bool(self.name)
+
+    def ComputeMask(self, columns):
+        name = self.name.lower()
+        mask = None
+        for column in self.columns:
+            values = columns[column]
+            hasElement = np.fromiter(
+                (any(x["element_name"].lower() == name for x in desigs) for desigs in values),
+                dtype=bool, count=len(values))
+            mask = hasElement if mask is None else mask | hasElement
+        return mask
+
+
+class MaskChain(MaskFilter):
+
+    """
+    Choose the rows that match all of the given mask filters. Each filter remembers its own
+    mask, so changing the condition of one filter only recomputes that filter's mask.
+
+    Example::
+        snr = Filter.Range("peak")
+        self.olv.SetFilter(Filter.MaskChain(Filter.Range("wavenumber", 15000, 16000), snr))
+        self.olv.RepopulateList()
+        snr.SetRange(low=10)
+        self.olv.RepopulateList()
+    """
+
+    def __init__(self, *filters):
+        MaskFilter.__init__(self)
+        self.filters = filters
+        self.parts = None
+
+    def IsActive(self):
+        return self.enabled and any(x.IsActive() for x in self.filters)
+
+    def GetMask(self, columns):
+        if not self.IsActive():
+            return None
+
+        masks = [x.GetMask(columns) for x in self.filters]
+        changed = self.parts is None or any(x is not y for (x, y) in zip(masks, self.parts))
+        if self.mask is None or self.maskColumns is not columns or changed:
+            self.mask = None
+            for mask in masks:
+                if mask is not None:
+                    self.mask = mask.copy() if self.mask is None else (self.mask & mask)
+            self.maskColumns = columns
+            self.parts = masks
+        return self.mask
+
+    def Invalidate(self):
+        MaskFilter.Invalidate(self)
+        for x in self.filters:
+            x.Invalidate()
+
+
+def _NumRows(columns):
+    for values in columns.values():
+        return len(values)
+    return 0
+
+
+def _Lengths(values):
+    return np.fromiter((len(x) if isinstance(x, (list, tuple)) else 0 for x in values), dtype=np.intp, count=len(values))
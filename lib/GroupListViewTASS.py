@@ -75,7 +75,7 @@ class GroupListViewTame(GroupListView):
             self.groups = None
         else:
             self.groups = list()
-            
+        self.groupKeyStrings = {}  # CC - group titles have to be converted again for the new objects
         
         FastObjectListView.SetObjects(self, modelObjects, preserveSelection)        
         
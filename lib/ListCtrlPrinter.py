@@ -97,6 +97,7 @@ all page footer will look the same. There is no way to make the first footer loo
 and the second look a different way.
 """
 
+import copy
 import datetime
 import math
 
@@ -104,6 +105,9 @@ import wx
 
 from .WordWrapRenderer import WordWrapRenderer
 
+# The maximum page reported to wx while the end of a report hasn't been laid out
+OPEN_ENDED_MAX_PAGE = 2 ** 31 - 1
+
 #----------------------------------------------------------------------------
 
 
@@ -247,10 +251,37 @@ class ListCtrlPrinter(object):
         """
         Do the work of calculating how many pages this report will occupy?
 
-        This is expensive because it basically prints the whole report.
+        This lays out the whole report, but nothing is drawn and each distinct
+        cell text is only measured once.
         """
         return self.engine.CalculateTotalPages(dc, bounds)
 
+    def CalculatePages(self, dc, bounds, pageNumber):
+        """
+        Lay out the report until the given page is known to exist, or the report
+        ends before it. Return the total number of pages, or -1 if the end of the
+        report hasn't been reached yet.
+        """
+        return self.engine.CalculatePages(dc, bounds, pageNumber)
+
+    def GetTotalPages(self):
+        """
+        Return the number of pages in the report, or -1 if that isn't known yet
+        """
+        return self.engine.GetTotalPages()
+
+    def IsTotalPagesShown(self):
+        """
+        Does a header, footer or title of the report show the number of pages?
+        """
+        return self.engine.IsTotalPagesShown()
+
+    def ResetLayout(self):
+        """
+        Forget the page breaks of the last layout of the report.
+        """
+        self.engine.ResetLayout()
+
     def StartPrinting(self):
         """
         A new print job is about to begin.
@@ -302,6 +333,17 @@ class ReportEngine(object):
         # pages, or skipping to a specific page
         self.shouldDrawBlocks = True
 
+        # The state of the report at the start of each page that has been laid out
+        # (see LayoutPages()), and the number of the last page once it is known
+        self.pageStarts = dict()
+        self.lastPage = None
+        self.layoutKey = None
+
+        # Heights of the texts that have been measured, keyed by font, text and
+        # width. Most rows of a report repeat the same few values, so most cells
+        # never have to be word wrapped to find their height
+        self.textHeights = dict()
+
     #-------------------------------------------------------------------------
     # Accessing
 
@@ -315,7 +357,8 @@ class ReportEngine(object):
         """
         Return the total number of pages that this report will produce.
 
-        CalculateTotalPages() must be called before this is accurate.
+        This is -1 until the last page has been laid out, e.g. by
+        CalculateTotalPages().
         """
         return self.totalPages
 
@@ -338,16 +381,61 @@ class ReportEngine(object):
         """
         Do the work of calculating how many pages this report will occupy?
 
-        This is expensive because it basically prints the whole report.
+        The whole report is laid out, but nothing is drawn, and where each page
+        starts is remembered so that any page can then be printed directly.
         """
-        self.StartPrinting()
-        self.totalPages = 1
-        self.shouldDrawBlocks = False
-        while self.PrintOnePage(dc, self.totalPages, bounds):
-            self.totalPages += 1
-        self.shouldDrawBlocks = True
+        self.ResetLayout()
+        self.LayoutPages(dc, bounds)
+        return self.totalPages
+
+    def CalculatePages(self, dc, bounds, pageNumber):
+        """
+        Lay out the report until the given page is known to exist, or the report
+        ends before it. Return the total number of pages, or -1 if the end of the
+        report hasn't been reached yet.
+
+        Layout carries on from where the last call stopped, so a preview only lays
+        out the pages that have been looked at.
+        """
+        self.LayoutPages(dc, bounds, pageNumber)
         return self.totalPages
 
+    def IsTotalPagesShown(self):
+        """
+        Does a header, footer or title of the report show the number of pages?
+        If so, the whole report must be laid out before the first page is printed.
+        """
+        texts = list(self.pageHeader) + list(self.pageFooter) + [title for (lv, title) in self.listCtrls]
+        return any("totalPages" in x for x in texts if x)
+
+    def CalculateTextHeight(self, dc, txt, width, font, canWrap):
+        """
+        Return the height of the given txt in pixels when drawn in the given font
+        within the given width
+        """
+        # Rows can have fonts of their own (see RowBlock.GetFont()), which are
+        # different objects for each row, so fonts are compared by description
+        fontDesc = font.GetNativeFontInfoDesc()
+        if canWrap:
+            key = (fontDesc, txt, width)
+        else:
+            key = (fontDesc, None, None)
+        try:
+            return self.textHeights[key]
+        except KeyError:
+            pass
+
+        dc.SetFont(font)
+        if canWrap:
+            height = WordWrapRenderer.CalculateHeight(dc, txt, width)
+        else:
+            # Calculate the height of one line. The 1000 pixel width
+            # ensures that 'Wy' doesn't wrap, which might happen if bounds is
+            # narrow
+            height = WordWrapRenderer.CalculateHeight(dc, "Wy", 1000)
+        self.textHeights[key] = height
+        return height
+
     #-------------------------------------------------------------------------
     # Commands
 
@@ -379,6 +467,19 @@ class ReportEngine(object):
         self.blocks.pop(0)
         self.blockInsertionIndex = 1
 
+    def ResetLayout(self):
+        """
+        Forget the page breaks and text heights of the last layout of the report.
+
+        This must be called if the contents of the lists change after the report
+        has been laid out.
+        """
+        self.pageStarts = dict()
+        self.lastPage = None
+        self.layoutKey = None
+        self.textHeights = dict()
+        self.totalPages = -1
+
     #-------------------------------------------------------------------------
     # Printing
 
@@ -414,16 +515,90 @@ class ReportEngine(object):
         """
         Print the given page on the given device context.
         """
-        # If the request page isn't next in order, we have to restart
-        # the printing process and advance until we reach the desired page.
-        if pageNumber != self.currentPage + 1:
+        # If the request page isn't next in order, we go back to where it
+        # starts, laying out the pages before it if that hasn't been done yet
+        if pageNumber != self.currentPage + 1 or not self._IsLaidOutFor(dc, bounds):
+            self.LayoutPages(dc, bounds, pageNumber)
+            if pageNumber not in self.pageStarts:
+                return False
+            self._RestorePageStart(pageNumber)
+
+        hasMorePages = self.PrintOnePage(dc, pageNumber, bounds)
+        if hasMorePages and pageNumber + 1 not in self.pageStarts:
+            self.pageStarts[pageNumber + 1] = self._SavePageStart()
+        elif not hasMorePages:
+            self._SetLastPage(pageNumber)
+        return hasMorePages
+
+    def LayoutPages(self, dc, bounds, lastPage=None):
+        """
+        Lay out the report, without drawing anything, until the start of the given
+        page is known, or to the end of the report if lastPage is None.
+
+        Layout carries on from the last page that was laid out before, so asking
+        for the pages in order only lays out each page once. Return the number of
+        the last page that has been laid out.
+        """
+        if not self._IsLaidOutFor(dc, bounds):
+            self.ResetLayout()
+            self.layoutKey = self._GetLayoutKey(dc, bounds)
             self.StartPrinting()
-            self.shouldDrawBlocks = False
-            for i in range(1, pageNumber):
-                self.PrintOnePage(dc, i, bounds)
+            self.pageStarts[1] = self._SavePageStart()
+
+        pageNumber = max(self.pageStarts)
+        if self.lastPage is not None or (lastPage is not None and pageNumber >= lastPage):
+            return pageNumber
+
+        self._RestorePageStart(pageNumber)
+        self.shouldDrawBlocks = False
+        try:
+            while lastPage is None or pageNumber < lastPage:
+                if not self.PrintOnePage(dc, pageNumber, bounds):
+                    self._SetLastPage(pageNumber)
+                    break
+                pageNumber += 1
+                self.pageStarts[pageNumber] = self._SavePageStart()
+        finally:
             self.shouldDrawBlocks = True
 
-        return self.PrintOnePage(dc, pageNumber, bounds)
+        return pageNumber
+
+    def _SetLastPage(self, pageNumber):
+        """
+        Remember that the given page is the last page of the report
+        """
+        self.lastPage = pageNumber
+        self.totalPages = pageNumber
+
+    def _GetLayoutKey(self, dc, bounds):
+        """
+        Return what the layout of the report depends on, apart from the lists
+        """
+        return (tuple(bounds), tuple(dc.GetSize()))
+
+    def _IsLaidOutFor(self, dc, bounds):
+        """
+        Are the remembered page starts for the given device context and bounds?
+        """
+        return self.layoutKey == self._GetLayoutKey(dc, bounds)
+
+    def _SavePageStart(self):
+        """
+        Return the state of the report at the start of a page. The blocks are
+        copied, since printing them changes some of them (e.g. ListRowsBlock).
+        """
+        return (self.blockInsertionIndex,
+                [copy.copy(x) for x in self.blocks],
+                list(self.runningBlocks))
+
+    def _RestorePageStart(self, pageNumber):
+        """
+        Put the report back into the state it was in at the start of the given page
+        """
+        (self.blockInsertionIndex, blocks, runningBlocks) = self.pageStarts[pageNumber]
+        self.blocks = [copy.copy(x) for x in blocks]
+        self.runningBlocks = list(runningBlocks)
+        self.currentPage = pageNumber - 1
 
     def PrintOnePage(self, dc, pageNumber, bounds):
         """
@@ -504,6 +679,7 @@ class ListCtrlPrintout(wx.Printout):
         self.olvPrinter = olvPrinter
         self.margins = margins or (wx.Point(15, 15), wx.Point(15, 15))
         self.totalPages = -1
+        self.dcSize = None
 
         self.printData = wx.PrintData()
         self.printData.SetPrinterName("")  # Use default printer
@@ -515,16 +691,40 @@ class ListCtrlPrintout(wx.Printout):
 
     def HasPage(self, page):
         """
-        Return true if this printout has the given page number
+        Return true if this printout has the given page number.
+
+        The report is only laid out as far as the pages that have been asked for,
+        so this may have to lay out more of it to find out.
         """
-        return page <= self.totalPages
+        if self.totalPages < 0:
+            self.totalPages = self.olvPrinter.CalculatePages(self.GetLayoutDC(), self.bounds, page)
+        return self.totalPages < 0 or page <= self.totalPages
 
     def GetPageInfo(self):
         """
         Return a 4-tuple indicating the ...
+
+        Until the last page has been laid out, the maximum page is open ended and
+        HasPage() says where the report stops. wx reads this once, when printing
+        is prepared, so a preview keeps showing the open ended maximum.
         """
+        if self.totalPages < 0:
+            return (1, OPEN_ENDED_MAX_PAGE, 1, 1)
         return (1, self.totalPages, 1, 1)
 
+    def GetLayoutDC(self):
+        """
+        Return a device context that the report can be laid out on.
+
+        A print preview only gives the printout a DC while it draws a page, so
+        otherwise the text is measured on a memory DC of the same size.
+        """
+        dc = self.GetDC()
+        if dc is None:
+            dc = wx.MemoryDC(wx.Bitmap(*self.dcSize))
+        self.SetScaleAndBounds(dc)
+        return dc
+
     def GetPrintPreview(self):
         """
         Get a wxPrintPreview of this report
@@ -602,8 +802,15 @@ class ListCtrlPrintout(wx.Printout):
         Prepare for printing. This event is sent before any of the others
         """
         dc = self.GetDC()
+        self.dcSize = tuple(dc.GetSize())
         self.SetScaleAndBounds(dc)
-        self.totalPages = self.olvPrinter.CalculateTotalPages(dc, self.bounds)
+        if self.olvPrinter.IsTotalPagesShown():
+            self.totalPages = self.olvPrinter.CalculateTotalPages(dc, self.bounds)
+        else:
+            # Only the first page is laid out now (so a one page report knows its
+            # page count), the others as they are asked for
+            self.olvPrinter.ResetLayout()
+            self.totalPages = self.olvPrinter.CalculatePages(dc, self.bounds, 2)
         self.olvPrinter.StartPrinting()
 
     def OnBeginDocument(self, start, end):
@@ -627,8 +834,11 @@ class ListCtrlPrintout(wx.Printout):
         """
         # We bounce this back to the printer facade
         dc = self.GetDC()
+        self.dcSize = tuple(dc.GetSize())
         self.SetScaleAndBounds(dc)
-        return self.olvPrinter.PrintPage(dc, page, self.bounds)
+        result = self.olvPrinter.PrintPage(dc, page, self.bounds)
+        self.totalPages = self.olvPrinter.GetTotalPages()
+        return result
 
     def SetScaleAndBounds(self, dc):
         """
@@ -1336,17 +1546,12 @@ class Block(object):
         """
         bounds = bounds or self.GetReducedBlockBounds(dc)
         font = font or self.GetFont()
-        dc.SetFont(font)
-        if self.GetFormat().CanWrap:
-            return WordWrapRenderer.CalculateHeight(
-                dc,
-                txt,
-                RectUtils.Width(bounds))
-        else:
-            # Calculate the height of one line. The 1000 pixel width
-            # ensures that 'Wy' doesn't wrap, which might happen if bounds is
-            # narrow
-            return WordWrapRenderer.CalculateHeight(dc, "Wy", 1000)
+        return self.engine.CalculateTextHeight(
+            dc,
+            txt,
+            RectUtils.Width(bounds),
+            font,
+            self.GetFormat().CanWrap)
 
     def CanFit(self, height):
         """
@@ -1696,8 +1901,8 @@ class CellBlock(Block):
         """
         Calculate the total width of this block (cells plus padding)
         """
-        return sum(
-            x.cellWidth for x in self.GetCombinedLists()) + self.CalculateExtrasWidth(dc)
+        # Only the widths are needed, so the texts of the cells are not fetched
+        return sum(self.GetCellWidths()) + self.CalculateExtrasWidth(dc)
 
     #-------------------------------------------------------------------------
     # Commands
@@ -97,6 +97,8 @@ __author__ = "Phillip Piper"
 __date__ = "18 June 2008"
 
 import wx
+import collections
+import collections.abc
 import datetime
 import itertools
 import locale
@@ -2314,6 +2316,7 @@ class AbstractVirtualObjectListView(ObjectListView):
         self.lastGetObject = None
         self.objectGetter = None
         self.listItemAttr = None
+        self.cellTextCache = CellTextCache(kwargs.pop("cellTextCacheSize", CellTextCache.DEFAULT_SIZE))
         #self.cacheHit = 0
         #self.cacheMiss = 0
 
@@ -2337,6 +2340,7 @@ class AbstractVirtualObjectListView(ObjectListView):
         """
         ObjectListView.ClearAll(self)
         self.lastGetObjectIndex = -1
+        self.cellTextCache.Clear()
         # Should this call SetItemCount()?
 
     def DeleteAllItems(self):
@@ -2345,13 +2349,22 @@ class AbstractVirtualObjectListView(ObjectListView):
         """
         ObjectListView.DeleteAllItems(self)
         self.lastGetObjectIndex = -1
+        self.cellTextCache.Clear()
         # Should this call SetItemCount()?
 
+    def AddColumnDefn(self, defn):
+        """
+        Append the given ColumnDefn object to our list of active columns.
+        """
+        self.cellTextCache.Clear()
+        ObjectListView.AddColumnDefn(self, defn)
+
     def RefreshIndex(self, index, modelObject):
         """
         Refresh the item at the given index with data associated with the given modelObject
         """
         self.lastGetObjectIndex = -1
+        self.cellTextCache.Discard([modelObject], len(self.columns))
         self.RefreshItem(index)
 
     def RefreshObject(self, modelObject):
@@ -2367,6 +2380,7 @@ class AbstractVirtualObjectListView(ObjectListView):
         """
         # We can only refresh everything
         self.lastGetObjectIndex = -1
+        self._DiscardCellText(aList)
         self.RefreshItems(0, max(0, self.GetItemCount() - 1))
         # self.Refresh()
 
@@ -2392,6 +2406,21 @@ class AbstractVirtualObjectListView(ObjectListView):
         """
         self.objectGetter = aCallable
 
+    def GetCellTextCacheStats(self):
+        """
+        Return a dict with the hits, misses and current size of the formatted cell cache
+        """
+        return self.cellTextCache.GetStats()
+
+    def _DiscardCellText(self, modelObjects=None):
+        """
+        Forget the formatted text of the given model objects, or of all objects if none are given
+        """
+        if modelObjects:
+            self.cellTextCache.Discard(modelObjects, len(self.columns))
+        else:
+            self.cellTextCache.Clear()
+
     def _FormatAllRows(self):
         """
         Set up the required formatting on all rows
@@ -2407,7 +2436,7 @@ class AbstractVirtualObjectListView(ObjectListView):
         """
         Return the text that should be shown at the given cell
         """
-        return self.GetStringValueAt(self.GetObjectAt(itemIdx), colIdx)
+        return self.cellTextCache.Get(self.GetObjectAt(itemIdx), colIdx, self.GetStringValueAt)
 
     def OnGetItemImage(self, itemIdx):
         """
@@ -2620,6 +2649,7 @@ class FastObjectListView(AbstractVirtualObjectListView):
         Refresh all the objects in the given list
         """
         self.lastGetObjectIndex = -1
+        self._DiscardCellText(aList)
         # If no list is given, refresh everything
         if aList:
             for x in aList:
@@ -2707,6 +2737,7 @@ class GroupListView(FastObjectListView):
             If it is changed, SetColumns() must be called again.
         """
         self.groups = list()
+        self.groupKeyStrings = {}  # (grouping column, group key) -> group key as a string
         self.showGroups = True
         self.putBlankLineBetweenGroups = True
         self.alwaysGroupByColumnIndex = -1
@@ -2891,6 +2922,7 @@ class GroupListView(FastObjectListView):
                         fixedWidth=24,
                         isEditable=False))
                 newColumns[0].isInternal = True
+        self.groupKeyStrings = {}
         FastObjectListView.SetColumns(self, newColumns, repopulate)
 
     def SetGroups(self, groups):
@@ -2912,6 +2944,7 @@ class GroupListView(FastObjectListView):
             self.groups = None
         else:
             self.groups = list()
+        self.groupKeyStrings = {}
         FastObjectListView.SetObjects(self, modelObjects, preserveSelection)
 
     #-------------------------------------------------------------------------
@@ -2955,7 +2988,7 @@ class GroupListView(FastObjectListView):
             if group is None:
                 groupMap[key] = group = ListGroup(
                     key,
-                    groupingColumn.GetGroupKeyAsString(key))
+                    self.GetGroupKeyAsString(groupingColumn, key))
             group.Add(model)
 
         groups = groupMap.values()
@@ -2969,6 +3002,19 @@ class GroupListView(FastObjectListView):
 
         return evt.groups
 
+    def GetGroupKeyAsString(self, groupingColumn, key):
+        """
+        Return the given group key as a string. Conversions are remembered until the objects or
+        columns of the list change, so rebuilding the groups (e.g. after a sort) does not convert
+        every key again.
+        """
+        cacheKey = (id(groupingColumn), key)
+        try:
+            return self.groupKeyStrings[cacheKey]
+        except KeyError:
+            keyString = self.groupKeyStrings[cacheKey] = groupingColumn.GetGroupKeyAsString(key)
+            return keyString
+
     def _BuildGroupTitles(self, groups, groupingColumn):
         """
         Rebuild the titles of the given groups
@@ -3023,7 +3069,7 @@ class GroupListView(FastObjectListView):
             else:
                 return ""
 
-        return self.GetStringValueAt(modelObject, colIdx)
+        return self.cellTextCache.Get(modelObject, colIdx, self.GetStringValueAt)
 
     def OnGetItemImage(self, itemIdx):
         """
@@ -3128,35 +3174,80 @@ class GroupListView(FastObjectListView):
             groups = self.groups
         self._DoExpandCollapse(groups, False)
 
+    def GetExpansionState(self):
+        """
+        Return a dict mapping the key of each group to whether the group is expanded.
+
+        The keys, not the positions, of the groups are used, so the state can be given
+        back to SetExpansionState() after the groups have been rebuilt or sorted.
+        """
+        return {x.key: x.isExpanded for x in self.groups or ()}
+
+    def SetExpansionState(self, state, default=None):
+        """
+        Expand or collapse all the groups whose keys are in the given dict of
+        key -> isExpanded, and redisplay the list once.
+
+        Groups whose keys are not in the dict are set to default, or left as they
+        are if default is None.
+        """
+        if not self.groups:
+            return
+
+        expanding = []
+        collapsing = []
+        for x in self.groups:
+            isExpanding = state.get(x.key, default)
+            if isExpanding is None or bool(isExpanding) == x.isExpanded:
+                continue
+            (expanding if isExpanding else collapsing).append(x)
+
+        self._DoExpandCollapseMany([(expanding, True), (collapsing, False)])
+
     def _DoExpandCollapse(self, groups, isExpanding):
         """
         Do the real work of expanding/collapsing the given groups
         """
         # Cull groups that aren't going to change
         groups = [x for x in groups if x.isExpanded != isExpanding]
-        if not groups:
-            return
+        self._DoExpandCollapseMany([(groups, isExpanding)])
 
-        # Let the world know that the given groups are about to be
-        # expanded/collapsed
-        evt = OLVEvent.ExpandingCollapsingEvent(self, groups, isExpanding)
-        self.GetEventHandler().ProcessEvent(evt)
-        if evt.IsVetoed():
+    def _DoExpandCollapseMany(self, changes):
+        """
+        Expand/collapse each list of groups in the given (groups, isExpanding) pairs,
+        building the list only once for all of them
+        """
+        changed = []
+        for (groups, isExpanding) in changes:
+            if not groups:
+                continue
+
+            # Let the world know that the given groups are about to be
+            # expanded/collapsed
+            evt = OLVEvent.ExpandingCollapsingEvent(self, groups, isExpanding)
+            self.GetEventHandler().ProcessEvent(evt)
+            if evt.IsVetoed():
+                continue
+
+            # Expand/contract the groups. The changes are put into effect below
+            for x in evt.groups:
+                x.isExpanded = isExpanding
+            changed.append((evt.groups, isExpanding))
+
+        if not changed:
             return
 
-        # Expand/contract the groups, then put those changes into effect
-        for x in evt.groups:
-            x.isExpanded = isExpanding
         self._BuildInnerList()
         self.SetItemCount(len(self.innerList))
 
         # Refresh eveything from the first group down
-        i = min([self.GetIndexOf(x) for x in evt.groups])
+        i = min([self.GetIndexOf(x) for (groups, isExpanding) in changed for x in groups])
         self.RefreshItems(i, len(self.innerList) - 1)
 
         # Let the world know that the given groups have been expanded/collapsed
-        evt = OLVEvent.ExpandedCollapsedEvent(self, evt.groups, isExpanding)
-        self.GetEventHandler().ProcessEvent(evt)
+        for (groups, isExpanding) in changed:
+            evt = OLVEvent.ExpandedCollapsedEvent(self, groups, isExpanding)
+            self.GetEventHandler().ProcessEvent(evt)
 
     def Reveal(self, modelObject):
         """
@@ -3741,18 +3832,128 @@ class ColumnDefn(object):
     #-------------------------------------------------------------------------
     # Value accessing
 
+    def _GetValueGetter(self):
+        return self._valueGetter
+
+    def _SetValueGetter(self, valueGetter):
+        self._valueGetter = valueGetter
+        self._getters = {}  # type of model object -> accessor compiled by _CompileGetter()
+
+    valueGetter = property(_GetValueGetter, _SetValueGetter)
+
+    def _GetStringConverter(self):
+        return self._stringConverter
+
+    def _SetStringConverter(self, stringConverter):
+        self._stringConverter = stringConverter
+        self._stringFormatter = self._CompileConverter(stringConverter)
+
+    stringConverter = property(_GetStringConverter, _SetStringConverter)
+
     def GetValue(self, modelObject):
         """
         Return the value for this column from the given modelObject
         """
-        return self._Munge(modelObject, self.valueGetter)
+        try:
+            getter = self._getters[type(modelObject)]
+        except KeyError:
+            getter = self._getters[type(modelObject)] = self._CompileGetter(type(modelObject), self.valueGetter)
+        return getter(modelObject)
 
     def GetStringValue(self, modelObject):
         """
         Return a string representation of the value for this column from the given modelObject
         """
-        value = self.GetValue(modelObject)
-        return self._StringToValue(value, self.stringConverter)
+        return self._stringFormatter(self.GetValue(modelObject))
+
+    def ValueToString(self, value):
+        """
+        Return the string representation of a value of this column, for lists that fetch the
+        values themselves rather than from model objects
+        """
+        return self._stringFormatter(value)
+
+    def _CompileGetter(self, modelType, munger):
+        """
+        Work out once how munger gets a value from model objects of the given type, and return a
+        function that does only that. It gives the same results as _Munge(), which it falls back to
+        for anything it does not expect, without trying every kind of access for every cell.
+        """
+        if munger is None:
+            return lambda modelObject: None
+
+        def munge(modelObject):
+            return self._Munge(modelObject, munger)
+
+        if isinstance(munger, six.string_types):
+            if issubclass(modelType, collections.abc.Mapping) and not hasattr(modelType, munger):
+                # Dictionaries, e.g. rows from DataFrame.to_dict(), and other mappings
+                return lambda modelObject: modelObject.get(munger)
+
+            classAttr = getattr(modelType, munger, None)
+            if callable(classAttr):
+                # The name of a method, _Munge() handles calling it
+                return munge
+
+            # An attribute, slot or property
+            def getAttribute(modelObject):
+                try:
+                    value = getattr(modelObject, munger)
+                except AttributeError:
+                    return munge(modelObject)
+                if value is None or callable(value):
+                    return munge(modelObject)
+                return value
+            return getAttribute
+
+        if callable(munger):
+            def callMunger(modelObject):
+                try:
+                    return munger(modelObject)
+                except TypeError:
+                    try:
+                        return modelObject[munger]
+                    except:
+                        return None
+            return callMunger
+
+        if isinstance(munger, six.integer_types):
+            def getIndex(modelObject):
+                try:
+                    return modelObject[munger]
+                except:
+                    return None
+            return getIndex
+
+        return munge
+
+    def _CompileConverter(self, converter):
+        """
+        Return a function that converts a value to a string in the same way as
+        _StringToValue(value, converter), with the choice between a callable converter, a format
+        string and the default made once rather than for every cell.
+        """
+        if callable(converter):
+            def convert(value):
+                try:
+                    return converter(value)
+                except TypeError:
+                    return self._StringToValue(value, converter)
+            return convert
+
+        if not converter:
+            def convertDefault(value):
+                # By default, None is changed to an empty string.
+                if not value:
+                    return ""
+                return "%s" % value
+            return convertDefault
+
+        def formatValue(value):
+            if isinstance(value, (datetime.date, datetime.time)):
+                return self._StringToValue(value, converter)
+            return converter % value
+        return formatValue
 
     def _StringToValue(self, value, converter):
         """
@@ -4079,6 +4280,101 @@ class NamedImageList(object):
 #======================================================================
 
 
+class CellTextCache(object):
+
+    """
+    A bounded, least recently used cache of the formatted text of the cells of a virtual list.
+
+    Virtual lists ask for the text of every visible cell each time they are painted, and scrolling
+    asks for the same cells over and over. Cells are keyed by the identity of their model object and
+    the column index. Each entry keeps a reference to its model object, so that an entry can never
+    be mistaken for one belonging to a new object that happens to get the same id().
+
+    The list discards entries when objects are refreshed, and clears the cache when its objects or
+    columns are replaced. If a model object is changed, the list must be told via RefreshObject(s)
+    for the new values to be shown -- which has always been the case.
+    """
+
+    DEFAULT_SIZE = 20000
+
+    def __init__(self, maxSize=DEFAULT_SIZE):
+        self.maxSize = maxSize
+        self.cells = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def Get(self, modelObject, colIdx, formatter):
+        """
+        Return the text of the given cell, calling formatter(modelObject, colIdx) if it is not cached
+        """
+        key = (id(modelObject), colIdx)
+        entry = self.cells.get(key)
+        if entry is not None and entry[0] is modelObject:
+            self.hits += 1
+            self.cells.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        text = formatter(modelObject, colIdx)
+        if self.maxSize > 0:
+            self.cells[key] = (modelObject, text)
+            if len(self.cells) > self.maxSize:
+                self.cells.popitem(last=False)
+        return text
+
+    def Discard(self, modelObjects, numColumns):
+        """
+        Forget the cells of the given model objects
+        """
+        for modelObject in modelObjects:
+            objectId = id(modelObject)
+            for colIdx in range(numColumns):
+                self.cells.pop((objectId, colIdx), None)
+
+    def GetByKey(self, rowKey, colIdx, formatter):
+        """
+        Return the text of the given cell of a list whose rows are identified by a hashable key,
+        such as their position in a DataFrame, rather than by model objects. formatter(rowKey,
+        colIdx) is called if the text is not cached
+        """
+        key = (rowKey, colIdx)
+        text = self.cells.get(key)
+        if text is not None:
+            self.hits += 1
+            self.cells.move_to_end(key)
+            return text
+
+        self.misses += 1
+        text = formatter(rowKey, colIdx)
+        if self.maxSize > 0:
+            self.cells[key] = text
+            if len(self.cells) > self.maxSize:
+                self.cells.popitem(last=False)
+        return text
+
+    def DiscardKeys(self, rowKeys, numColumns):
+        """
+        Forget the cells of the rows with the given keys
+        """
+        for rowKey in rowKeys:
+            for colIdx in range(numColumns):
+                self.cells.pop((rowKey, colIdx), None)
+
+    def Clear(self):
+        """
+        Forget all cells
+        """
+        self.cells.clear()
+
+    def GetStats(self):
+        """
+        Return a dict of the hit and miss counts and the number of cached cells
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.cells), "maxSize": self.maxSize}
+
+#======================================================================
+
+
 class BatchedUpdate(object):
 
     """
@@ -4146,6 +4442,7 @@ class BatchedUpdate(object):
         self.objectListView.Bind(wx.EVT_IDLE, self._HandleIdle)
 
         self.newModelObjects = BatchedUpdate.NOT_SET
+        self.repopulate = False
         self.objectsToAdd = list()
         self.objectsToRefresh = list()
         self.objectsToRemove = list()
@@ -4163,12 +4460,14 @@ class BatchedUpdate(object):
         """
         Remember the given model objects so that they can be displayed when the next update cycle occurs
         """
-        if self.freezeUntil < time.clock():
+        if self.freezeUntil < time.perf_counter():
             self.objectListView.RepopulateList()
-            self.freezeUntil = time.clock() + self.updatePeriod
+            self.freezeUntil = time.perf_counter() + self.updatePeriod
             return
 
-        self.newModelObjects = self.objectListView.modelObjects
+        # Repopulating (rather than setting the same objects again) keeps the
+        # list's own state, e.g. the masks of a DataFrameListView's filters
+        self.repopulate = True
         self.objectsToRefresh = list()
 
         # Unlike SetObjects(), refreshing the list does NOT invalidate the
@@ -4178,12 +4477,13 @@ class BatchedUpdate(object):
         """
         Remember the given model objects so that they can be displayed when the next update cycle occurs
         """
-        if self.freezeUntil < time.clock():
+        if self.freezeUntil < time.perf_counter():
             self.objectListView.SetObjects(modelObjects)
-            self.freezeUntil = time.clock() + self.updatePeriod
+            self.freezeUntil = time.perf_counter() + self.updatePeriod
             return
 
         self.newModelObjects = modelObjects
+        self.repopulate = False
         # Explicitly setting the objects to be shown renders void any previous
         # Add/Refresh/Remove commands
         self.objectsToAdd = list()
@@ -4203,9 +4503,9 @@ class BatchedUpdate(object):
         """
         Remember the given model objects so that they can be added when the next update cycle occurs
         """
-        if self.freezeUntil < time.clock():
+        if self.freezeUntil < time.perf_counter():
             self.objectListView.AddObjects(modelObjects)
-            self.freezeUntil = time.clock() + self.updatePeriod
+            self.freezeUntil = time.perf_counter() + self.updatePeriod
             return
 
         # TODO: We should check that none of the model objects is already in
@@ -4227,9 +4527,9 @@ class BatchedUpdate(object):
         """
         Refresh the information displayed about the given model objects
         """
-        if self.freezeUntil < time.clock():
+        if self.freezeUntil < time.perf_counter():
             self.objectListView.RefreshObjects(modelObjects)
-            self.freezeUntil = time.clock() + self.updatePeriod
+            self.freezeUntil = time.perf_counter() + self.updatePeriod
             return
 
         self.objectsToRefresh.extend(modelObjects)
@@ -4244,9 +4544,9 @@ class BatchedUpdate(object):
         """
         Remember the given model objects so that they can be removed when the next update cycle occurs
         """
-        if self.freezeUntil < time.clock():
+        if self.freezeUntil < time.perf_counter():
             self.objectListView.RemoveObjects(modelObjects)
-            self.freezeUntil = time.clock() + self.updatePeriod
+            self.freezeUntil = time.perf_counter() + self.updatePeriod
             return
 
         self.objectsToRemove.extend(modelObjects)
@@ -4263,11 +4563,12 @@ class BatchedUpdate(object):
         """
         The app is idle. Process any outstanding requests
         """
-        if (self.newModelObjects != BatchedUpdate.NOT_SET or
+        if (self.newModelObjects is not BatchedUpdate.NOT_SET or
+                self.repopulate or
                 self.objectsToAdd or
                 self.objectsToRefresh or
                 self.objectsToRemove):
-            if self.freezeUntil < time.clock():
+            if self.freezeUntil < time.perf_counter():
                 self._ApplyChanges()
             else:
                 evt.RequestMore()
@@ -4276,8 +4577,10 @@ class BatchedUpdate(object):
         """
         Apply any batched changes to the list
         """
-        if self.newModelObjects != BatchedUpdate.NOT_SET:
+        if self.newModelObjects is not BatchedUpdate.NOT_SET:
             self.objectListView.SetObjects(self.newModelObjects)
+        elif self.repopulate:
+            self.objectListView.RepopulateList()
 
         if self.objectsToAdd:
             self.objectListView.AddObjects(self.objectsToAdd)
@@ -4289,10 +4592,11 @@ class BatchedUpdate(object):
             self.objectListView.RefreshObjects(self.objectsToRefresh)
 
         self.newModelObjects = BatchedUpdate.NOT_SET
+        self.repopulate = False
         self.objectsToAdd = list()
         self.objectsToRemove = list()
         self.objectsToRefresh = list()
-        self.freezeUntil = time.clock() + self.updatePeriod
+        self.freezeUntil = time.perf_counter() + self.updatePeriod
 
 #----------------------------------------------------------------------------
 # Built in images so clients don't have to do the same
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import wx
+
+
+class VirtualCheckListCtrl(wx.ListCtrl):
+    """
+    A virtual report mode wx.ListCtrl with a check box on each row.
+
+    The rows are given to SetRows() as columns of values, which are only turned into text when a row is drawn, and
+    whether each row is checked is kept in a NumPy bool array. Showing a list of thousands of rows is then a single
+    SetItemCount() rather than an Append() and CheckItem() for every row. EVT_LIST_ITEM_CHECKED/UNCHECKED events are
+    still sent to the parent after the array has been updated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Create a VirtualCheckListCtrl. columns is a list of (heading, width) pairs for the columns of the list.
+        """
+        columns = kwargs.pop('columns', ())
+        kwargs['style'] = kwargs.get('style', 0) | wx.LC_REPORT | wx.LC_VIRTUAL
+        wx.ListCtrl.__init__(self, *args, **kwargs)
+
+        self.columnValues = []
+        self.checked = np.zeros(0, dtype=bool)
+
+        for heading, width in columns:
+            self.AppendColumn(heading, format=wx.LIST_FORMAT_LEFT, width=width)
+
+        self.EnableCheckBoxes(True)
+        self.Bind(wx.EVT_LIST_ITEM_CHECKED, self._OnItemChecked)
+        self.Bind(wx.EVT_LIST_ITEM_UNCHECKED, self._OnItemUnchecked)
+
+    #-------------------------------------------------------------------------
+    # Commands
+
+    def SetRows(self, columnValues, checked=None):
+        """
+        Show the given columns of values (sequences of the same length, one for each column of the list), with the
+        rows checked where the bool array checked is True (none if it is not given).
+        """
+        numRows = len(columnValues[0]) if columnValues else 0
+        self.columnValues = columnValues
+        self.checked = np.zeros(numRows, dtype=bool) if checked is None else np.array(checked, dtype=bool)
+
+        self.SetItemCount(numRows)
+        self.RefreshRows()
+
+    def SetChecked(self, checked):
+        """
+        Set which rows are checked from an array of bools, one for each row
+        """
+        self.checked = np.array(checked, dtype=bool)
+        self.RefreshRows()
+
+    def RefreshRows(self):
+        """
+        Redraw all the rows of the list
+        """
+        if self.GetItemCount():
+            self.RefreshItems(0, self.GetItemCount() - 1)
+
+    #-------------------------------------------------------------------------
+    # Accessing
+
+    def GetChecked(self):
+        """
+        Return the array of whether each row is checked
+        """
+        return self.checked
+
+    def GetCheckedIndexes(self):
+        """
+        Return the indexes of the checked rows
+        """
+        return np.flatnonzero(self.checked)
+
+    #-------------------------------------------------------------------------
+    # Virtual list callbacks
+
+    def OnGetItemText(self, item, column):
+        """
+        Return the text that should be shown at the given cell
+        """
+        return str(self.columnValues[column][item])
+
+    def OnGetItemIsChecked(self, item):
+        """
+        Return whether the given row is checked
+        """
+        return bool(self.checked[item])
+
+    #-------------------------------------------------------------------------
+    # Event handlers
+
+    def _OnItemChecked(self, event):
+        """
+        The user has checked a row
+        """
+        self.checked[event.GetIndex()] = True
+        event.Skip()
+
+    def _OnItemUnchecked(self, event):
+        """
+        The user has unchecked a row
+        """
+        self.checked[event.GetIndex()] = False
+        event.Skip()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reader for the two column .asc spectra written by Xgremlin.
+
+An .asc file has a short text header followed by one "wavenumber intensity" pair per line. The body is parsed in a
+single numpy call rather than line by line, which is many times faster than pandas' whitespace parser for the several
+million points of a typical FTS spectrum.
+"""
+
+import os
+import numpy as np
+
+HEADER_LINES = 4
+
+
+def spectrum_name(filename):
+    """Returns the name a spectrum is shown under in the line plot, i.e. the filename without its extension."""
+    return os.path.basename(filename).split('.')[0]
+
+
+def read_asc(filename, header_lines=HEADER_LINES):
+    """Reads an Xgremlin .asc file and returns its (wavenumber, intensity) arrays."""
+    with open(filename, 'rb') as file:
+        for i in range(header_lines):
+            file.readline()
+
+        body = file.read().decode('ascii', errors='replace').replace('D', 'E').replace('d', 'e')  # Fortran exponents
+
+    values = np.fromstring(body, dtype=np.float64, sep=' ')
+
+    if len(values) % 2:
+        raise ValueError(f'{filename} does not have two columns of numbers after its header')
+
+    values = values.reshape(-1, 2)
+    return values[:, 0], values[:, 1]
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Crash protection for the parts of a TAME project that are not covered by the edit journal.
+
+User edits are written to the edit journal (lib/edit_journal.py) as they are made, but line matching rewrites the
+designations of the whole linelist and is only written to the project files when the user saves. An Autosave writes a
+snapshot of the lines DataFrame to a recovery store next to the project on a worker thread. It is discarded once the
+project is saved or closed, so a recovery store that still exists when a project is opened means TAME did not exit
+cleanly, and it is loaded in place of the saved lines.
+"""
+
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+from .line_store import LineStore
+
+
+def autosave_path(store_path):
+    """Returns the recovery store directory for a project line store or database."""
+    return os.path.splitext(store_path.rstrip('/'))[0] + '.autosave'
+
+
+@contextmanager
+def atomic_open(filename, mode='w', **kwargs):
+    """Opens a temporary file that replaces filename when the block exits without an error, so that a crash part way
+    through writing a file never leaves a truncated file behind. Other arguments are passed on to open()."""
+    temp_file = filename + '.tmp'
+
+    with open(temp_file, mode, **kwargs) as file:
+        yield file
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temp_file, filename)
+
+
+class Autosave(object):
+    """A recovery store for the lines DataFrame that is written in the background."""
+    def __init__(self, path):
+        self.path = path
+        self.generation = 0  # number of snapshots requested, used so that a discard does not remove a newer snapshot
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def exists(self):
+        """True if a snapshot was left behind by a session that did not exit cleanly."""
+        return LineStore(self.path).exists()
+
+    def load(self):
+        """Loads the snapshot."""
+        return LineStore(self.path).load()
+
+    def save(self, df):
+        """Writes df to the recovery store on a worker thread. df must not be changed afterwards, so pass a copy. Does
+        nothing and returns False if the previous snapshot is still being written."""
+        if self._thread and self._thread.is_alive():
+            return False
+
+        self.generation += 1
+
+        def run():
+            with self._lock:
+                LineStore(self.path).save(df)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return True
+
+    def discard(self, generation=None):
+        """Removes the recovery store once its contents have been saved to the project files. If generation is given,
+        the store is only removed if no snapshot has been requested since self.generation had that value."""
+        self.close()
+
+        with self._lock:
+            if generation is None or generation == self.generation:
+                shutil.rmtree(self.path, ignore_errors=True)
+
+    def close(self):
+        """Waits for a snapshot that is being written to finish."""
+        thread = self._thread
+
+        if thread and thread is not threading.current_thread():
+            thread.join()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch runs of the match -> LOPT -> export pipeline over many projects.
+
+The projects are listed in a manifest, a text file with one project .ini file per line (blank lines and lines starting
+with # are skipped, relative paths are relative to the manifest). Each project is run on a pool of worker processes,
+and every step of a project is guarded, so a project that fails is reported in the summary and the rest carry on.
+
+Output layout, for a project ni2.ini:
+    <output_dir>/ni2/ni2.log            log of the run of the project
+    <output_dir>/ni2/ni2_matched.lin    matched linelist (or .txt/.parquet, see linelist_export.EXPORT_FORMATS)
+    <output_dir>/ni2/ni2.llf            LOPT level report
+    <output_dir>/ni2/lopt/              LOPT working directory of the project
+    <output_dir>/summary.csv            one row of status and timings per project
+
+LOPT writes its files under fixed names in its working directory, so each project gets its own copy of Lopt.jar and
+the .par template rather than sharing the TAME lopt directory with projects of the same element.
+"""
+
+import os
+import csv
+import time
+import shutil
+import logging
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .engine import Project, MAIN_CONFIG_FILE, LOPT_DIR
+from .linelist_export import EXPORT_FORMATS
+
+LOPT_FILES = ('Lopt.jar', 'lopt_template.par')  # copied into the LOPT working directory of each project
+SUMMARY_FILE = 'summary.csv'
+SUMMARY_FIELDS = ['name', 'status', 'step', 'matched_lines', 'lopt_levels', 'match_time', 'lopt_time', 'export_time',
+                  'total_time', 'error', 'project', 'log']
+LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
+log = logging.getLogger('tame')
+
+
+def read_manifest(filename):
+    """Returns the list of project .ini files in a manifest, as absolute paths."""
+    manifest_dir = os.path.dirname(os.path.abspath(filename))
+    projects = []
+
+    with open(filename, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                projects.append(os.path.normpath(os.path.join(manifest_dir, os.path.expanduser(line))))
+
+    return projects
+
+
+def project_names(project_files):
+    """Returns a name for each project, from its .ini file name, made unique with a numeric suffix."""
+    names = []
+    seen = set()
+
+    for project_file in project_files:
+        stem = os.path.splitext(os.path.basename(project_file))[0]
+        name, n = stem, 1
+
+        while name in seen:
+            n += 1
+            name = f'{stem}_{n}'
+
+        seen.add(name)
+        names.append(name)
+
+    return names
+
+
+def run_batch(project_files, output_dir, main_config_file=MAIN_CONFIG_FILE, lopt_dir=LOPT_DIR, lopt=True, fmt='csv',
+              max_workers=None, progress=None):
+    """Runs the pipeline of every project, on a pool of max_workers processes (one per CPU by default), and writes
+    the summary table to output_dir. progress, if given, is called as progress(num_done, num_projects, result) as each
+    project finishes. Returns the list of results, in the order of project_files."""
+    os.makedirs(output_dir, exist_ok=True)
+    num_projects = len(project_files)
+    jobs = [(project_file, os.path.join(output_dir, name), name, main_config_file, lopt_dir, lopt, fmt)
+            for project_file, name in zip(project_files, project_names(project_files))]
+    results = [None] * num_projects
+
+    if num_projects == 1:  # not worth starting a pool for
+        results[0] = run_project(*jobs[0])
+        if progress:
+            progress(1, 1, results[0])
+    elif num_projects:
+        max_workers = min(num_projects, max_workers or os.cpu_count() or 1)
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_project, *job): i for i, job in enumerate(jobs)}
+
+            for num_done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+
+                try:
+                    results[i] = future.result()
+                except Exception as error:  # the worker process died, e.g. out of memory
+                    results[i] = _result(jobs[i][2], jobs[i][0], jobs[i][1])
+                    results[i].update(status='failed', step='worker', error=f'{type(error).__name__}: {error}')
+
+                if progress:
+                    progress(num_done, num_projects, results[i])
+
+    write_summary(os.path.join(output_dir, SUMMARY_FILE), results)
+    return results
+
+
+def run_project(project_file, project_output_dir, name, main_config_file=MAIN_CONFIG_FILE, lopt_dir=LOPT_DIR,
+                lopt=True, fmt='csv'):
+    """Runs match -> LOPT -> export for one project, logging to its own log file. Never raises: a failure is recorded
+    in the returned result dict, with the step it happened in."""
+    os.makedirs(project_output_dir, exist_ok=True)
+    result = _result(name, project_file, project_output_dir)
+    handler = logging.FileHandler(result['log'], mode='w')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    old_level, old_propagate = log.level, log.propagate
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False  # workers would otherwise interleave their logs on the console
+    project = None
+    step = 'open'
+    start = time.perf_counter()
+
+    try:
+        log.info(f'Project {project_file}')
+        if not os.path.isfile(project_file):  # configparser skips missing files without an error
+            raise FileNotFoundError(f'No such project file: {project_file}')
+
+        work_lopt_dir = os.path.join(project_output_dir, 'lopt')
+
+        if lopt:
+            os.makedirs(work_lopt_dir, exist_ok=True)
+            for filename in LOPT_FILES:
+                shutil.copy2(os.path.join(lopt_dir, filename), work_lopt_dir)
+
+        project = Project.open(project_file, main_config_file, work_lopt_dir)
+
+        step = 'match'
+        with _timer(result, 'match_time'):
+            project.match()
+            project.save_project()
+        result['matched_lines'] = int((project.df.main_desig.str.len() > 0).sum())
+        log.info(f'{result["matched_lines"]} of {len(project.df)} lines matched')
+
+        if lopt:
+            step = 'lopt'
+            with _timer(result, 'lopt_time'):
+                rss, tot_time = project.run_lopt()
+            result['lopt_levels'] = len(project.lopt_levs)
+            log.info(f'LOPT ran successfully:  {rss}. {tot_time}.')
+
+        step = 'export'
+        with _timer(result, 'export_time'):
+            linelist_file = os.path.join(project_output_dir, f'{name}_matched{EXPORT_FORMATS[fmt][1]}')
+            num_lines = project.write_linelist(linelist_file, fmt, full_list=False)
+            log.info(f'{num_lines} lines exported to {linelist_file}')
+
+            if lopt:
+                level_file = os.path.join(project_output_dir, f'{name}.llf')
+                project.write_lopt_levels(level_file)
+                log.info(f'LOPT levels exported to {level_file}')
+
+        result['status'] = 'ok'
+        result['step'] = ''
+    except Exception as error:
+        result['status'] = 'failed'
+        result['step'] = step
+        result['error'] = ' '.join(f'{getattr(error, "title", type(error).__name__)}: {error}'.split())
+        log.error(f'Failed at {step}:\n{traceback.format_exc()}')
+    finally:
+        if project is not None:
+            try:
+                project.close()
+            except Exception:
+                log.exception('Could not close the project')
+
+        result['total_time'] = time.perf_counter() - start
+        log.info(f'Finished in {result["total_time"]:.2f} s')
+        log.removeHandler(handler)
+        handler.close()
+        log.setLevel(old_level)
+        log.propagate = old_propagate
+
+    return result
+
+
+def write_summary(filename, results):
+    """Writes the results of a batch run as CSV."""
+    with open(filename, 'w', newline='') as file:
+        writer = csv.DictWriter(file, SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def format_summary(results):
+    """Returns the results of a batch run as a text table."""
+    width = max([len('Project')] + [len(x['name']) for x in results])
+    lines = [f'{"Project":<{width}}  Status  {"Matched":>7}  {"Levels":>6}  {"Match s":>8}  {"LOPT s":>8}  '
+             f'{"Export s":>8}  {"Total s":>8}  Error']
+
+    for x in results:
+        lines.append(f'{x["name"]:<{width}}  {x["status"]:<6}  {_cell(x["matched_lines"], "7d")}  '
+                     f'{_cell(x["lopt_levels"], "6d")}  {_cell(x["match_time"], "8.2f")}  {_cell(x["lopt_time"], "8.2f")}  '
+                     f'{_cell(x["export_time"], "8.2f")}  {_cell(x["total_time"], "8.2f")}  '
+                     f'{x["step"] + ": " + x["error"] if x["error"] else ""}')
+
+    num_failed = sum(x['status'] != 'ok' for x in results)
+    lines.append(f'{len(results) - num_failed} of {len(results)} projects succeeded.')
+    return '\n'.join(lines)
+
+
+def _result(name, project_file, project_output_dir):
+    """Returns the result dict of a project that has not run yet."""
+    return {'name': name, 'project': project_file, 'status': 'failed', 'step': '', 'error': '',
+            'matched_lines': None, 'lopt_levels': None, 'match_time': None, 'lopt_time': None, 'export_time': None,
+            'total_time': None, 'log': os.path.join(project_output_dir, f'{name}.log')}
+
+
+def _cell(value, spec):
+    """Formats a summary table cell, with a dash for a step that did not run."""
+    width = int(spec.rstrip('df').split('.')[0])
+    return f'{"-":>{width}}' if value is None else format(value, spec)
+
+
+class _timer(object):
+    """Context manager that stores the time taken by its block in result[key], even if the block raises."""
+    def __init__(self, result, key):
+        self.result = result
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.result[self.key] = time.perf_counter() - self.start
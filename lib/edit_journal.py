@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only journal of the user edits made to a TAME project.
+
+Edits to lines (tags, user designations, comments), level comments and the STRANS input levels are appended to the
+journal as they happen and flushed to disk straight away by a writer thread, so the caller (usually the UI thread)
+never waits on the disk. A crash therefore loses at most the records still being written, and saving a project no
+longer has to rewrite the whole line store because of a single changed checkbox. The journal is replayed on top of the
+saved project files when the project is opened, and is compacted (folded back into the project files) when it grows.
+
+Each record is one line of JSON with an 'op' key. Replaying a record must be idempotent, as a crash part way through a
+compaction can leave records in the journal that are already in the project files.
+
+A {"op": "save"} record marks the last point at which the user saved the project. Edits made after it are removed by
+rollback() when the user closes the project without saving.
+"""
+
+import os
+import glob
+import json
+import queue
+import logging
+import threading
+
+SAVE_OP = 'save'
+
+log = logging.getLogger('tame')
+
+
+def journal_path(store_path):
+    """Returns the journal filename for a project line store."""
+    return os.path.splitext(store_path.rstrip('/'))[0] + '.journal'
+
+
+def line_edits(records):
+    """Yields the {'wavenumber', 'column', 'value'} edit of each line from the 'line' records of a journal and the
+    'lines' records, which hold the same edit to many lines (e.g. tagging a selection of lines)."""
+    for record in records:
+        if record['op'] == 'line':
+            yield record
+        elif record['op'] == 'lines':
+            for wavenumber, value in zip(record['wavenumbers'], record['values']):
+                yield {'wavenumber': wavenumber, 'column': record['column'], 'value': value}
+
+
+class EditJournal(object):
+    """An append-only log of project edits, split into segments when it is compacted."""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(self.path, 'a')
+        self._lock = threading.Lock()  # held while the current segment is written to or rotated
+        self._compact_lock = threading.Lock()  # held while a compaction writes its snapshot
+        self._compactor = None
+        self.saved_offset = self._file.tell()  # edits replayed after a crash count as saved
+        self._queue = queue.Queue()  # (op, record) waiting for the writer thread, None stops it
+        self._writer = threading.Thread(target=self._write_records, daemon=True)
+        self._writer.start()
+        self.num_records = sum(1 for x in self.records())
+
+    def __len__(self):
+        return self.num_records
+
+    def append(self, op, **fields):
+        """Appends an edit to the journal. The record is written and synced to the disk by the writer thread, see
+        flush()."""
+        fields['op'] = op
+        self._queue.put((op, json.dumps(fields, separators=(',', ':')) + '\n'))
+        self.num_records += 1
+
+    def flush(self):
+        """Waits until every edit appended so far has reached the disk."""
+        self._queue.join()
+
+    def mark_saved(self):
+        """Records that the user has saved the project. The saved offset is moved on once the record is written."""
+        self.append(SAVE_OP)
+
+    def rollback(self):
+        """Removes any edits made since the project was last saved."""
+        self.flush()
+
+        with self._lock:
+            self._file.truncate(self.saved_offset)
+            self._file.seek(self.saved_offset)
+
+        self.num_records = sum(1 for x in self.records())
+
+    def records(self):
+        """Yields every edit in the journal, oldest first. A partially written final record (e.g. from a crash) is
+        ignored."""
+        self.flush()
+
+        for segment in self._segments() + [self.path]:
+            with open(segment, 'r') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+
+                    if record['op'] != SAVE_OP:
+                        yield record
+
+    def compact(self, write_snapshot, background=False):
+        """Folds the journal into the project files. The current segment is set aside so that new edits go to a fresh
+        one, then write_snapshot is called, which must write project files that include every edit recorded so far.
+        The old segments are deleted once it returns, and kept if it raises. With background=True the snapshot is
+        written on a worker thread."""
+        self.flush()
+
+        with self._lock:
+            self._file.close()
+            os.replace(self.path, f'{self.path}.{self._next_segment()}')
+            self._file = open(self.path, 'a')
+            self.saved_offset = 0
+            self.num_records = 0
+
+        segments = self._segments()
+
+        def run():
+            with self._compact_lock:
+                try:
+                    write_snapshot()
+                except Exception:
+                    if not background:
+                        raise
+                    return  # the old segments are kept, so their edits are replayed; write_snapshot reports the error
+
+                for segment in segments:
+                    try:
+                        os.remove(segment)
+                    except FileNotFoundError:  # already removed by an earlier compaction that was still running
+                        pass
+
+        if background:
+            self._compactor = threading.Thread(target=run, daemon=True)
+            self._compactor.start()
+        else:
+            run()
+
+    def compacting(self):
+        """True while a background compaction is writing its snapshot."""
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def close(self):
+        """Waits for any background compaction to finish and closes the journal."""
+        if self._compactor:
+            self._compactor.join()
+
+        self._queue.put(None)
+        self._writer.join()
+
+        with self._lock:
+            self._file.close()
+
+    def _write_records(self):
+        """Writer thread. Writes the queued records, syncing the file once for each batch of records that arrived
+        together (e.g. while the previous batch was being synced)."""
+        stop = False
+
+        while not stop:
+            batch = [self._queue.get()]
+
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                with self._lock:
+                    for item in batch:
+                        if item is None:
+                            stop = True
+                            continue
+
+                        op, record = item
+                        self._file.write(record)
+
+                        if op == SAVE_OP:
+                            self._file.flush()
+                            self.saved_offset = self._file.tell()
+
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+            except (OSError, ValueError):  # e.g. the disk is full
+                log.exception('Could not write to the edit journal')
+            finally:
+                for item in batch:
+                    self._queue.task_done()
+
+    def _segments(self):
+        """Returns the filenames of segments set aside by compactions that have not finished, oldest first."""
+        segments = [x for x in glob.glob(glob.escape(self.path) + '.*') if x.rsplit('.', 1)[-1].isdigit()]
+        return sorted(segments, key=lambda x: int(x.rsplit('.', 1)[-1]))
+
+    def _next_segment(self):
+        """Returns the number for the next segment."""
+        segments = self._segments()
+
+        if segments:
+            return int(segments[-1].rsplit('.', 1)[-1]) + 1
+        return 1
@@ -0,0 +1,833 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The TAME engine. Everything that TAME computes, without the GUI.
+
+A Project reads a project from its .ini file and data files, runs line matching (STRANS), LOPT and level prediction
+(LEVHAMS), exports the results and saves the project. It does not use wx, so it can be run on a machine without a
+display, e.g. from the command line interface (tame_cli.py) or a script:
+
+    project = Project.open('ni2.ini')
+    project.match()
+    project.save_project()
+    project.close()
+
+The GUI (tame.py) is a Project too, and shows the results. Progress messages go to status(), which the GUI shows in
+its status bar, and errors that the user can correct are raised as ProjectError, which the GUI shows in a message box.
+"""
+
+import os
+import bisect
+import logging
+import configparser
+import subprocess
+import numpy as np
+import pandas as pd
+
+from . import Filter
+from . import linelist_export
+from .line_store import LineStore, store_path
+from .edit_journal import EditJournal, journal_path, line_edits
+from .autosave import Autosave, autosave_path, atomic_open
+from .lopt_report import write_level_report
+from .project_db import ProjectDatabase, is_project_db
+from .line_tags import MULTIPLE_LINES, TAGS_DTYPE, set_tag, tags_from_dicts
+
+TAME_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_CONFIG_FILE = os.path.join(TAME_DIR, 'config', 'tame.ini')
+LOPT_DIR = os.path.join(TAME_DIR, 'lopt')  # Lopt.jar and the .par template
+JOURNAL_COMPACT_RECORDS = 1000  # edit journal is folded into the project files on save once it holds this many edits
+BLANK_LEVEL = {'label': '', 'j':0.0 , 'energy':0.0 , 'parity':0}
+
+log = logging.getLogger('tame')
+
+
+class ProjectError(Exception):
+    """An error that the user can correct, e.g. running STRANS with blank levels. title is a short summary."""
+    def __init__(self, message, title='TAME Error'):
+        Exception.__init__(self, message)
+        self.title = title
+
+
+class Project(object):
+    """A TAME project, read from its .ini file."""
+    def __init__(self, main_config_file=MAIN_CONFIG_FILE, lopt_dir=LOPT_DIR):
+        """Nothing is read here, see open()."""
+        self.main_config_file = main_config_file
+        self.lopt_dir = lopt_dir
+        self.journal = None
+        self.autosave = None
+        self.lopt_output_lines = None
+        
+    @classmethod
+    def open(cls, project_config_file, main_config_file=MAIN_CONFIG_FILE, lopt_dir=LOPT_DIR):
+        """Reads the project with the given .ini file."""
+        project = cls(main_config_file, lopt_dir)
+        project.load_main_config()
+        project.project_config_file = project_config_file
+        project.read_project()
+        
+        return project
+    
+    def status(self, message):
+        """Reports the progress of a long running task."""
+        log.info(message)
+        
+    def load_main_config(self):
+        """Reads the main TAME config file and sets variables accordingly. The main config is optional when a project is
+        opened with Project.open(), so everything falls back to the defaults."""
+        self.main_config = configparser.ConfigParser()
+        self.main_config.read(self.main_config_file)
+        
+        self.project_config_file = self.main_config.get('project', 'project_config', fallback=None)
+        self.lopt_default_unc = self.main_config.getfloat('lopt', 'default_unc', fallback=2.0)
+        self.autosave_minutes = self.main_config.getfloat('autosave', 'minutes', fallback=5.0)  # 0 turns autosave off
+
+    def load_project_config(self):
+        """Reads the project config file and sets variables accordingly"""
+        self.project_config = configparser.ConfigParser()
+        self.project_config.read(self.project_config_file)
+
+        self.strans_lev_file = self.project_config.get('files', 'strans_lev_file')
+        self.strans_lin_file = self.project_config.get('files', 'strans_lin_file')
+        self.df_file = self.project_config.get('files', 'df_file')
+        self.plot_df_file = self.project_config.get('files', 'plot_file')
+        self.plot_dtype = np.float32 if self.project_config.getboolean('files', 'plot_float32', fallback=False) else np.float64
+        self.lopt_lev_comments_file = self.project_config.get('files', 'lopt_lev_comments_file')
+        self.other_lev_list = self.project_config.get('files', 'other_lev_files').split('\n')
+
+        self.lopt_fixed_levels = self.project_config.get('lopt', 'fixed_levels').split(',')
+        self.star_discrim = self.project_config.getfloat('lopt', 'star_discrim')
+        self.lopt_plot_width = self.project_config.getfloat('lopt', 'plot_width')
+        
+        self.strans_wn_discrim = self.project_config.getfloat('strans', 'wn_discrim')
+      
+        self.main_element_name = self.project_config.get('tame', 'main_element_name').strip("'")        
+        self.project_title = self.project_config.get('tame', 'project_title').strip("'")
+
+    def read_project(self):
+        """Reads the project config and all project files."""
+        self.load_project_config()
+        
+        self.lopt_inp_file = os.path.join(self.lopt_dir, f'{self.main_element_name}_lopt.inp')
+        self.lopt_par_file = os.path.join(self.lopt_dir, f'{self.main_element_name}_lopt.par')
+        self.lopt_fixed_file = os.path.join(self.lopt_dir, f'{self.main_element_name}_lopt.fixed')
+        self.lopt_lev_file = os.path.join(self.lopt_dir, f'{self.main_element_name}_lopt.lev')
+        self.lopt_lin_file = os.path.join(self.lopt_dir, f'{self.main_element_name}_lopt.lin')
+        self.lopt_output_lines = None  # LOPT output of the previously loaded project
+          
+        if self.journal:  # close the journal of the previously loaded project
+            self.journal.close()
+            self.autosave.close()
+          
+        self.df_dirty = False  # True when self.df has changes that are not recorded in the edit journal
+        self.dirty_columns = set()  # columns of self.df changed since the line store was written, None for all
+        self.load_df() 
+        self.autosave = Autosave(autosave_path(self.line_store.path))
+        
+        if self.autosave.exists():  # TAME did not exit cleanly, line matching done since the last save is in the autosave
+            self.df = self.autosave.load()
+            self.df_dirty = True
+            self.dirty_columns = None
+            self.status('Unsaved line matching recovered from autosave')
+        self.load_strans_levs()
+        self.load_lopt_lev_comments()
+        self.replay_journal()
+
+    def load_df(self):
+        """Loads the main lines df from the project line store, or the project database if the df_file of the project
+        is an SQLite file. Creates a new df if this is a new project."""
+        if is_project_db(self.df_file):
+            self.project_db = ProjectDatabase(self.df_file)
+            self.line_store = self.project_db  # has the same load()/save() interface as a line store
+        else:
+            self.project_db = None
+            self.line_store = LineStore(store_path(self.df_file))
+        
+        if not self.line_store.exists():
+            if os.path.isfile(self.df_file) and not self.project_db:  # project saved as a pickle before the line store was introduced
+                self.df = pd.read_pickle(self.df_file)
+                self.save_df()
+            else:  # if no existing DataFrame is present
+                self.create_df(self.strans_lin_file)
+            
+        self.df = self.line_store.load()  
+        
+        if self.df['user_desig'].dtype != object:  # pandas reads a column of '' as str, which can't hold the dicts
+            self.df['user_desig'] = self.df['user_desig'].astype(object)
+
+        if self.df['line_tags'].dtype == object:  # project saved when line tags were stored as a dict per line
+            self.df['line_tags'], self.df['user_unc'] = tags_from_dicts(self.df['line_tags'].values)
+            self.df_dirty = True
+            self.columns_changed('line_tags', 'user_unc')
+
+    def create_df(self, lines_file):
+        """Creates a new pandas DataFrame from a list of lines in 'lines_file' and saves it to the line store."""
+        self.df = pd.read_csv(lines_file, float_precision='high')  # create new dataframe from the input lines file 
+        self.df['main_desig'] = np.empty((len(self.df), 0)).tolist()  # append column of empty lists.
+        self.df['other_desig'] = np.empty((len(self.df), 0)).tolist()  # append column of empty lists.
+        self.df['user_desig'] = pd.Series('', index=self.df.index, dtype=object)
+        self.df['line_tags'] = np.zeros(len(self.df), dtype=TAGS_DTYPE)  # bitmask of user tags, see lib/line_tags.py
+        self.df['comments'] = ''
+        self.df['user_unc'] = np.nan  # user defined uncertainty, NaN if not set
+        self.save_df()
+
+    def save_df(self):
+        """Saves the main pandas DataFrame self.df to the line store. Only columns that have changed since the last
+        save are rewritten."""
+        if not self.df['wavenumber'].is_monotonic_increasing:  # resorting an already sorted df would touch every column
+            self.df = self.df.sort_values(by=['wavenumber'])
+        self.line_store.save(self.df)
+
+    def load_strans_levs(self):
+        """Loads the STRANS input levels from the project database, or from the .lev file if the project does not use
+        a database (or it is a new project and the levels have not been saved to it yet)."""
+        self.strans_levs = self.project_db.load_levels() if self.project_db else None
+        
+        if self.strans_levs is None:
+            self.strans_levs = pd.read_csv(self.strans_lev_file, dtype={'parity':float}).to_dict('records')
+
+    def load_lopt_lev_comments(self):
+        """Load the comments for each level. If the pkl file is missing - create it from the strans levels"""        
+        self.lev_comment_rows = None  # designation: index map of lopt_lev_comments, see lev_comment_index()
+        self.lopt_lev_comments = self.project_db.load_level_comments() if self.project_db else None
+        
+        if self.lopt_lev_comments is not None:  # comments are in the project database
+            return
+        elif self.project_db or not os.path.isfile(self.lopt_lev_comments_file):  # if no existing DataFrame is present
+            strans_desigs = [lev['label'] for lev in self.strans_levs]
+            self.lopt_lev_comments = pd.DataFrame(strans_desigs, columns=['Designation'])
+            self.lopt_lev_comments['Comments'] = ''
+            self.save_lev_comments_df()
+        else:
+            self.lopt_lev_comments = pd.read_pickle(self.lopt_lev_comments_file)
+            # old_lopt_levs = self.lopt_lev_comments['Designation'].values.tolist()        
+            # current_lopt_levs= self.lopt_levs['Designation'].values.tolist()            
+            # new_levs = [{'Designation':x, 'Comments':''} for x in current_lopt_levs if x not in old_lopt_levs]
+
+            # for lev in new_levs:
+            #     self.lopt_lev_comments = self.lopt_lev_comments.append(lev, ignore_index=True)
+
+    def replay_journal(self):
+        """Opens the project edit journal and applies any edits that have not yet been compacted into the project
+        files."""
+        self.journal = EditJournal(journal_path(self.line_store.path))
+        
+        for edit in self.journal.records():
+            try:
+                self.replay_edit(edit)
+            except Exception:  # a bad record must not stop the project from opening
+                log.warning(f"Skipped a {edit.get('op')} edit in the journal that could not be applied", exc_info=True)
+
+    def replay_edit(self, edit):
+        """Applies one record of the edit journal."""
+        if edit['op'] == 'line':
+            try:
+                self.update_df_cell(edit['wavenumber'], edit['column'], edit['value'], journal=False)
+            except IndexError:  # line is no longer in the linelist
+                pass
+        elif edit['op'] == 'lines':  # lines no longer in the linelist are ignored
+            self.update_df_cells(edit['wavenumbers'], edit['column'], np.array(edit['values']), journal=False)
+        elif edit['op'] == 'lev_comment':
+            self.set_lev_comment(edit['designation'], edit['comments'], journal=False)
+        elif edit['op'] == 'lev_rename':
+            self.rename_lev_comment(edit['old'], edit['new'], journal=False)
+        elif edit['op'] == 'lev_set':
+            self.strans_levs[edit['index']][edit['key']] = edit['value']
+        elif edit['op'] == 'levels':
+            self.strans_levs = edit['levels']
+
+    def journal_strans_levs(self):
+        """Records the whole list of STRANS levels in the edit journal. Used when levels are added or deleted."""
+        self.journal.append('levels', levels=self.strans_levs)
+
+    def save_project(self, background=False):
+        """Saves the project. User edits to lines, levels and comments are already on disk in the edit journal, so
+        the project files are only rewritten if STRANS has changed self.df or the journal has grown long. In the
+        latter case the journal is compacted, in the background if background is True."""
+        self.save_project_config()
+        
+        if self.df_dirty:
+            self.compact_journal(background)
+        else:
+            self.journal.mark_saved()
+            
+            if len(self.journal) >= JOURNAL_COMPACT_RECORDS:
+                self.compact_journal(background)
+
+    def compact_journal(self, background=False):
+        """Writes a snapshot of the lines, levels and level comments to the project files and empties the edit
+        journal. The snapshot is taken here, so the UI can carry on editing while a background compaction writes it."""
+        if not self.df['wavenumber'].is_monotonic_increasing:
+            self.df = self.df.sort_values(by=['wavenumber'])
+            self.dirty_columns = None
+            
+        df = self.df.copy()
+        dirty_columns = self.dirty_columns
+        strans_levs = [dict(lev) for lev in self.strans_levs]
+        lev_comments = self.lopt_lev_comments.copy()
+        
+        if self.project_db and not self.df_dirty:  # only the edited lines need to be written to the database
+            edits = list(line_edits(self.journal.records()))
+        else:
+            edits = None
+            
+        self.df_dirty = False
+        self.dirty_columns = set()
+        autosave_generation = self.autosave.generation
+        
+        def write_snapshot():
+            try:
+                if edits is None:
+                    self.line_store.save(df, dirty_columns)
+                else:
+                    self.project_db.update_lines(edits)
+                self.save_strans_levs(strans_levs)
+                self.save_lev_comments_df(lev_comments)
+            except Exception as error:  # the journal segments are kept, but line matching is only in self.df
+                self.df_dirty = True
+                self.dirty_columns = None if self.dirty_columns is None or dirty_columns is None else self.dirty_columns | dirty_columns
+                
+                if background:
+                    self.save_failed(error)
+                raise
+                
+            self.autosave.discard(autosave_generation)  # unless line matching has been run again since the snapshot
+            
+        self.journal.compact(write_snapshot, background)
+
+    def save_failed(self, error):
+        """Called on the worker thread when a background save fails. The project is marked as unsaved again, so the
+        next save or autosave retries it."""
+        log.error(f'The project could not be saved: {error}')
+
+    def save_lev_comments_df(self, lev_comments=None):
+        """Saves the lopt level comments to the project database or the correct pickle file."""
+        if lev_comments is None:
+            lev_comments = self.lopt_lev_comments
+            
+        if self.project_db:
+            self.project_db.save_level_comments(lev_comments)
+        else:
+            with atomic_open(self.lopt_lev_comments_file, 'wb') as comments_file:
+                lev_comments.to_pickle(comments_file)
+
+    def save_strans_levs(self, strans_levs=None):
+        """Writes the levels in TAME to the .lev file. This is needed for user changes that have been made within TAME."""
+        if strans_levs is None:
+            strans_levs = self.strans_levs
+            
+        if self.project_db:
+            self.project_db.save_levels(strans_levs)
+            return
+            
+        with atomic_open(self.strans_lev_file) as lev_file:
+            lev_file.write('label,j,energy,parity\n')
+            
+            for lev in strans_levs:
+                lev_file.write(f"{lev['label']},{lev['j']},{lev['energy']},{lev['parity']}\n")
+
+    def save_project_config(self):
+        """Save the project config."""  
+        with atomic_open(self.project_config_file) as configfile:
+            self.project_config.write(configfile)
+                                      
+        log.info(f'Project config saved to {self.project_config_file}')
+
+    def update_df_cell(self, wavenumber, column, value, journal=True):
+        """Updates a cell of the main self.df dataframe, specified by wavenumber and column, with value. The edit
+        is recorded in the project edit journal unless journal is False."""   
+        selected_line_index = self.line_index(wavenumber)
+        self.df.at[selected_line_index, column] = value  # just updates a single value
+        self.columns_changed(column)
+        
+        if journal:
+            self.journal.append('line', wavenumber=float(wavenumber), column=column, value=value)
+            
+        self.lines_changed(np.array([wavenumber], dtype=float), column)
+
+    def update_df_cells(self, wavenumbers, column, values, journal=True):
+        """Updates a column of the main self.df dataframe for many lines, given by an array of wavenumbers, with one
+        vectorised write and a single edit journal record. values is an array with a value for each line, or a single
+        value for all of them. Lines that are not in the linelist are ignored."""
+        positions, found = self.line_positions(wavenumbers)
+        wavenumbers = np.asarray(wavenumbers, dtype=float)[found]
+        
+        if np.ndim(values):
+            values = np.asarray(values)[found]
+        else:
+            values = np.full(len(wavenumbers), values)
+        
+        if self.df[column].dtype != object:  # keeps e.g. the uint8 line tags from being upcast
+            values = values.astype(self.df[column].dtype)
+        
+        self.df.iloc[positions, self.df.columns.get_loc(column)] = values
+        self.columns_changed(column)
+        
+        if journal and len(wavenumbers):
+            self.journal.append('lines', wavenumbers=wavenumbers.tolist(), column=column, values=values.tolist())
+            
+        self.lines_changed(wavenumbers, column)
+
+    def columns_changed(self, *columns):
+        """Records that columns of self.df have changed, so that the next compaction rewrites them in the line store."""
+        if self.dirty_columns is not None:
+            self.dirty_columns.update(columns)
+
+    def lines_changed(self, wavenumbers, column):
+        """Called after a column of self.df has been edited for the lines with the given wavenumbers. The GUI uses
+        this to bring its line lists up to date."""
+        pass
+
+    def get_df_cell(self, wavenumber, column):
+        """Gets the value of a cell in the main self.df dataframe for a given wavenumber and column."""
+        return self.df.at[self.line_index(wavenumber), column]
+
+    def line_index(self, wavenumber):
+        """Returns the index of the line in self.df with the given wavenumber. self.df is always sorted by wavenumber,
+        so the line is found by binary search rather than by comparing every wavenumber in the linelist. Raises
+        IndexError if there is no line with that wavenumber."""
+        wavenumbers = self.df['wavenumber'].values
+        position = np.searchsorted(wavenumbers, wavenumber)
+        
+        if position == len(wavenumbers) or wavenumbers[position] != wavenumber:
+            raise IndexError(f'No line with wavenumber {wavenumber}')
+        return self.df.index[position]
+
+    def line_positions(self, wavenumbers):
+        """Returns the positions in self.df of the lines with the given wavenumbers, found by binary search, and a
+        boolean mask of which of the wavenumbers are in the linelist (the positions are only given for those)."""
+        wavenumbers = np.asarray(wavenumbers, dtype=float)
+        linelist = self.df['wavenumber'].values
+        positions = np.minimum(np.searchsorted(linelist, wavenumbers), max(len(linelist) - 1, 0))
+        found = linelist[positions] == wavenumbers if len(linelist) else np.zeros(len(wavenumbers), dtype=bool)
+        
+        return positions[found], found
+
+    def set_lev_comment(self, designation, comments, journal=True):
+        """Sets the user comments of a level in the lopt_lev_comments df."""
+        try:
+            lev_index = self.lev_comment_index(designation)
+        except KeyError:  # level has no row in lopt_lev_comments
+            return
+        
+        self.lopt_lev_comments.at[lev_index, 'Comments'] = comments  # updates level with the comments
+            
+        if journal:
+            self.journal.append('lev_comment', designation=designation, comments=comments)
+
+    def lev_comment_index(self, designation):
+        """Returns the index of a level in the lopt_lev_comments df. The designation: index map is built once and kept
+        until the designations in lopt_lev_comments change. Raises KeyError if the level is not in the df."""
+        if self.lev_comment_rows is None:
+            desigs = self.lopt_lev_comments['Designation'].values.tolist()
+            self.lev_comment_rows = {desig: index for desig, index in reversed(list(zip(desigs, self.lopt_lev_comments.index)))}
+            
+        return self.lev_comment_rows[designation]
+
+    def rename_lev_comment(self, old_desig, new_desig, journal=True):
+        """Updates the lopt_lev_comments df when the user changes the designation of a level. Creates a new row if
+        the level has no comments yet (i.e. it is a newly added level). The rename is recorded in the journal once
+        the df has been updated, so a rename that fails is never replayed."""
+        if new_desig not in self.lopt_lev_comments['Designation'].values:  # not already renamed, e.g. when replaying the journal
+            self.lev_comment_rows = None  # designations are about to change
+            
+            try:  # this will work if the level being edited is in self.lopt_lev_comments
+                selected_line_index = self.lopt_lev_comments.loc[self.lopt_lev_comments['Designation'] == old_desig].index.values[0]
+                self.lopt_lev_comments.at[selected_line_index, 'Designation'] = new_desig # just updates a single value
+            except IndexError:  # a newly added level has been edited by the user
+                new_lev = pd.DataFrame([{'Designation': new_desig, 'Comments': ''}])
+                self.lopt_lev_comments = pd.concat([self.lopt_lev_comments, new_lev], ignore_index=True)
+        
+        if journal:
+            self.journal.append('lev_rename', old=old_desig, new=new_desig)
+
+    def match(self, full=True):
+        """Runs STRANS for the main element, and then for all the other elements of the project if full is True."""
+        self.match_main_element()
+        
+        if full:
+            self.match_other_elements()
+            
+    def match_main_element(self, strans_levs=None):
+        """Runs strans for the main element under study, with the STRANS input levels of the project unless other
+        levels are given. Raises ProjectError if the levels cannot be used."""
+        if strans_levs is None:
+            strans_levs = self.strans_levs
+        
+        if BLANK_LEVEL in strans_levs:
+            raise ProjectError('STRANS input contains blank levels. \n\nPlease edit or delete these before running STRANS.', 'Blank Levels Found')
+        
+        if not all(len(label) <= 10 for label in [lev['label'] for lev in strans_levs]):
+            raise ProjectError('One or more level labels are too long. The maximum label length is 10 characters. \n\nPlease edit or delete these before running STRANS.', 'Level Label(s) Too Long')
+        
+        self.df['main_desig'] = np.empty((len(self.df), 0)).tolist()  # replaces any values in main_desig column with empty lists
+        tag_sep_linelist = self.get_tag_sep_linelist()
+        desig_list = self.df[['wavenumber', 'main_desig', 'line_tags']].values.tolist()  # list of all lines in the linelist
+          
+        matched_lines = self.strans(strans_levs, desig_list, self.main_element_name, tag_sep_linelist)          
+        self.df.update(matched_lines)  # update the main df with designations from strans
+        self.df['line_tags'] = np.array([line[2] for line in matched_lines], dtype=TAGS_DTYPE)  # multiple_lines tags set by strans
+        self.df_dirty = True
+        self.columns_changed('main_desig', 'line_tags')
+        
+    def match_other_elements(self, other_lev_list=None):
+        """Runs strans for all other elements that could be present in the linelist, from the other level files of
+        the project unless others are given as 'element_name,level_file' strings."""
+        if other_lev_list is None:
+            other_lev_list = self.other_lev_list
+            
+        self.df['other_desig'] = np.empty((len(self.df), 0)).tolist()  # replaces any values in other_desig column with empty lists
+        desig_list = self.df[['wavenumber', 'other_desig', 'line_tags']].values.tolist()
+        tag_sep_linelist = self.get_tag_sep_linelist()
+        
+        for other_lev in other_lev_list:
+            if not other_lev.strip():  # no other level files in the project config
+                continue
+            
+            element_name, level_file = other_lev.split(',')
+            strans_levs = pd.read_csv(level_file).to_dict('records')
+            self.strans(strans_levs, desig_list, element_name, tag_sep_linelist)
+
+        self.df.update(desig_list)  # update the main df with designations from strans  
+        self.df['line_tags'] = np.array([line[2] for line in desig_list], dtype=TAGS_DTYPE)  # multiple_lines tags set by strans
+        self.df_dirty = True
+        self.columns_changed('other_desig', 'line_tags')
+
+    def get_tag_sep_linelist(self):
+        """returns a dictionary of lists of lines separated by tag type"""        
+        desig_list = {}
+        tags = self.df.tags.unique()  # get list of all tags for lines (L, G, P etc.)
+        
+        for tag in tags:
+            desig_list[tag] = self.df[['wavenumber', 'main_desig', 'line_tags']].loc[self.df['tags'] == tag].values.tolist()    
+            
+        return desig_list
+
+    def strans(self, strans_levs, desig_list, element_name, tag_sep_linelist):
+        """Creates list of all possible transitions between levels of opposite parity that obey
+        the J selection rule. The list is then compared to all lines in the self.df database and lines with 
+        wavenumbers that match within self.strans_wn_discrim are assigned the labels of the even and odd level.
+        Inputs:
+            strans_levs: list of levels to be used in strans
+            desig_list: list of [wavenumber, [level assignment dicts], line tags bitmask] for every line
+            element_name: name of level's element'
+        """     
+        self.status(f'Running Line Matching for {element_name}')
+                
+        strans_levs_even = [x for x in strans_levs if x['parity']==1]
+        strans_levs_odd = [x for x in strans_levs if x['parity']==0]
+        
+        strans_levs_even = sorted(strans_levs_even, key=lambda x: x['j'])  # sorting by j value.
+        strans_levs_odd = sorted(strans_levs_odd, key=lambda x: x['j'])
+        
+        self.strans_wn_discrim = {'P': 0.1, 'L': 0.02, 'G': 0.02, 'I': 0.02, 'F': 0.02}
+        
+        for even_lev in strans_levs_even:    
+            j_even = even_lev['j']
+            
+            if j_even == 0.0:  # J selection rule J != 0 to 0
+                left_j = bisect.bisect_left(KeyList(strans_levs_odd, key=lambda x: x['j']), j_even + 1)  # returns index of leftmost match
+            else:  # the other J selection 
+                left_j = bisect.bisect_left(KeyList(strans_levs_odd, key=lambda x: x['j']), j_even - 1)
+                
+            right_j = bisect.bisect_right(KeyList(strans_levs_odd, key=lambda x: x['j']), j_even + 1)  # returns index of leftmost match
+               
+            for odd_lev in strans_levs_odd[left_j:right_j]:  # strans_levs_odd now reduced to levels with J values in line with selection rules.             
+                label_even = even_lev['label']
+                label_odd = odd_lev['label']
+                energy_even = even_lev['energy']
+                energy_odd = odd_lev['energy']                   
+                match_wn = abs(energy_even - energy_odd)
+                
+                matched_lines = []
+                
+                for tag in tag_sep_linelist:  # find all matched lines, with wn matching tolerance set by tag type
+                    wn_discrim = self.strans_wn_discrim[tag]  # get wn_discrim for the type of tag
+                                        
+                    left = bisect.bisect_left(KeyList(tag_sep_linelist[tag], key=lambda x: x[0]), match_wn - wn_discrim)  # x[0] is line wavenumber
+                    right = bisect.bisect_left(KeyList(tag_sep_linelist[tag], key=lambda x: x[0]), match_wn + wn_discrim)
+                
+                    matched_lines += tag_sep_linelist[tag][left:right]  # add the list of matched lines to the main matched_lines list
+
+                for matched_line in matched_lines:
+                    #matched line is a list of:[line wavenumber, [level assignment dicts], {line tags}]
+                    
+                    desig_index = next(i for i,v in enumerate(desig_list) if matched_line[0] in v)  # this gives the index of matched_line in the main desig_list
+                    
+                    if len(matched_lines) > 1:  # multiple lines match this transtion
+                        desig_list[desig_index][2] = set_tag(desig_list[desig_index][2], MULTIPLE_LINES, True)
+                    
+                    if energy_even > energy_odd:  # assign upper and lower levels correctly (LOPT needs them in lower-upper format)
+                        upper_lev = label_even
+                        lower_lev = label_odd
+                    else:
+                        upper_lev = label_odd
+                        lower_lev = label_even    
+                    
+                    # because we found the desig_list index, we can modify the desig_list item directly                        
+                    desig_list[desig_index][1].append({'upper_level':upper_lev, 'lower_level':lower_lev, 'element_name': element_name})  # this is being added to the lines in desig_list that were matched.
+            
+        return desig_list
+
+    def run_lopt(self):
+        """Writes the LOPT input files, runs LOPT and reads its output. Returns the RSS/degrees of freedom and the
+        total time lines of the LOPT output. Raises ProjectError if LOPT cannot be run."""
+        if not [x for x in self.lopt_fixed_levels if x]:
+            raise ProjectError('At least one level must be fixed.', 'Fixed Level Error')
+        
+        unknown_levels = self.unknown_fixed_levels()
+        if unknown_levels:
+            raise ProjectError(f'The fixed level(s) {", ".join(unknown_levels)} are not in the STRANS input levels.', 'Fixed Level Error')
+        
+        self.status('Writing LOPT input files...')
+        
+        if not self.write_lopt_inp():
+            raise ProjectError('No lines found for LOPT input. Please run STRANS first', 'No Matched Lines')
+        
+        self.write_lopt_par()
+        self.write_lopt_fixed()
+        self.status('Running LOPT...')
+        
+        try:
+            output = subprocess.run(['java', '-jar', 'Lopt.jar', os.path.basename(self.lopt_par_file)], cwd=self.lopt_dir, 
+                                    capture_output=True, text=True).stdout.split('\n')  # run LOPT and get output as a list of lines
+        except FileNotFoundError as fnf:
+            if 'java' in str(fnf):
+                raise ProjectError('Java Runtime Environment (JRE) is not installed on this machine. \n\nPlease install and restart Tame.', 'Missing Java runtime')
+            raise
+            
+        rss = [x for x in output if 'RSS' in x]  # gives the RSS\degrees_of_freedom line
+        tot_time = [x for x in output if 'Total time' in x]  # gives the total time line
+        
+        if not rss or not tot_time:
+            raise ProjectError('\n'.join(output), 'LOPT Issue')
+        
+        self.read_lopt_output()
+        
+        if self.project_db:
+            self.project_db.add_lopt_run(self.lopt_fixed_levels, self.lopt_inp_file, self.lopt_lev_file, self.lopt_lin_file)
+            
+        return rss[0], tot_time[0]
+    
+    def unknown_fixed_levels(self):
+        """Returns the fixed levels that are not in the STRANS input levels, e.g. because a level has been renamed."""
+        labels = {x['label'] for x in self.strans_levs}
+        return [x for x in self.lopt_fixed_levels if x and x not in labels]
+
+    def write_lopt_inp(self):
+        """Writes the LOPT input file. Taking into account user selected tags, uncertainties and multiply identified lines.
+        Returns False if there are no matched lines to write."""
+        with open(self.lopt_inp_file, 'w') as inp_file:
+            lines = self.df.loc[self.df.main_desig.str.len() > 0 ]  # all lines with a main designation
+
+            if lines.empty:  # no lines have a main_designation in self.df ie strans has not been run
+                return False                
+            else:
+                line_unc = lines['unc'].values
+                user_unc = lines['user_unc'].values
+                default_unc = np.full(len(lines), self.lopt_default_unc)
+                
+                has_user_desig = (lines['user_desig'] != '').values  # there is a user selected level for the line
+                has_user_unc = ~np.isnan(user_unc)
+                untagged = (lines['line_tags'].values == 0) & ~has_user_unc  # no user defined tags for the line
+                multiple_lines = (lines['line_tags'].values & MULTIPLE_LINES) != 0  # multiple lines could have been a transition
+                multiple_desigs = ((lines.main_desig.str.len() != 1) | (lines.other_desig.str.len() != 0)).values  # multiple identifications for line
+                
+                conditions = [has_user_desig & untagged,
+                              has_user_desig & has_user_unc,
+                              has_user_desig & multiple_lines,  # the user has selected one of the multiple lines.
+                              ~has_user_desig & multiple_desigs,
+                              ~has_user_desig & untagged,
+                              ~has_user_desig & has_user_unc]  
+                uncs = np.select(conditions, [line_unc, user_unc, line_unc, default_unc, line_unc, user_unc], default_unc)
+                flags = np.select(conditions, ['', 'B', '', 'Q', '', 'B'], 'B')
+                
+                for wn, snr, unc, flag, main_desigs, user_desig in zip(lines['wavenumber'].values, lines['peak'].values, uncs, flags, 
+                                                                       lines['main_desig'].values, lines['user_desig'].values):
+                    line_start = f'{snr:9.0f}{wn:15.4f} cm-1 {unc:.4f}'
+                    tag = f'       {flag}'
+                         
+                    if user_desig != '':  # there is a user selected level for the line
+                        if user_desig['element_name'] == self.main_element_name:  # only if the user selected transition is of the main element
+                            inp_file.write(f'{line_start}{user_desig["lower_level"]:>12}{user_desig["upper_level"]:>12}{tag}\n')
+                        
+                    else:  # no user label for line
+                        for desig in main_desigs:
+                            inp_file.write(f'{line_start}{desig["lower_level"]:>12}{desig["upper_level"]:>12}{tag}\n')
+                            
+            # for level in self.lopt_fixed_levels[1:]:  # skip ground
+            #     strans_lev = next((item for item in self.strans_levs if item['label']==level))
+            #     lev_energy = strans_lev['energy'] 
+                
+            #     lopt_str = f'     9999{lev_energy:>15} cm-1 0.0000{self.lopt_fixed_levels[0]:>12}{level:>12}\n'
+            #     inp_file.writelines(lopt_str)
+                
+        return True
+
+    def write_lopt_par(self):
+        """Gets text from the LOPT .par template file and writes .par file for the project."""
+        with open(os.path.join(self.lopt_dir, 'lopt_template.par'), 'r') as temp_par_file:
+            par_lines = temp_par_file.readlines()
+            par_lines[0] = f'{self.main_element_name}_lopt.inp{par_lines[0]}'
+            par_lines[1] = f'{self.main_element_name}_lopt.fixed{par_lines[1]}'
+            par_lines[2] = f'{self.main_element_name}_lopt.lev{par_lines[2]}'
+            par_lines[3] = f'{self.main_element_name}_lopt.lin{par_lines[3]}'
+            
+        with open(self.lopt_par_file, 'w') as par_file:
+            par_file.writelines(par_lines)
+
+    def write_lopt_fixed(self):
+        """Writes the fixed levels for LOPT. If the ground level is selected, then unc = 0, otherwise = 2.0."""
+        with open(self.lopt_fixed_file, 'w') as fixed_file:
+            fixed_strings = []
+            
+            for level in self.lopt_fixed_levels:
+                strans_lev = next((item for item in self.strans_levs if item['label']==level))
+                lev_energy = strans_lev['energy'] 
+                if lev_energy == 0.0:
+                    lev_unc = f'{0.0:.4f}'
+                else:
+                    lev_unc = f'{2.0:.4f}'
+                             
+                fixed_strings.append(f'{level:>9}{lev_energy:>13.4f}{lev_unc:>13}\n')
+            
+            fixed_file.writelines(fixed_strings)
+
+    def read_lopt_output(self):
+        """Gets output from the LOPT output files. Puts these into dataframes. Duplicates lines so that the line appears
+        in the output GroupListView twice - once for each level in the transition."""
+
+        self.lopt_levs = pd.read_csv(self.lopt_lev_file, delimiter='\t')
+        lev_rows = list(enumerate(zip(self.lopt_levs['Energy'].values.tolist(), self.lopt_levs['Designation'].values.tolist())))
+        self.lopt_lev_desigs = {energy: desig for i, (energy, desig) in reversed(lev_rows)}  # energy: designation, first match wins
+        self.lopt_lev_rows = {energy: i for i, (energy, desig) in reversed(lev_rows)}  # energy: row of self.lopt_levs
+        lopt_lines_df = pd.read_csv(self.lopt_lin_file, delimiter='\t')
+        merged_lines = pd.merge_asof(lopt_lines_df[['W_obs', 'S', 'Wn_c', 'E1', 'E2', 'L1', 'L2', 'F', 'uncW_o']].sort_values('W_obs'), 
+                                     self.df[['wavenumber', 'peak', 'eq width', 'tags']].sort_values('wavenumber'), 
+                                     left_on='W_obs', 
+                                     right_on='wavenumber',
+                                     tolerance=0.005,
+                                     direction='nearest') # match lopt lines to main df file based on nearest wavenumber
+        
+        merged_lines['dWO-C'] = merged_lines['W_obs'] - merged_lines['Wn_c']
+        merged_lines['star'] = np.where((merged_lines['dWO-C'].abs() > (merged_lines['uncW_o']*self.star_discrim)), True, False)
+        merged_lines['log_ew'] = np.log(merged_lines['eq width'])
+        merged_lines['main_level'] = ''
+        merged_lines['other_level'] = ''
+        merged_lines['F'] = np.where(merged_lines['F'] == None, ' ', merged_lines['F'])
+                
+        duplicated_lines = pd.DataFrame(np.repeat(merged_lines.copy().values,2,axis=0))
+        duplicated_lines.columns = merged_lines.columns  
+                
+        t1 = duplicated_lines.iloc[0::2].copy()
+        t1['main_level'] = t1['E1']
+        t1['other_level'] = t1['L2'] 
+        t2 = duplicated_lines.iloc[1::2].copy()
+        t2['main_level'] = t2['E2'] 
+        t2['other_level'] = t2['L1'] 
+        
+        duplicated_lines.update(t1)
+        duplicated_lines.update(t2)
+             
+        duplicated_lines = duplicated_lines.to_dict('records')
+        self.lopt_output_lines = duplicated_lines
+
+    def predict_levels(self, levels, tol, use_all_lines=True, wn_min=0.0, wn_max=np.inf):
+        """Runs LEVHAMS for the given levels. Every line is taken as a transition to or from each level, and the
+        predicted energies of the other level that lie between wn_min and wn_max are grouped, with each predicted
+        energy within tol of its neighbour. If use_all_lines is False, only the lines without a main element
+        designation are used. Returns the list of groups, each a list of predicted line dicts sorted by energy."""
+        pred_lines = []
+        all_lines = self.df[['wavenumber','peak','eq width','unc', 'main_desig']]
+        
+        if not use_all_lines:  # only the lines without a main element designation
+            all_lines = all_lines[Filter.Unassigned()({'main_desig': all_lines['main_desig'].values})]
+            
+        all_lines = all_lines.to_dict('records')
+        
+        for level in levels:  
+            for line in all_lines:
+                pred_lines.append({'pred_energy':level['energy'] - line['wavenumber'], 
+                                   'level':level['label'], 
+                                   'j':level['j'],
+                                   'energy':level['energy'],
+                                   'wavenumber':line['wavenumber'],
+                                   'peak':line['peak'],
+                                   'eq width':line['eq width'],
+                                   'unc':line['unc']})
+                pred_lines.append({'pred_energy':level['energy'] + line['wavenumber'], 
+                                   'level':level['label'], 
+                                   'j':level['j'],
+                                   'energy':level['energy'],
+                                   'wavenumber':line['wavenumber'],
+                                   'peak':line['peak'],
+                                   'eq width':line['eq width'],
+                                   'unc':line['unc']})
+        
+        pred_lines = sorted(pred_lines, key=lambda k: k['pred_energy'])  # sort by wavenumber            
+        pred_lines = [x for x in pred_lines if x['pred_energy'] >= wn_min and x['pred_energy'] <= wn_max]
+        
+        if not pred_lines:
+            return []
+        return list(self.levhams_match_tol(pred_lines, tol))  # separates predicted lines into groups
+
+    def levhams_match_tol(self, line_list, tol):
+        """Generator function to split predicted lines into groups with each element separated from its neighbour 
+        by a maximium given tolerance.
+        """
+        matches = []
+        last = line_list[0]['pred_energy']
+        
+        for element in line_list:
+            if element['pred_energy'] - last > tol:
+                yield matches
+                matches = []
+                
+            matches.append(element)
+            last = element['pred_energy']
+        yield matches
+
+    def write_linelist(self, filename, fmt='csv', full_list=True, progress=None):
+        """Exports the STRANS output linelist in one of the formats of lib/linelist_export.py. If full_list is False
+        only the lines with a main element designation are written. The lines are read from the line store a chunk at a
+        time if it is up to date with self.df. Returns the number of lines written."""
+        if fmt not in linelist_export.available_formats():
+            raise ProjectError('Parquet export needs the pyarrow package.', 'Parquet Export Error')
+
+        lines = self.line_store.path if self.line_store_current() else self.df
+        return linelist_export.export_linelist(lines, filename, fmt, matched_only=not full_list, progress=progress)
+
+    def line_store_current(self):
+        """True if the line store holds every change made to self.df: nothing is waiting to be saved or being saved,
+        and there are no line edits in the journal. Always False for a project database."""
+        if self.project_db or self.df_dirty or self.dirty_columns != set() or self.journal.compacting():
+            return False
+        return not any(line_edits(self.journal.records()))
+    
+    def write_lopt_levels(self, filename, progress=None):
+        """Exports the sorted LOPT level report (.llf). The output of the last LOPT run is read from the LOPT output
+        files if LOPT has not been run since the project was opened."""
+        if self.lopt_output_lines is None:
+            if not (os.path.isfile(self.lopt_lev_file) and os.path.isfile(self.lopt_lin_file)):
+                raise ProjectError('No levels found from LOPT output. Please run LOPT first', 'No Levels Found')
+            self.read_lopt_output()
+            
+        write_level_report(filename, self.lopt_levs, self.lopt_output_lines, progress)
+    
+    def close(self):
+        """Closes the edit journal and autosave of the project, waiting for a background save to finish."""
+        if self.journal:
+            self.journal.close()
+            self.autosave.close()
+
+
+class KeyList(object):
+    """Key function for bisect search. This allows bisect to work on specific elements within lists of iterable objects"""
+    def __init__(self, l, key):
+        self.l = l
+        self.key = key
+    def __len__(self):
+        return len(self.l)
+    def __getitem__(self, index):
+        return self.key(self.l[index])
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar storage for the TAME project DataFrames.
+
+Each column of a DataFrame is written to its own .npy file inside the store directory so that numeric columns can be
+memory-mapped when a project is opened. Columns holding nested objects (the lists of designation dicts in main_desig
+and other_desig, the user_desig dicts and dicts of scalars such as line_tags) are flattened into their own typed
+tables. The caller of save() says which columns have changed since the last save, and only those are rewritten.
+
+Store layout:
+    <store>/manifest.json                 column order, kinds and file names
+    <store>/<column>.<part>.<gen>.npy     one file per column part, gen is the save generation that wrote it
+
+New files are always written under a new generation and the manifest is replaced atomically afterwards, so a crash
+part way through a save leaves the previous version of the store intact.
+"""
+
+import os
+import re
+import gc
+import json
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+DESIG_FIELDS = ('element_name', 'upper_level', 'lower_level')
+
+
+def store_path(filename):
+    """Returns the store directory for a project data file. Projects created before the columnar store have .pkl
+    filenames in their config, these get a sibling .store directory."""
+    root, ext = os.path.splitext(filename)
+
+    if ext == '.pkl':
+        return root + '.store'
+    return filename
+
+
+def copy_store(src, dst):
+    """Copies the files listed in the manifest of the store at src to a new store at dst."""
+    src_store = LineStore(src)
+    os.makedirs(dst, exist_ok=True)
+
+    for column in src_store.manifest['columns']:
+        for filename in column['files'].values():
+            with open(os.path.join(src, filename), 'rb') as src_file, open(os.path.join(dst, filename), 'wb') as dst_file:
+                dst_file.write(src_file.read())
+
+    LineStore(dst)._write_manifest(src_store.manifest)
+
+
+class LineStore(object):
+    """A directory of column files that round-trips a pandas DataFrame."""
+    def __init__(self, path):
+        self.path = path
+        self.manifest = self._read_manifest()
+
+    def exists(self):
+        """True if a DataFrame has been saved to this store."""
+        return os.path.isfile(os.path.join(self.path, MANIFEST_FILE))
+
+    def load(self, mmap=True):
+        """Loads the DataFrame from the store. Numeric columns are memory-mapped unless mmap is False. The maps are
+        copy-on-write, so the DataFrame can be edited without touching the store, and each column keeps its own map
+        rather than being copied into a block with the other columns of its dtype. Lines without a designation share
+        one empty tuple in main_desig and other_desig, so those columns are replaced rather than appended to in place."""
+        mmap_mode = 'c' if mmap else None
+        num_rows = self.manifest['num_rows']
+        index = pd.RangeIndex(num_rows)
+        data = {}
+        gc_enabled = gc.isenabled()
+        gc.disable()  # the designation columns allocate a container per line, none of which can be garbage
+
+        try:
+            for column in self.manifest['columns']:
+                parts = self._load_parts(column, mmap_mode)
+                values = _decode_column(column['kind'], parts, num_rows, column.get('fields'))
+                dtype = None if column['kind'] == 'array' else column.get('dtype', 'object')  # older stores have no dtype
+                data[column['name']] = pd.Series(values, index=index, name=column['name'], dtype=dtype, copy=False)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        if not data:
+            return pd.DataFrame(index=index)
+        return pd.concat(data.values(), axis=1)
+
+    def load_parts(self, name, mmap=True):
+        """Returns the (kind, {part: array}) of a single stored column without decoding it, e.g. the row, element_name,
+        upper_level and lower_level arrays of a designation list column. Arrays are memory-mapped unless mmap is False."""
+        column = next(x for x in self.manifest['columns'] if x['name'] == name)
+        return column['kind'], self._load_parts(column, 'r' if mmap else None)
+
+    def _load_parts(self, column, mmap_mode):
+        """Loads the part arrays of a column of the manifest."""
+        return {part: np.load(os.path.join(self.path, filename), mmap_mode=mmap_mode, allow_pickle=False)
+                for part, filename in column['files'].items()}
+
+    def save(self, df, columns=None):
+        """Saves df to the store. columns is the set of names of the columns that have changed since the last save,
+        or None if any of them may have. Only those columns, and columns that are not in the store yet, are written;
+        everything is written if the rows of df are not those of the stored version. Returns the list of column names
+        that were written."""
+        os.makedirs(self.path, exist_ok=True)
+
+        generation = self.manifest['generation'] + 1
+        old_columns = {x['name']: x for x in self.manifest['columns']}
+        same_rows = columns is not None and len(df) == self.manifest['num_rows']
+        new_columns = []
+        written = []
+
+        for i, name in enumerate(df.columns):
+            old_column = old_columns.get(name)
+
+            if same_rows and old_column and name not in columns:  # unchanged since the last save
+                new_columns.append(old_column)
+                continue
+
+            kind, parts, fields = _encode_column(df[name].to_numpy())
+            files = {}
+
+            for part, values in parts.items():
+                filename = f'{_safe_name(name, i)}.{part}.{generation}.npy'
+                np.save(os.path.join(self.path, filename), values, allow_pickle=False)
+                files[part] = filename
+
+            column = {'name': name, 'kind': kind, 'files': files}
+            if kind != 'array':  # pandas would infer str rather than object for a column of strings
+                column['dtype'] = str(df[name].dtype)
+            if fields is not None:
+                column['fields'] = fields
+
+            new_columns.append(column)
+            written.append(name)
+
+        manifest = {'version': STORE_VERSION,
+                    'generation': generation,
+                    'num_rows': len(df),
+                    'columns': new_columns}
+
+        if new_columns != self.manifest['columns'] or manifest['num_rows'] != self.manifest['num_rows']:
+            self._write_manifest(manifest)
+            self._remove_stale_files()
+
+        return written
+
+    def _read_manifest(self):
+        """Reads the store manifest, or returns an empty manifest if the store has not been written yet."""
+        try:
+            with open(os.path.join(self.path, MANIFEST_FILE), 'r') as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return {'version': STORE_VERSION, 'generation': 0, 'num_rows': 0, 'columns': []}
+
+    def _write_manifest(self, manifest):
+        """Atomically replaces the manifest. This is the commit point of a save."""
+        manifest_file = os.path.join(self.path, MANIFEST_FILE)
+        temp_file = manifest_file + '.tmp'
+
+        with open(temp_file, 'w') as file:
+            json.dump(manifest, file, indent=1)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_file, manifest_file)
+        self.manifest = manifest
+
+    def _remove_stale_files(self):
+        """Deletes column files that are no longer referenced by the manifest."""
+        current_files = {filename for x in self.manifest['columns'] for filename in x['files'].values()}
+
+        for filename in os.listdir(self.path):
+            if filename.endswith('.npy') and filename not in current_files:
+                try:
+                    os.remove(os.path.join(self.path, filename))
+                except PermissionError:  # still memory-mapped by a loaded DataFrame on Windows, removed by a later save
+                    pass
+
+
+def _safe_name(name, index):
+    """Returns a filename-safe version of a column name."""
+    return f'{index:02d}_' + re.sub(r'[^0-9A-Za-z]+', '_', str(name))
+
+
+def _column_kind(values):
+    """Works out how a column should be stored from its dtype and the type of its values."""
+    if values.dtype != object:
+        return 'array'
+
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            return 'desig_list'
+        elif isinstance(value, dict):
+            if set(DESIG_FIELDS) <= set(value):
+                return 'desig'
+            return 'record'
+
+    return 'string'
+
+
+def _string_array(values):
+    """Converts a sequence of strings to a fixed width unicode array. Missing values become empty strings."""
+    values = ['' if x is None or (isinstance(x, float) and np.isnan(x)) else str(x) for x in values]
+
+    if not values:
+        return np.array([], dtype='<U1')
+    return np.array(values, dtype=str)
+
+
+def _encode_column(values):
+    """Returns the (kind, {part: array}, fields) of a column ready to be written to disk."""
+    kind = _column_kind(values)
+
+    if kind == 'array':
+        return kind, {'values': np.ascontiguousarray(values)}, None
+
+    elif kind == 'string':
+        return kind, {'values': _string_array(values)}, None
+
+    elif kind == 'desig_list':  # one table row per designation, row gives the line it belongs to
+        rows = [i for i, desigs in enumerate(values) for desig in desigs]
+        desigs = [desig for desigs in values for desig in desigs]
+        parts = {'row': np.array(rows, dtype=np.int64)}
+
+        for field in DESIG_FIELDS:
+            parts[field] = _string_array([x[field] for x in desigs])
+
+        return kind, parts, None
+
+    elif kind == 'desig':  # lines without a designation are not stored
+        rows = [i for i, desig in enumerate(values) if isinstance(desig, dict)]
+        parts = {'row': np.array(rows, dtype=np.int64)}
+
+        for field in DESIG_FIELDS:
+            parts[field] = _string_array([values[i][field] for i in rows])
+
+        return kind, parts, None
+
+    else:  # record, one typed column per dict key
+        fields = list(values[0].keys()) if len(values) else []
+        parts = {}
+
+        for field in fields:
+            field_values = [x[field] for x in values]
+
+            if all(isinstance(x, (bool, np.bool_)) for x in field_values):
+                parts[field] = np.array(field_values, dtype=bool)
+            else:  # bool flags that can also hold a number (e.g. user_unc), False is stored as NaN
+                parts[field] = np.array([np.nan if x is False else x for x in field_values], dtype=np.float64)
+
+        return kind, parts, fields
+
+
+def _decode_column(kind, parts, num_rows, fields):
+    """Rebuilds a column from its stored parts."""
+    if kind == 'array':
+        return parts['values']
+
+    elif kind == 'string':
+        return parts['values'].astype(object)
+
+    elif kind == 'desig_list':  # lines without a designation share one empty tuple, the others get a list each
+        column = np.empty(num_rows, dtype=object)
+        column.fill(())
+        desigs = _desig_in_list(*[parts[x].astype(object) for x in DESIG_FIELDS])  # [desig] for each stored desig
+        desig_rows, starts, counts = np.unique(parts['row'], return_index=True, return_counts=True)  # rows are sorted
+        single = counts == 1
+
+        column[desig_rows[single]] = desigs[starts[single]]
+        for row, start, count in zip(desig_rows[~single].tolist(), starts[~single].tolist(), counts[~single].tolist()):
+            column[row] = [x[0] for x in desigs[start:start + count]]
+
+        return column
+
+    elif kind == 'desig':
+        column = np.full(num_rows, '', dtype=object)
+        desig_fields = [parts[field].tolist() for field in DESIG_FIELDS]
+
+        for row, *desig in zip(parts['row'].tolist(), *desig_fields):
+            column[row] = dict(zip(DESIG_FIELDS, desig))
+
+        return column
+
+    else:  # record
+        field_values = []
+
+        for field in fields:
+            values = parts[field]
+
+            if values.dtype == bool:
+                field_values.append(values.tolist())
+            else:
+                field_values.append([False if np.isnan(x) else x for x in values.tolist()])
+
+        return [dict(zip(fields, record)) for record in zip(*field_values)] if fields else [{} for x in range(num_rows)]
+
+
+_desig_in_list = np.frompyfunc(lambda element_name, upper_level, lower_level: [
+    {'element_name': element_name, 'upper_level': upper_level, 'lower_level': lower_level}], 3, 1)
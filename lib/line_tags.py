@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bit flags for the user tags of a line.
+
+The tags of every line are stored in the integer line_tags column of the main df, one bit per tag. A user uncertainty
+is not a flag: it is stored in the float user_unc column, which is NaN when the user has not set one. This keeps the
+per-line cost of the tags to a few bytes and lets tag based selections be done as vectorised masks, e.g.
+    untagged = (df['line_tags'] == 0) & df['user_unc'].isna()
+"""
+
+import numpy as np
+
+RINGING = 1
+INCORR_ASSIGN = 2
+NOISE = 4
+BLEND = 8
+MULTIPLE_LINES = 16  # set by STRANS when more than one line matches a transition
+
+TAGS_DTYPE = np.uint8
+TAG_BITS = {'ringing': RINGING,
+            'incorr_assign': INCORR_ASSIGN,
+            'noise': NOISE,
+            'blend': BLEND,
+            'multiple_lines': MULTIPLE_LINES}
+
+
+def set_tag(tags, bit, value):
+    """Returns the tags of a line with the given tag bit set or cleared."""
+    if value:
+        return int(tags) | bit
+    return int(tags) & ~bit
+
+
+def set_tags(tags, bit, value):
+    """Returns an array of the tags of many lines with the given tag bit set or cleared."""
+    tags = np.asarray(tags, dtype=TAGS_DTYPE)
+    if value:
+        return tags | TAGS_DTYPE(bit)
+    return tags & TAGS_DTYPE(~bit & 0xff)
+
+
+def has_tag(tags, bit):
+    """True if the given tag bit is set in the tags of a line."""
+    return bool(int(tags) & bit)
+
+
+def tags_from_dicts(tag_dicts):
+    """Converts the line_tags dicts used by older projects, e.g. {'ringing': False, ..., 'user_unc': 0.002}, to a
+    (line_tags, user_unc) pair of arrays."""
+    tags = np.zeros(len(tag_dicts), dtype=TAGS_DTYPE)
+    user_unc = np.full(len(tag_dicts), np.nan)
+
+    for i, tag_dict in enumerate(tag_dicts):
+        for name, bit in TAG_BITS.items():
+            if tag_dict.get(name):
+                tags[i] |= bit
+
+        if tag_dict.get('user_unc', False) not in (False, None):  # False when the user has not set an uncertainty
+            user_unc[i] = tag_dict['user_unc']
+
+    return tags, user_unc
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming export of the STRANS linelist.
+
+The linelist is read in chunks of rows, either from the lines DataFrame or directly from the column files of a line
+store (lib/line_store.py), so that exporting a large linelist never needs more than one chunk of formatted text in
+memory. Within a chunk every column is formatted as a whole, and the designations are joined from the flat
+row/element_name/upper_level/lower_level arrays that the line store keeps for the main_desig and other_desig columns,
+so no designation dicts have to be built for a store.
+
+Formats:
+    csv         the comma separated .lin linelist, with tab separated designations
+    txt         fixed width text columns
+    parquet     typed columns, needs the pyarrow package
+"""
+
+import csv
+import numpy as np
+
+from .autosave import atomic_open
+from .line_store import LineStore, DESIG_FIELDS
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet export is optional
+    pyarrow = None
+
+CHUNK_SIZE = 50000  # rows formatted and written at a time
+BUFFER_SIZE = 1 << 20
+
+# exported field: (DataFrame column, format spec of a numeric field, fixed width column width). Numeric fields are
+# right aligned in the fixed width format, text fields are left aligned.
+LINELIST_FIELDS = {'wavenumber': ('wavenumber', '.4f', 14),
+                   'snr': ('peak', '.0f', 8),
+                   'fwhm': ('width', '.0f', 8),
+                   'eq_width': ('eq width', '.0f', 10),
+                   'fit': ('tags', None, 5),
+                   'unc': ('unc', '.4f', 10),
+                   'main_element': ('main_desig', None, -40),
+                   'other_elements': ('other_desig', None, 0)}
+DESIG_COLUMNS = ('main_desig', 'other_desig')
+
+# format: (file dialog wildcard, extension)
+EXPORT_FORMATS = {'csv': ('Linelist Files (*.lin)|*.lin', '.lin'),
+                  'txt': ('Fixed Width Text Files (*.txt)|*.txt', '.txt'),
+                  'parquet': ('Parquet Files (*.parquet)|*.parquet', '.parquet')}
+
+
+def available_formats():
+    """Returns the keys of EXPORT_FORMATS that can be written with the packages that are installed."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or pyarrow is not None]
+
+
+def export_linelist(lines, filename, fmt='csv', matched_only=False, chunk_size=CHUNK_SIZE, progress=None):
+    """Writes the linelist to filename in the given format. lines is the lines DataFrame or the path of a line store.
+    If matched_only is True, only the lines with a main element designation are written. progress, if given, is called
+    with the number of rows read so far and the total number of rows after each chunk. Returns the number of lines
+    written."""
+    if isinstance(lines, str):
+        chunks = store_chunks(lines, matched_only, chunk_size)
+        num_rows = LineStore(lines).manifest['num_rows']
+    else:
+        chunks = dataframe_chunks(lines, matched_only, chunk_size)
+        num_rows = len(lines)
+
+    if fmt == 'parquet' and pyarrow is None:
+        raise ImportError('Parquet export needs the pyarrow package.')
+
+    writer_class = WRITERS[fmt]
+    num_lines = 0
+
+    with atomic_open(filename, writer_class.mode, **writer_class.open_kwargs) as file:
+        writer = writer_class(file)
+
+        for stop, chunk in chunks:
+            writer.write(chunk)
+            num_lines += len(chunk['wavenumber'])
+
+            if progress:
+                progress(stop, num_rows)
+
+        writer.close()
+
+    return num_lines
+
+
+def dataframe_chunks(df, matched_only=False, chunk_size=CHUNK_SIZE):
+    """Yields (stop row, {field: array}) for each chunk of rows of the lines DataFrame."""
+    columns = {x: df[x].to_numpy() for x in set(_value_columns()) | set(DESIG_COLUMNS)}
+
+    for start in range(0, len(df), chunk_size):
+        stop = min(start + chunk_size, len(df))
+        desig_parts = {x: _flatten_desigs(columns[x][start:stop]) for x in DESIG_COLUMNS}
+        yield stop, _make_chunk(columns, desig_parts, start, stop, matched_only)
+
+
+def store_chunks(path, matched_only=False, chunk_size=CHUNK_SIZE):
+    """Yields (stop row, {field: array}) for each chunk of rows of the line store at path. Numeric columns are
+    memory-mapped and designations are read from their flat tables, so only one chunk is decoded at a time."""
+    store = LineStore(path)
+    num_rows = store.manifest['num_rows']
+    columns = {x: store.load_parts(x)[1]['values'] for x in _value_columns()}
+    desig_tables = {x: store.load_parts(x)[1] for x in DESIG_COLUMNS}
+
+    for start in range(0, num_rows, chunk_size):
+        stop = min(start + chunk_size, num_rows)
+        desig_parts = {}
+
+        for name, table in desig_tables.items():  # designation rows are stored in line order
+            lo, hi = np.searchsorted(table['row'], [start, stop])
+            desig_parts[name] = (table['row'][lo:hi] - start, *[table[x][lo:hi] for x in DESIG_FIELDS])
+
+        yield stop, _make_chunk(columns, desig_parts, start, stop, matched_only)
+
+
+def desig_strings(rows, element_name, upper_level, lower_level, num_rows):
+    """Returns an object array of the designation text of num_rows lines, from the flat designation arrays of those
+    lines (rows gives the line of each designation, in order). A line with more than one designation has them tab
+    separated, lines without any have an empty string."""
+    strings = np.full(num_rows, '', dtype=object)
+
+    if not len(rows):
+        return strings
+
+    text = np.array([f'{element}: {upper} - {lower}' for element, upper, lower in
+                     zip(_text(element_name), _text(upper_level), _text(lower_level))], dtype=object)
+    bounds = np.r_[np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]), len(rows)]
+    starts = bounds[:-1]
+    strings[rows[starts]] = text[starts]
+
+    for i in np.flatnonzero(np.diff(bounds) > 1):  # only lines with several designations need joining
+        strings[rows[bounds[i]]] = '\t'.join(text[bounds[i]:bounds[i + 1]])
+
+    return strings
+
+
+def _value_columns():
+    """The DataFrame columns of the exported fields that are not designations."""
+    return [column for column, fmt, width in LINELIST_FIELDS.values() if column not in DESIG_COLUMNS]
+
+
+def _flatten_desigs(desig_lists):
+    """Returns the (rows, element_name, upper_level, lower_level) arrays of a chunk of designation lists."""
+    rows = np.array([i for i, desigs in enumerate(desig_lists) for x in desigs], dtype=np.int64)
+    fields = [[x[field] for desigs in desig_lists for x in desigs] for field in DESIG_FIELDS]
+    return (rows, *fields)
+
+
+def _make_chunk(columns, desig_parts, start, stop, matched_only):
+    """Returns the {field: array} of rows start to stop. Values are left unformatted for the writers."""
+    num_rows = stop - start
+    desigs = {name: desig_strings(*parts, num_rows) for name, parts in desig_parts.items()}
+
+    if matched_only:
+        keep = np.zeros(num_rows, dtype=bool)
+        keep[desig_parts['main_desig'][0]] = True
+    else:
+        keep = slice(None)
+
+    chunk = {}
+
+    for field, (column, fmt, width) in LINELIST_FIELDS.items():
+        values = desigs[column] if column in desigs else columns[column][start:stop]
+        chunk[field] = np.asarray(values)[keep]
+
+    return chunk
+
+
+def _text(values):
+    """Returns a chunk of a text field as a list of strings, with missing values as empty strings."""
+    values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+    return [x if isinstance(x, str) else '' if x is None or x != x else str(x) for x in values]
+
+
+def _format_column(values, fmt):
+    """Returns a chunk of a field as a list of strings."""
+    if fmt is None:
+        return _text(values)
+    return [format(x, fmt) for x in np.asarray(values, dtype=np.float64).tolist()]
+
+
+def _needs_quoting(columns):
+    """True if any of the text of a chunk has to be quoted in a CSV file."""
+    return any(any(',' in x or '"' in x or '\n' in x for x in column) for column in columns)
+
+
+class CsvWriter(object):
+    """Writes the comma separated .lin linelist. Chunks are joined straight into lines, unless a chunk has text that
+    needs quoting, which goes through the csv module."""
+    mode = 'w'
+    open_kwargs = {'newline': '', 'buffering': BUFFER_SIZE}
+
+    def __init__(self, file):
+        self.file = file
+        self.writer = csv.writer(file, lineterminator='\n')
+        self.file.write(','.join(LINELIST_FIELDS) + '\n')
+
+    def write(self, chunk):
+        """Writes a chunk of rows"""
+        if not len(chunk['wavenumber']):
+            return
+
+        columns = [_format_column(chunk[field], fmt) for field, (column, fmt, width) in LINELIST_FIELDS.items()]
+
+        if _needs_quoting([x for x, (column, fmt, width) in zip(columns, LINELIST_FIELDS.values()) if fmt is None]):
+            self.writer.writerows(zip(*columns))
+        else:
+            self.file.write('\n'.join(map(','.join, zip(*columns))) + '\n')
+
+    def close(self):
+        pass
+
+
+class FixedWidthWriter(object):
+    """Writes the linelist as fixed width text columns."""
+    mode = 'w'
+    open_kwargs = {'buffering': BUFFER_SIZE}
+
+    def __init__(self, file):
+        self.file = file
+        self.line_format = ' '.join('{:%s%d}' % ('>' if width > 0 else '<', abs(width)) if width else '{}'
+                                    for column, fmt, width in LINELIST_FIELDS.values())
+        self.file.write(self.line_format.format(*LINELIST_FIELDS).rstrip() + '\n')
+
+    def write(self, chunk):
+        """Writes a chunk of rows"""
+        if not len(chunk['wavenumber']):
+            return
+
+        columns = [_format_column(chunk[field], fmt) for field, (column, fmt, width) in LINELIST_FIELDS.items()]
+        self.file.write('\n'.join(self.line_format.format(*row).rstrip() for row in zip(*columns)) + '\n')
+
+    def close(self):
+        pass
+
+
+class ParquetWriter(object):
+    """Writes the linelist as a Parquet file with typed columns, one row group per chunk."""
+    mode = 'wb'
+    open_kwargs = {}
+
+    def __init__(self, file):
+        self.schema = pyarrow.schema([(field, pyarrow.float64() if fmt else pyarrow.string())
+                                      for field, (column, fmt, width) in LINELIST_FIELDS.items()])
+        self.writer = pyarrow.parquet.ParquetWriter(file, self.schema)
+
+    def write(self, chunk):
+        """Writes a chunk of rows"""
+        arrays = [np.asarray(chunk[field], dtype=np.float64) if fmt else _text(chunk[field])
+                  for field, (column, fmt, width) in LINELIST_FIELDS.items()]
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'csv': CsvWriter, 'txt': FixedWidthWriter, 'parquet': ParquetWriter}
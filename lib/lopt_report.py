@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The sorted LOPT level report (.llf).
+
+For every LOPT level the report has a header with the level energy, its uncertainties and comments, followed by the
+lines that the level was fitted to. The lines are the LOPT output lines as shown in the LOPT level list, with each
+line appearing once for each of its levels, and other_level giving the level the line is listed under.
+
+The lines are grouped by level once, with a stable sort of the other_level column, and every line is formatted once,
+so writing the report is linear in its size rather than a scan of all the lines for each level.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .autosave import atomic_open
+
+BUFFER_SIZE = 1 << 20
+RULE = '--------------------------------------------\n'
+LEVEL_HEADER = 'Config      Energy (cm-1)   D1        D2        D3        No. of Lines  Comments\n'
+LINE_HEADER = '   Fit  log(EW) SNR     Wn_Obs (cm-1)  Unc_Wn_obs  del_Wn(Obs-C)  Level       Tags\n'
+
+
+def write_level_report(filename, levels, lines, progress=None):
+    """Writes the report of the LOPT levels (a DataFrame, or a list of dicts, with Designation, Energy, D1, D2, D3,
+    N_lines and Comments) and their lines (a DataFrame, or a list of dicts, of the LOPT output lines) to filename.
+    progress, if given, is called with the number of levels written so far and the total number of levels."""
+    levels = pd.DataFrame(levels) if not isinstance(levels, pd.DataFrame) else levels
+    lines = pd.DataFrame(lines) if not isinstance(lines, pd.DataFrame) else lines
+    groups = group_lines(lines['other_level'].to_numpy()) if len(lines) else {}
+    line_text = format_lines(lines) if len(lines) else np.array([], dtype=object)
+    num_levels = len(levels)
+
+    with atomic_open(filename, 'w', buffering=BUFFER_SIZE) as file:
+        for i, level in enumerate(levels[['Designation', 'Energy', 'D1', 'D2', 'D3', 'N_lines', 'Comments']].itertuples(index=False)):
+            designation, energy, d1, d2, d3, n_lines, comments = level
+            file.write(RULE)
+            file.write(LEVEL_HEADER)
+            file.write(f"{designation:<12}{energy:<16}{d1:<10}{d2:<10}{d3:<10}{n_lines:<14}{comments}\n\n")
+            file.write(LINE_HEADER)
+
+            level_lines = groups.get(designation)
+            if level_lines is not None:
+                file.write(''.join(line_text[level_lines]))
+
+            file.write(RULE)
+
+            if progress:
+                progress(i + 1, num_levels)
+
+
+def group_lines(other_levels):
+    """Returns {level: array of line positions} of the lines listed under each level, with the positions of each
+    level in line order. Lines without a level (NaN) are left out."""
+    codes, uniques = pd.factorize(other_levels)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+    return {level: order[bounds[i]:bounds[i + 1]] for i, level in enumerate(uniques)}
+
+
+def format_lines(lines):
+    """Returns an object array of the report text of every line of the lines DataFrame."""
+    star = np.where(lines['star'].to_numpy(dtype=bool), '*', ' ')
+    other_level = lines['other_level'].to_numpy()
+    trans_lev = np.where(lines['L1'].to_numpy() == other_level, lines['L2'].to_numpy(), lines['L1'].to_numpy())
+    flag = np.where(lines['F'].to_numpy() == 'Q', 'M', ' ')
+
+    columns = [_format(star, '<3'),
+               _format(lines['tags'], '<5'),
+               _format(lines['log_ew'], '<8.2f'),
+               _format(lines['peak'], '<8.0f'),
+               _format(lines['wavenumber'], '<15.4f'),
+               _format(lines['uncW_o'], '<12.4f'),
+               _format(lines['dWO-C'], '>7.4f'),
+               ['        '] * len(lines),
+               _format(trans_lev, '<12'),
+               flag.tolist(),
+               ['\n'] * len(lines)]
+
+    return np.array([''.join(x) for x in zip(*columns)], dtype=object)
+
+
+def _format(values, spec):
+    """Returns a list of the values formatted with the format spec."""
+    values = values.tolist() if isinstance(values, (np.ndarray, pd.Series)) else values
+    return [format(x, spec) for x in values]
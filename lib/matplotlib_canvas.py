@@ -2,24 +2,47 @@
 # -*- coding: UTF-8 -*-
 
 # a class to make matplotib.backend_wxagg.FigureCanvasWxAgg compatible with wxGlade
+# matplotlib is slow to import, so it is only imported (and the figure and its navigation toolbar created) the first
+# time the plot is used rather than when the main window is built.
 
 import wx
 
-import matplotlib
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
 
-
-class MatplotlibCanvas(FigureCanvas):
+class MatplotlibCanvas(wx.Panel):
     def __init__(self, parent, id=wx.ID_ANY):
-        # 1x1 grid, first subplot
-        figure = self.figure = Figure()
-        self.axes = figure.add_subplot(111)
-        FigureCanvas.__init__(self, parent, id, figure)
+        wx.Panel.__init__(self, parent, id)
+        self.sizer = wx.BoxSizer(wx.VERTICAL)
+        self.SetSizer(self.sizer)
+        self.canvas = None
+
+    def figure_canvas(self):
+        """Returns the FigureCanvas, creating it with its toolbar the first time it is needed."""
+        if self.canvas is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
+            from matplotlib.backends.backend_wxagg import NavigationToolbar2WxAgg as NavigationToolbar
+
+            # 1x1 grid, first subplot
+            self.figure = Figure()
+            self.axes = self.figure.add_subplot(111)
+            self.canvas = FigureCanvas(self, wx.ID_ANY, self.figure)
+            self.sizer.Add(self.canvas, 1, wx.EXPAND)
+
+            self.toolbar = NavigationToolbar(self.canvas)
+            self.toolbar.Realize()
+            self.sizer.Add(self.toolbar, 0, wx.ALIGN_CENTRE, border=5)
+            self.toolbar.update()
+            self.Layout()
+
+        return self.canvas
 
     def clear(self):
-        self.axes.clear()
+        self.gca().clear()
         self.draw()
-        
+
     def gca(self):
+        self.figure_canvas()
         return self.axes
+
+    def draw(self):
+        self.figure_canvas().draw()
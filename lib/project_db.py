@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single file SQLite database for a TAME project.
+
+An alternative to the line store (lib/line_store.py) plus the separate level and level comment files. The lines, their
+designations, the STRANS input levels, the level comments and a record of every LOPT run are kept in one SQLite file.
+Lines are indexed on wavenumber and designations on line id and level label, so updating a single line is an index
+lookup rather than a scan of the whole linelist. Saving a project as a new one is a copy of a single file, and other
+scripts can query a project with nothing but the sqlite3 module, e.g.
+    SELECT wavenumber, peak FROM lines JOIN assignments ON assignments.line_id = lines.id WHERE upper_level = '4s 4F9'
+
+ProjectDatabase has the same load()/save() interface as LineStore, so TAME can use either for the lines DataFrame.
+"""
+
+import os
+import json
+import sqlite3
+import datetime
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+
+from .line_store import DESIG_FIELDS
+
+SCHEMA_VERSION = 1
+DB_EXTENSIONS = ('.db', '.sqlite')
+
+# DataFrame column: lines table column, for the columns of self.df that are stored in the lines table
+LINE_COLUMNS = {'wavenumber': 'wavenumber',
+                'peak': 'peak',
+                'width': 'width',
+                'eq width': 'eq_width',
+                'tags': 'tags',
+                'unc': 'unc',
+                'line_tags': 'line_tags',
+                'comments': 'comments',
+                'user_unc': 'user_unc'}
+TEXT_COLUMNS = ('tags', 'comments')
+DESIG_COLUMNS = {'main_desig': 'main', 'other_desig': 'other', 'user_desig': 'user'}  # DataFrame column: assignment kind
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    wavenumber REAL NOT NULL,
+    peak REAL,
+    width REAL,
+    eq_width REAL,
+    tags TEXT,
+    unc REAL,
+    line_tags INTEGER NOT NULL DEFAULT 0,
+    comments TEXT NOT NULL DEFAULT '',
+    user_unc REAL);
+CREATE INDEX IF NOT EXISTS lines_wavenumber ON lines (wavenumber);
+CREATE TABLE IF NOT EXISTS assignments (
+    line_id INTEGER NOT NULL REFERENCES lines (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    element_name TEXT,
+    upper_level TEXT,
+    lower_level TEXT);
+CREATE INDEX IF NOT EXISTS assignments_line ON assignments (line_id, kind);
+CREATE INDEX IF NOT EXISTS assignments_upper ON assignments (upper_level);
+CREATE INDEX IF NOT EXISTS assignments_lower ON assignments (lower_level);
+CREATE TABLE IF NOT EXISTS levels (
+    position INTEGER PRIMARY KEY,
+    label TEXT NOT NULL,
+    j REAL,
+    energy REAL,
+    parity REAL);
+CREATE INDEX IF NOT EXISTS levels_label ON levels (label);
+CREATE TABLE IF NOT EXISTS level_comments (designation TEXT PRIMARY KEY, comments TEXT NOT NULL DEFAULT '');
+CREATE TABLE IF NOT EXISTS lopt_runs (
+    id INTEGER PRIMARY KEY,
+    run_time TEXT NOT NULL,
+    fixed_levels TEXT,
+    inp TEXT,
+    lev TEXT,
+    lin TEXT);
+"""
+
+
+def is_project_db(filename):
+    """True if the df_file of a project config names a project database rather than a line store."""
+    return os.path.splitext(filename)[1] in DB_EXTENSIONS
+
+
+class ProjectDatabase(object):
+    """A TAME project in a single SQLite file."""
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def connect(self):
+        """Yields a connection to the database inside a transaction, committed if the block succeeds. A connection is
+        opened per use so that the database can be written from a background thread."""
+        con = sqlite3.connect(self.path)
+
+        try:
+            con.execute('PRAGMA foreign_keys = ON')
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def exists(self):
+        """True if the lines of the project have been saved to the database."""
+        if not os.path.isfile(self.path):
+            return False
+
+        with self.connect() as con:
+            return con.execute("SELECT name FROM sqlite_master WHERE name = 'meta'").fetchone() is not None
+
+    def create(self):
+        """Creates the database tables if they do not exist yet."""
+        with self.connect() as con:
+            con.execute('PRAGMA journal_mode = WAL')  # lets other scripts read the project while TAME writes it
+            con.executescript(SCHEMA)
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(SCHEMA_VERSION),))
+
+    def load(self):
+        """Loads the lines DataFrame from the database."""
+        with self.connect() as con:
+            columns = json.loads(con.execute("SELECT value FROM meta WHERE key = 'columns'").fetchone()[0])
+            line_columns = [x for x in columns if x in LINE_COLUMNS]
+            rows = con.execute(f"SELECT id, {', '.join(LINE_COLUMNS[x] for x in line_columns)} FROM lines ORDER BY wavenumber").fetchall()
+            assignments = con.execute('SELECT line_id, kind, element_name, upper_level, lower_level FROM assignments '
+                                      'ORDER BY line_id, kind, position').fetchall()
+
+        line_ids = [x[0] for x in rows]
+        row_of_id = {line_id: i for i, line_id in enumerate(line_ids)}
+        index = pd.RangeIndex(len(rows))
+        data = {}
+
+        for i, name in enumerate(line_columns, 1):
+            values = [x[i] for x in rows]
+            if name in TEXT_COLUMNS:  # a Series, or pandas would infer str rather than object for these columns
+                data[name] = pd.Series(['' if x is None else x for x in values], index=index, dtype=object)
+            elif name == 'line_tags':
+                data[name] = np.array(values, dtype=np.uint8)
+            else:
+                data[name] = np.array([np.nan if x is None else x for x in values], dtype=np.float64)
+
+        data['main_desig'] = [[] for x in rows]
+        data['other_desig'] = [[] for x in rows]
+        data['user_desig'] = np.full(len(rows), '', dtype=object)
+
+        for line_id, kind, *desig in assignments:
+            desig = dict(zip(DESIG_FIELDS, desig))
+
+            if kind == 'user':
+                data['user_desig'][row_of_id[line_id]] = desig
+            else:
+                data[f'{kind}_desig'][row_of_id[line_id]].append(desig)
+
+        data['user_desig'] = pd.Series(data['user_desig'], index=index, dtype=object)  # keeps '' for lines without one
+        return pd.DataFrame(data, index=index, columns=columns)
+
+    def save(self, df, columns=None):
+        """Replaces the lines and their designations with those of df. columns (the changed columns) is accepted for
+        the line store interface, all the lines are always replaced."""
+        self.create()
+        line_columns = [x for x in df.columns if x in LINE_COLUMNS]
+        values = [df[x].to_numpy() for x in line_columns]
+        rows = [(i, *[_sql_value(x) for x in row]) for i, row in enumerate(zip(*values), 1)]
+
+        assignments = []
+        for column, kind in DESIG_COLUMNS.items():
+            for i, desigs in enumerate(df[column].to_numpy(), 1):
+                assignments.extend(_assignment_rows(i, kind, desigs))
+
+        with self.connect() as con:
+            con.execute('DELETE FROM assignments')
+            con.execute('DELETE FROM lines')
+            con.executemany(f"INSERT INTO lines (id, {', '.join(LINE_COLUMNS[x] for x in line_columns)}) "
+                            f"VALUES (?, {', '.join('?' for x in line_columns)})", rows)
+            con.executemany('INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?)', assignments)
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('columns', ?)", (json.dumps(list(df.columns)),))
+
+        return list(df.columns)
+
+    def update_lines(self, edits):
+        """Applies a list of {'wavenumber', 'column', 'value'} line edits (as recorded in the edit journal) in a single
+        transaction. Edits to lines that are not in the database are ignored."""
+        with self.connect() as con:
+            for edit in edits:
+                row = con.execute('SELECT id FROM lines WHERE wavenumber = ?', (edit['wavenumber'],)).fetchone()
+
+                if row is None:
+                    continue
+                elif edit['column'] in DESIG_COLUMNS:
+                    kind = DESIG_COLUMNS[edit['column']]
+                    con.execute('DELETE FROM assignments WHERE line_id = ? AND kind = ?', (row[0], kind))
+                    con.executemany('INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?)',
+                                    _assignment_rows(row[0], kind, edit['value']))
+                else:
+                    con.execute(f"UPDATE lines SET {LINE_COLUMNS[edit['column']]} = ? WHERE id = ?",
+                                (_sql_value(edit['value']), row[0]))
+
+    def load_levels(self):
+        """Returns the STRANS input levels as a list of dicts, or None if they have not been saved to the database."""
+        with self.connect() as con:
+            rows = con.execute('SELECT label, j, energy, parity FROM levels ORDER BY position').fetchall()
+
+        if not rows:
+            return None
+        return [dict(zip(('label', 'j', 'energy', 'parity'), x)) for x in rows]
+
+    def save_levels(self, strans_levs):
+        """Replaces the STRANS input levels."""
+        with self.connect() as con:
+            con.execute('DELETE FROM levels')
+            con.executemany('INSERT INTO levels VALUES (?, ?, ?, ?, ?)',
+                            [(i, x['label'], x['j'], x['energy'], x['parity']) for i, x in enumerate(strans_levs)])
+
+    def load_level_comments(self):
+        """Returns the level comments as a DataFrame with Designation and Comments columns, or None if they have not
+        been saved to the database."""
+        with self.connect() as con:
+            rows = con.execute('SELECT designation, comments FROM level_comments ORDER BY rowid').fetchall()
+
+        if not rows:
+            return None
+        return pd.DataFrame(rows, columns=['Designation', 'Comments'])
+
+    def save_level_comments(self, lev_comments):
+        """Replaces the level comments with those of the lev_comments DataFrame."""
+        rows = [(x, '' if pd.isna(y) else y) for x, y in lev_comments[['Designation', 'Comments']].values.tolist()]
+
+        with self.connect() as con:
+            con.execute('DELETE FROM level_comments')
+            con.executemany('INSERT OR REPLACE INTO level_comments VALUES (?, ?)', rows)
+
+    def add_lopt_run(self, fixed_levels, inp_file, lev_file, lin_file):
+        """Records a LOPT run: the fixed levels and the contents of its input and output files."""
+        contents = []
+
+        for filename in (inp_file, lev_file, lin_file):
+            with open(filename, 'r') as file:
+                contents.append(file.read())
+
+        with self.connect() as con:
+            con.execute('INSERT INTO lopt_runs (run_time, fixed_levels, inp, lev, lin) VALUES (?, ?, ?, ?, ?)',
+                        (datetime.datetime.now().isoformat(timespec='seconds'), ','.join(fixed_levels), *contents))
+
+    def copy_to(self, dst):
+        """Copies the database to dst. Uses the SQLite backup API, so the copy is consistent even while the database
+        is being written."""
+        with self.connect() as con:
+            dst_con = sqlite3.connect(dst)
+            try:
+                con.backup(dst_con)
+            finally:
+                dst_con.close()
+
+
+def _sql_value(value):
+    """Converts a DataFrame value to one SQLite can store. NaN is stored as NULL."""
+    if isinstance(value, (np.integer, np.bool_)):
+        return int(value)
+    elif isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    return value
+
+
+def _assignment_rows(line_id, kind, desigs):
+    """Returns the assignments table rows for a line's main_desig/other_desig list or user_desig dict ('' if none)."""
+    if isinstance(desigs, dict):
+        desigs = [desigs]
+    elif not isinstance(desigs, (list, tuple)):
+        desigs = []
+
+    return [(line_id, kind, i, *[desig[x] for x in DESIG_FIELDS]) for i, desig in enumerate(desigs)]
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+
+import numpy as np
+
+
+NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+TOLERANCE_QUERY = re.compile(rf'^\s*({NUMBER})\s*(?:\+/?-|±)\s*({NUMBER})\s*$')
+NUMBER_QUERY = re.compile(rf'^\s*({NUMBER})\s*$')
+
+
+def parse_numeric_query(text):
+    """Returns the (low, high) range of values, high excluded, that a search for text in a numeric column should find,
+    or None if text is not a number. '15234.1 +- 0.05' (or ±) gives a range around the value. A plain number finds
+    the values that start with the digits that were typed, e.g. '15234.1' finds 15234.1 <= x < 15234.2."""
+    match = TOLERANCE_QUERY.match(text)
+    if match:
+        value, tolerance = float(match.group(1)), abs(float(match.group(2)))
+        return value - tolerance, np.nextafter(value + tolerance, np.inf)
+
+    match = NUMBER_QUERY.match(text)
+    if match:
+        number = match.group(1)
+        value = float(number)
+        decimals = len(number.split('.')[1]) if '.' in number and 'e' not in number.lower() else 0
+        step = 10.0 ** -decimals
+        return (value, value + step) if value >= 0 else (value - step, np.nextafter(value, np.inf))
+
+    return None
+
+
+class NumericIndex(object):
+    """A sorted copy of a numeric column, so that the rows with values in a range are found by binary search."""
+    def __init__(self, values):
+        self.order = np.argsort(values, kind='stable')
+        self.sorted_values = values[self.order]
+
+    def find(self, low, high):
+        """Returns the positions of the rows with low <= value < high."""
+        start = np.searchsorted(self.sorted_values, low, side='left')
+        end = np.searchsorted(self.sorted_values, high, side='left')
+        return np.sort(self.order[start:end])
+
+
+class TextIndex(object):
+    """An n-gram index of the text of a column for case insensitive substring searches. Columns such as the
+    designations of lines repeat the same text many times, so the grams are indexed for each distinct text and the
+    rows are found from the texts that match."""
+    GRAM = 3
+
+    def __init__(self, texts):
+        texts = np.array([x.lower() for x in texts], dtype=object)
+        self.texts, self.text_of_row = np.unique(texts, return_inverse=True) if len(texts) else (texts, texts)
+        self.text_of_row = self.text_of_row.ravel()
+
+        postings = {}
+        for i, text in enumerate(self.texts):
+            for gram in {text[j:j + self.GRAM] for j in range(len(text) - self.GRAM + 1)}:
+                postings.setdefault(gram, []).append(i)
+
+        self.postings = {gram: np.array(texts, dtype=np.intp) for gram, texts in postings.items()}
+
+    def find(self, query):
+        """Returns the positions of the rows whose text contains query."""
+        query = query.lower()
+
+        if len(query) < self.GRAM:  # too short to use the grams, so check every distinct text
+            candidates = np.arange(len(self.texts))
+        else:
+            grams = sorted({query[j:j + self.GRAM] for j in range(len(query) - self.GRAM + 1)},
+                           key=lambda gram: len(self.postings.get(gram, ())))
+            candidates = self.postings.get(grams[0], np.arange(0))
+            for gram in grams[1:]:
+                if not len(candidates):
+                    break
+                candidates = np.intersect1d(candidates, self.postings.get(gram, np.arange(0)), assume_unique=True)
+
+        matches = [i for i in candidates if query in self.texts[i]]  # grams can match out of order
+        return np.flatnonzero(np.isin(self.text_of_row, matches))
+
+
+class SearchIndex(object):
+    """The search indexes of the columns of a list view. An index is built the first time a column is searched, and
+    kept until the values of that column change, so setting new data only rebuilds the indexes of the columns that
+    are different."""
+    def __init__(self):
+        self.columns = {}
+        self.indexes = {}  # column key: (values the index was built from, NumericIndex or TextIndex)
+
+    def update(self, columns):
+        """Sets the data, a dict of column arrays, and drops the indexes of the columns whose values have changed."""
+        for key, (values, index) in list(self.indexes.items()):
+            name = key[0]
+            new_values = columns.get(name)
+            if new_values is None or not (new_values is values or self._same_values(values, new_values)):
+                del self.indexes[key]
+
+        self.columns = columns
+
+    @staticmethod
+    def _same_values(old, new):
+        if len(old) != len(new) or old.dtype != new.dtype:
+            return False
+        try:
+            return bool(np.array_equal(old, new))
+        except (TypeError, ValueError):
+            return False
+
+    def find(self, name, query, to_text=None):
+        """Returns the positions of the rows of the named column that match query, in order. Numeric columns are
+        searched for the range given by parse_numeric_query(), other columns for the text, made by to_text(value) if
+        it is given, that contains query. Returns an empty array if a numeric column is searched for text."""
+        values = self.columns[name]
+
+        if values.dtype.kind in 'iuf':
+            value_range = parse_numeric_query(query)
+            if value_range is None:
+                return np.arange(0)
+            return self._index((name, None), lambda: NumericIndex(values)).find(*value_range)
+
+        texts = (lambda: (to_text(x) for x in values)) if to_text else (lambda: (str(x) for x in values))
+        return self._index((name, to_text), lambda: TextIndex(list(texts()))).find(query)
+
+    def _index(self, key, build):
+        entry = self.indexes.get(key)
+        if entry is None:
+            entry = self.indexes[key] = (self.columns[key[0]], build())
+        return entry[1]
+
+
+def next_hit(hits, current, forward=True, include_current=False):
+    """Returns the hit after (or before) current from a sorted array of row indexes, wrapping round at the ends of
+    the list, or -1 if there are no hits."""
+    if not len(hits):
+        return -1
+
+    if forward:
+        i = np.searchsorted(hits, current, side='left' if include_current else 'right')
+        return int(hits[i % len(hits)])
+
+    i = np.searchsorted(hits, current, side='right' if include_current else 'left') - 1
+    return int(hits[i])  # -1 wraps round to the last hit
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+On-disk store for the Xgremlin spectra shown in the LOPT line plot.
+
+Every spectrum is kept as a pair of .npy arrays (wavenumber and intensity) sorted by wavenumber. Nothing is read when
+the store is opened: the arrays of a spectrum are memory-mapped the first time a window of it is requested, and a
+window only touches the pages between its two wavenumber bounds. Project open time and resident memory therefore do
+not depend on how many spectra a project has.
+
+Store layout:
+    <store>/manifest.json           list of spectra with their files, dtype, size and wavenumber range
+    <store>/<n>_<name>.wn.npy       wavenumbers (always float64, float32 cannot hold 0.0001 cm-1 at 50000 cm-1)
+    <store>/<n>_<name>.int.npy      intensities (float64, or float32 to halve the size of the store)
+"""
+
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .asc_reader import read_asc, spectrum_name
+from .line_store import LineStore, store_path
+
+STORE_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+
+def spectrum_store_path(plot_file):
+    """Returns the spectrum store directory for the plot_file of a project config. Projects created before the
+    spectrum store have a pickled or columnar plot DataFrame, these get a sibling .spectra directory."""
+    root, ext = os.path.splitext(plot_file.rstrip('/'))
+
+    if ext in ('.pkl', '.store'):
+        return root + '.spectra'
+    return plot_file
+
+
+def copy_spectrum_store(src, dst):
+    """Copies the spectrum store at src to dst."""
+    src_store = SpectrumStore(src)
+    os.makedirs(dst, exist_ok=True)
+
+    for spectrum in src_store.manifest['spectra']:
+        for filename in (spectrum['wn_file'], spectrum['int_file']):
+            with open(os.path.join(src, filename), 'rb') as src_file, open(os.path.join(dst, filename), 'wb') as dst_file:
+                dst_file.write(src_file.read())
+
+    SpectrumStore(dst)._write_manifest(src_store.manifest)
+
+
+class SpectrumStore(object):
+    """A directory of spectra that are memory-mapped on demand."""
+    def __init__(self, path):
+        self.path = path
+        self.manifest = self._read_manifest()
+        self._arrays = {}  # name: (wavenumber, intensity) memory-maps of the spectra used so far
+
+    def __len__(self):
+        return len(self.manifest['spectra'])
+
+    def exists(self):
+        """True if the store has been created."""
+        return os.path.isfile(os.path.join(self.path, MANIFEST_FILE))
+
+    def names(self):
+        """Returns the names of all spectra in the store."""
+        return [x['name'] for x in self.manifest['spectra']]
+
+    def names_between(self, low, high):
+        """Returns the names of the spectra that have points between the wavenumbers low and high."""
+        return [x['name'] for x in self.manifest['spectra'] if x['wn_max'] >= low and x['wn_min'] <= high]
+
+    def add(self, name, wavenumber, intensity, dtype=np.float64):
+        """Adds a spectrum to the store. Points are sorted by wavenumber and NaN points are dropped."""
+        self.add_files([self.write_arrays(self.path, len(self), name, wavenumber, intensity, dtype)])
+
+    @staticmethod
+    def write_arrays(path, index, name, wavenumber, intensity, dtype=np.float64):
+        """Writes the arrays of a spectrum to the store directory at path without touching the manifest, and returns
+        the manifest entry for it. The entry must be passed to add_files() for the spectrum to become visible."""
+        os.makedirs(path, exist_ok=True)
+        wavenumber = np.asarray(wavenumber, dtype=np.float64)
+        intensity = np.asarray(intensity, dtype=dtype)
+
+        valid = ~(np.isnan(wavenumber) | np.isnan(intensity))
+        if not valid.all():
+            wavenumber = wavenumber[valid]
+            intensity = intensity[valid]
+
+        if len(wavenumber) > 1 and (np.diff(wavenumber) < 0).any():
+            order = np.argsort(wavenumber, kind='stable')
+            wavenumber = wavenumber[order]
+            intensity = intensity[order]
+
+        file_root = f'{index:03d}_' + re.sub(r'[^0-9A-Za-z]+', '_', name)
+        entry = {'name': name,
+                 'wn_file': file_root + '.wn.npy',
+                 'int_file': file_root + '.int.npy',
+                 'dtype': np.dtype(dtype).name,
+                 'num_points': len(wavenumber),
+                 'wn_min': float(wavenumber[0]) if len(wavenumber) else np.inf,
+                 'wn_max': float(wavenumber[-1]) if len(wavenumber) else -np.inf}
+
+        for filename, values in ((entry['wn_file'], wavenumber), (entry['int_file'], intensity)):
+            temp_file = os.path.join(path, filename + '.tmp')
+
+            with open(temp_file, 'wb') as file:
+                np.save(file, values, allow_pickle=False)
+
+            os.replace(temp_file, os.path.join(path, filename))
+
+        return entry
+
+    def add_files(self, entries):
+        """Adds spectra whose arrays have already been written by write_arrays() to the manifest."""
+        manifest = dict(self.manifest)
+        manifest['spectra'] = self.manifest['spectra'] + list(entries)
+        self._write_manifest(manifest)
+
+    def add_asc_files(self, filenames, dtype=np.float64, progress=None, max_workers=None):
+        """Reads Xgremlin .asc files into the store. Files are parsed and written on a pool of worker processes, each
+        one straight to its own arrays, and the manifest is written once at the end. progress, if given, is called as
+        progress(num_done, num_files, name) as each spectrum is written."""
+        num_files = len(filenames)
+        first_index = len(self)
+        entries = [None] * num_files
+        jobs = [(self.path, first_index + i, filename, dtype) for i, filename in enumerate(filenames)]
+
+        if num_files == 1:  # not worth starting a pool for
+            entries[0] = _write_asc(*jobs[0])
+            if progress:
+                progress(1, 1, entries[0]['name'])
+        elif num_files:
+            max_workers = min(num_files, max_workers or os.cpu_count() or 1)
+
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(_write_asc, *job): i for i, job in enumerate(jobs)}
+
+                for num_done, future in enumerate(as_completed(futures), 1):
+                    entries[futures[future]] = future.result()
+                    if progress:
+                        progress(num_done, num_files, entries[futures[future]]['name'])
+
+        self.add_files(entries)  # in the order the files were given, whatever order they finished in
+
+    def add_frame(self, plot_df, dtype=np.float64):
+        """Adds the spectra of a plot DataFrame from an older project, which has a wavenumber column and one NaN padded
+        intensity column per spectrum."""
+        entries = []
+
+        if plot_df is not None and not plot_df.empty:
+            wavenumber = plot_df['wavenumber'].values.astype(np.float64)
+
+            for i, name in enumerate(x for x in plot_df.columns if x != 'wavenumber'):
+                entries.append(self.write_arrays(self.path, len(self) + i, str(name), wavenumber, plot_df[name].values, dtype))
+
+        self.add_files(entries)
+
+    def arrays(self, name):
+        """Returns the (wavenumber, intensity) arrays of a spectrum, memory-mapping them the first time they are used."""
+        if name not in self._arrays:
+            spectrum = next(x for x in self.manifest['spectra'] if x['name'] == name)
+            self._arrays[name] = (np.load(os.path.join(self.path, spectrum['wn_file']), mmap_mode='r'),
+                                  np.load(os.path.join(self.path, spectrum['int_file']), mmap_mode='r'))
+
+        return self._arrays[name]
+
+    def window(self, name, low, high):
+        """Returns the (wavenumber, intensity) points of a spectrum with low <= wavenumber <= high. The bounds are
+        found by binary search, so only the pages of the window are read."""
+        wavenumber, intensity = self.arrays(name)
+        left = np.searchsorted(wavenumber, low, side='left')
+        right = np.searchsorted(wavenumber, high, side='right')
+
+        return wavenumber[left:right], intensity[left:right]
+
+    def query(self, name, low, high, max_points=None):
+        """Returns the points of a spectrum between the wavenumbers low and high like window(), reduced to at most
+        max_points points. The window is split into max_points / 2 equal sized buckets and the minimum and maximum
+        intensity of each bucket are kept (in wavenumber order), so peaks and noise spikes survive the decimation and the
+        plot looks the same as one of every point at screen resolution."""
+        wavenumber, intensity = self.window(name, low, high)
+        num_points = len(wavenumber)
+
+        if max_points is None or num_points <= max(max_points, 2):
+            return np.asarray(wavenumber), np.asarray(intensity)
+
+        num_buckets = max(max_points // 2, 1)
+        bucket_size = -(-num_points // num_buckets)  # ceiling division
+        num_buckets = -(-num_points // bucket_size)
+        padding = num_buckets * bucket_size - num_points
+
+        buckets = np.pad(np.asarray(intensity), (0, padding), mode='edge').reshape(num_buckets, bucket_size)
+        offsets = np.arange(num_buckets) * bucket_size
+        indices = np.stack([buckets.argmin(axis=1) + offsets, buckets.argmax(axis=1) + offsets], axis=1)
+        indices = np.minimum(np.sort(indices, axis=1).ravel(), num_points - 1)  # padded points repeat the last point
+
+        return wavenumber[indices], intensity[indices]
+
+    def _read_manifest(self):
+        """Reads the store manifest, or returns an empty manifest if the store has not been created."""
+        try:
+            with open(os.path.join(self.path, MANIFEST_FILE), 'r') as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return {'version': STORE_VERSION, 'spectra': []}
+
+    def _write_manifest(self, manifest):
+        """Atomically replaces the manifest."""
+        os.makedirs(self.path, exist_ok=True)
+        manifest_file = os.path.join(self.path, MANIFEST_FILE)
+        temp_file = manifest_file + '.tmp'
+
+        with open(temp_file, 'w') as file:
+            json.dump(manifest, file, indent=1)
+
+        os.replace(temp_file, manifest_file)
+        self.manifest = manifest
+
+
+def _write_asc(path, index, filename, dtype):
+    """Reads an .asc file and writes it to the store at path. Runs on the worker processes of add_asc_files()."""
+    wavenumber, intensity = read_asc(filename)
+    return SpectrumStore.write_arrays(path, index, spectrum_name(filename), wavenumber, intensity, dtype)
+
+
+def open_spectrum_store(plot_file, dtype=np.float64):
+    """Opens the spectrum store of a project. Plot DataFrames saved by older versions of TAME (pickled or in a line
+    store) are converted the first time the project is opened."""
+    spectra = SpectrumStore(spectrum_store_path(plot_file))
+
+    if not spectra.exists():
+        old_store = LineStore(store_path(plot_file))
+
+        if old_store.exists():
+            spectra.add_frame(old_store.load(), dtype)
+        elif os.path.isfile(plot_file):
+            spectra.add_frame(pd.read_pickle(plot_file), dtype)
+        else:
+            spectra.add_frame(None)
+
+    return spectra
@@ -11,9 +11,10 @@ import wx
 
 # begin wxGlade: extracode
 from lib import matplotlib_canvas
+from lib.DataFrameListView import DataFrameListView
 from lib.GroupListViewTASS import GroupListViewTame
-from lib.ObjectListView import ObjectListView
 from lib.ObjectListViewTASS import ObjectListViewTame
+from lib.VirtualCheckListCtrl import VirtualCheckListCtrl
 # end wxGlade
 
 
@@ -73,6 +74,24 @@ class mainWindow(wx.Frame):
         self.Bind(wx.EVT_MENU, self.on_preferences, item)
         self.frame_menubar.Append(wxglade_tmp_menu, "Edit")
         wxglade_tmp_menu = wx.Menu()
+        item = wxglade_tmp_menu.Append(wx.ID_ANY, "Wavenumber Range ...", "")
+        self.Bind(wx.EVT_MENU, self.on_filter_wavenumber, item)
+        item = wxglade_tmp_menu.Append(wx.ID_ANY, "Minimum SNR ...", "")
+        self.Bind(wx.EVT_MENU, self.on_filter_snr, item)
+        item = wxglade_tmp_menu.Append(wx.ID_ANY, "Element ...", "")
+        self.Bind(wx.EVT_MENU, self.on_filter_element, item)
+        wxglade_tmp_menu.AppendSeparator()
+        self.frame_menubar.filter_tagged_item = wxglade_tmp_menu.Append(wx.ID_ANY, "Hide Noise and Ringing Lines", "", wx.ITEM_CHECK)
+        self.Bind(wx.EVT_MENU, self.on_filter_tagged, self.frame_menubar.filter_tagged_item)
+        self.frame_menubar.filter_multiply_identified_item = wxglade_tmp_menu.Append(wx.ID_ANY, "Only Multiply Identified Lines", "", wx.ITEM_CHECK)
+        self.Bind(wx.EVT_MENU, self.on_filter_multiply_identified, self.frame_menubar.filter_multiply_identified_item)
+        self.frame_menubar.filter_starred_item = wxglade_tmp_menu.Append(wx.ID_ANY, "Only Starred LOPT Lines", "", wx.ITEM_CHECK)
+        self.Bind(wx.EVT_MENU, self.on_filter_starred, self.frame_menubar.filter_starred_item)
+        wxglade_tmp_menu.AppendSeparator()
+        item = wxglade_tmp_menu.Append(wx.ID_ANY, "Clear Filters", "")
+        self.Bind(wx.EVT_MENU, self.on_clear_filters, item)
+        self.frame_menubar.Append(wxglade_tmp_menu, "View")
+        wxglade_tmp_menu = wx.Menu()
         item = wxglade_tmp_menu.Append(wx.ID_ANY, "Manual", "")
         self.Bind(wx.EVT_MENU, self.on_manual, item)
         wxglade_tmp_menu.AppendSeparator()
@@ -164,12 +183,12 @@ class mainWindow(wx.Frame):
         label_2.SetFont(wx.Font(11, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD, 0, ""))
         sizer_15.Add(label_2, 4, wx.ALIGN_CENTER_VERTICAL | wx.ALL | wx.FIXED_MINSIZE, 2)
 
-        self.strans_line_search = wx.SearchCtrl(self.window_1_pane_2, wx.ID_ANY, "", style=wx.TE_LEFT)
+        self.strans_line_search = wx.SearchCtrl(self.window_1_pane_2, wx.ID_ANY, "", style=wx.TE_PROCESS_ENTER | wx.TE_LEFT)
         self.strans_line_search.ShowCancelButton(True)
         self.strans_line_search.SetDescriptiveText("Search Lines")
         sizer_15.Add(self.strans_line_search, 1, wx.ALIGN_CENTER_VERTICAL | wx.ALL | wx.FIXED_MINSIZE, 2)
 
-        self.strans_lines_ojlv = ObjectListView(self.window_1_pane_2, wx.ID_ANY, style=wx.LC_REPORT|wx.SUNKEN_BORDER)
+        self.strans_lines_ojlv = DataFrameListView(self.window_1_pane_2, wx.ID_ANY, style=wx.LC_REPORT|wx.SUNKEN_BORDER)
         sizer_5.Add(self.strans_lines_ojlv, 1, wx.ALL | wx.EXPAND, 3)
 
         self.LOPT = wx.Panel(self.main_panel, wx.ID_ANY)
@@ -185,7 +204,7 @@ class mainWindow(wx.Frame):
 
         sizer_7 = wx.BoxSizer(wx.HORIZONTAL)
 
-        self.lopt_lev_ojlv = GroupListViewTame(self.window_2_pane_1, wx.ID_ANY, style=wx.LC_REPORT|wx.SUNKEN_BORDER|wx.LC_SINGLE_SEL)
+        self.lopt_lev_ojlv = GroupListViewTame(self.window_2_pane_1, wx.ID_ANY, style=wx.LC_REPORT|wx.SUNKEN_BORDER)
         sizer_7.Add(self.lopt_lev_ojlv, 1, wx.ALL | wx.EXPAND, 3)
 
         self.window_2_pane_2 = wx.Panel(self.window_2, wx.ID_ANY)
@@ -294,11 +313,7 @@ class mainWindow(wx.Frame):
 
         sizer_19 = wx.BoxSizer(wx.VERTICAL)
 
-        self.levhams_level_listctrl = wx.ListCtrl(self.window_3_pane_1, wx.ID_ANY, style=wx.BORDER_THEME | wx.LC_HRULES | wx.LC_REPORT)
-        self.levhams_level_listctrl.AppendColumn("       Label", format=wx.LIST_FORMAT_LEFT, width=200)
-        self.levhams_level_listctrl.AppendColumn("J", format=wx.LIST_FORMAT_LEFT, width=50)
-        self.levhams_level_listctrl.AppendColumn("Energy (cm-1)", format=wx.LIST_FORMAT_LEFT, width=150)
-        self.levhams_level_listctrl.AppendColumn("Parity", format=wx.LIST_FORMAT_LEFT, width=100)
+        self.levhams_level_listctrl = VirtualCheckListCtrl(self.window_3_pane_1, wx.ID_ANY, columns=[("       Label", 200), ("J", 50), ("Energy (cm-1)", 150), ("Parity", 100)], style=wx.BORDER_THEME|wx.LC_HRULES|wx.LC_REPORT)
         sizer_19.Add(self.levhams_level_listctrl, 1, wx.ALL | wx.EXPAND, 5)
 
         sizer_20 = wx.StaticBoxSizer(wx.StaticBox(self.window_3_pane_1, wx.ID_ANY, "LEVHAMS Settings"), wx.HORIZONTAL)
@@ -428,6 +443,7 @@ class mainWindow(wx.Frame):
         self.Bind(wx.EVT_BUTTON, self.on_strans_add, self.strans_add_levels_btn)
         self.Bind(wx.EVT_BUTTON, self.on_strans_del, self.strans_del_levels_btn)
         self.Bind(wx.EVT_TEXT, self.on_strans_line_search, self.strans_line_search)
+        self.Bind(wx.EVT_TEXT_ENTER, self.on_strans_line_search_next, self.strans_line_search)
         self.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_click_lopt_levs, self.lopt_lev_ojlv)
         self.Bind(wx.EVT_TEXT, self.on_lopt_lev_comments, self.lopt_level_comments)
         self.Bind(wx.EVT_LIST_ITEM_CHECKED, self.on_lopt_trans_checked, self.lopt_line_listctrl)
@@ -438,8 +454,6 @@ class mainWindow(wx.Frame):
         self.Bind(wx.EVT_CHECKBOX, self.on_noise_tag, self.noise_chkbox)
         self.Bind(wx.EVT_CHECKBOX, self.on_blend_tag, self.blend_chkbox)
         self.Bind(wx.EVT_CHECKBOX, self.on_user_unc_tag, self.user_unc_chkbox)
-        self.Bind(wx.EVT_LIST_ITEM_CHECKED, self.on_levhams_lev_checked, self.levhams_level_listctrl)
-        self.Bind(wx.EVT_LIST_ITEM_UNCHECKED, self.on_levhams_lev_unchecked, self.levhams_level_listctrl)
         self.Bind(wx.EVT_LIST_ITEM_RIGHT_CLICK, self.on_levhams_right_click, self.levhams_output_ojlv)
         self.Bind(wx.EVT_CLOSE, self.on_Exit, self)
         # end wxGlade
@@ -500,6 +514,34 @@ class mainWindow(wx.Frame):
         print("Event handler 'on_preferences' not implemented!")
         event.Skip()
 
+    def on_filter_wavenumber(self, event):  # wxGlade: mainWindow.<event_handler>
+        print("Event handler 'on_filter_wavenumber' not implemented!")
+        event.Skip()
+
+    def on_filter_snr(self, event):  # wxGlade: mainWindow.<event_handler>
+        print("Event handler 'on_filter_snr' not implemented!")
+        event.Skip()
+
+    def on_filter_element(self, event):  # wxGlade: mainWindow.<event_handler>
+        print("Event handler 'on_filter_element' not implemented!")
+        event.Skip()
+
+    def on_filter_tagged(self, event):  # wxGlade: mainWindow.<event_handler>
+        print("Event handler 'on_filter_tagged' not implemented!")
+        event.Skip()
+
+    def on_filter_multiply_identified(self, event):  # wxGlade: mainWindow.<event_handler>
+        print("Event handler 'on_filter_multiply_identified' not implemented!")
+        event.Skip()
+
+    def on_filter_starred(self, event):  # wxGlade: mainWindow.<event_handler>
+        print("Event handler 'on_filter_starred' not implemented!")
+        event.Skip()
+
+    def on_clear_filters(self, event):  # wxGlade: mainWindow.<event_handler>
+        print("Event handler 'on_clear_filters' not implemented!")
+        event.Skip()
+
     def on_manual(self, event):  # wxGlade: mainWindow.<event_handler>
         print("Event handler 'on_manual' not implemented!")
         event.Skip()
@@ -532,6 +574,10 @@ class mainWindow(wx.Frame):
         print("Event handler 'on_strans_line_search' not implemented!")
         event.Skip()
 
+    def on_strans_line_search_next(self, event):  # wxGlade: mainWindow.<event_handler>
+        print("Event handler 'on_strans_line_search_next' not implemented!")
+        event.Skip()
+
     def on_click_lopt_levs(self, event):  # wxGlade: mainWindow.<event_handler>
         print("Event handler 'on_click_lopt_levs' not implemented!")
         event.Skip()
@@ -572,14 +618,6 @@ class mainWindow(wx.Frame):
         print("Event handler 'on_user_unc_tag' not implemented!")
         event.Skip()
 
-    def on_levhams_lev_checked(self, event):  # wxGlade: mainWindow.<event_handler>
-        print("Event handler 'on_levhams_lev_checked' not implemented!")
-        event.Skip()
-
-    def on_levhams_lev_unchecked(self, event):  # wxGlade: mainWindow.<event_handler>
-        print("Event handler 'on_levhams_lev_unchecked' not implemented!")
-        event.Skip()
-
     def on_levhams_right_click(self, event):  # wxGlade: mainWindow.<event_handler>
         print("Event handler 'on_levhams_right_click' not implemented!")
         event.Skip()
@@ -808,10 +846,8 @@ class fixedLevelsDialog(wx.Dialog):
         label_1 = wx.StaticText(self, wx.ID_ANY, "Please select fixed levels for Level Optimisation.\n\nAt least one level must be selected.", style=wx.ALIGN_CENTER_HORIZONTAL)
         sizer_1.Add(label_1, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.ALL, 10)
 
-        self.fixed_level_lc = wx.ListCtrl(self, wx.ID_ANY, style=wx.BORDER_THEME | wx.LC_HRULES | wx.LC_REPORT | wx.LC_VRULES)
+        self.fixed_level_lc = VirtualCheckListCtrl(self, wx.ID_ANY, columns=[("          Level", 200), ("Energy (cm-1)", 200)], style=wx.BORDER_THEME|wx.LC_HRULES|wx.LC_REPORT|wx.LC_VRULES)
         self.fixed_level_lc.SetMinSize((500, 500))
-        self.fixed_level_lc.AppendColumn("          Level", format=wx.LIST_FORMAT_LEFT, width=200)
-        self.fixed_level_lc.AppendColumn("Energy (cm-1)", format=wx.LIST_FORMAT_LEFT, width=200)
         sizer_1.Add(self.fixed_level_lc, 1, wx.ALL | wx.EXPAND, 10)
 
         sizer_2 = wx.StdDialogButtonSizer()
@@ -834,19 +870,9 @@ class fixedLevelsDialog(wx.Dialog):
 
         self.Layout()
 
-        self.Bind(wx.EVT_LIST_ITEM_CHECKED, self.on_fixed_lev_checked, self.fixed_level_lc)
-        self.Bind(wx.EVT_LIST_ITEM_UNCHECKED, self.on_fixed_lev_unchecked, self.fixed_level_lc)
         self.Bind(wx.EVT_BUTTON, self.on_fixed_lev_ok, self.button_OK)
         # end wxGlade
 
-    def on_fixed_lev_checked(self, event):  # wxGlade: fixedLevelsDialog.<event_handler>
-        print("Event handler 'on_fixed_lev_checked' not implemented!")
-        event.Skip()
-
-    def on_fixed_lev_unchecked(self, event):  # wxGlade: fixedLevelsDialog.<event_handler>
-        print("Event handler 'on_fixed_lev_unchecked' not implemented!")
-        event.Skip()
-
     def on_fixed_lev_ok(self, event):  # wxGlade: fixedLevelsDialog.<event_handler>
         print("Event handler 'on_fixed_lev_ok' not implemented!")
         event.Skip()
@@ -951,10 +977,8 @@ class lostLinesDialog(wx.Dialog):
         label_1 = wx.StaticText(self, wx.ID_ANY, "Select lines to be restored to Level Optimisation.", style=wx.ALIGN_CENTER_HORIZONTAL)
         sizer_1.Add(label_1, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.ALL, 10)
 
-        self.lost_lines_lc = wx.ListCtrl(self, wx.ID_ANY, style=wx.BORDER_THEME | wx.LC_HRULES | wx.LC_REPORT | wx.LC_VRULES)
+        self.lost_lines_lc = VirtualCheckListCtrl(self, wx.ID_ANY, columns=[("Wavenumber (cm-1)", 200), ("User Designation", 300)], style=wx.BORDER_THEME|wx.LC_HRULES|wx.LC_REPORT|wx.LC_VRULES)
         self.lost_lines_lc.SetMinSize((500, 500))
-        self.lost_lines_lc.AppendColumn("Wavenumber (cm-1)", format=wx.LIST_FORMAT_LEFT, width=200)
-        self.lost_lines_lc.AppendColumn("User Designation", format=wx.LIST_FORMAT_LEFT, width=300)
         sizer_1.Add(self.lost_lines_lc, 1, wx.ALL | wx.EXPAND, 10)
 
         sizer_2 = wx.StdDialogButtonSizer()
@@ -977,19 +1001,9 @@ class lostLinesDialog(wx.Dialog):
 
         self.Layout()
 
-        self.Bind(wx.EVT_LIST_ITEM_CHECKED, self.on_lost_lines_checked, self.lost_lines_lc)
-        self.Bind(wx.EVT_LIST_ITEM_UNCHECKED, self.on_lost_lines_unchecked, self.lost_lines_lc)
         self.Bind(wx.EVT_BUTTON, self.on_lost_lines_ok, self.button_OK)
         # end wxGlade
 
-    def on_lost_lines_checked(self, event):  # wxGlade: lostLinesDialog.<event_handler>
-        print("Event handler 'on_lost_lines_checked' not implemented!")
-        event.Skip()
-
-    def on_lost_lines_unchecked(self, event):  # wxGlade: lostLinesDialog.<event_handler>
-        print("Event handler 'on_lost_lines_unchecked' not implemented!")
-        event.Skip()
-
     def on_lost_lines_ok(self, event):  # wxGlade: lostLinesDialog.<event_handler>
         print("Event handler 'on_lost_lines_ok' not implemented!")
         event.Skip()
@@ -1,17 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: UTF-8 -*-
 
+import time
+START_TIME = time.perf_counter()  # for reporting the startup time, so taken before the slow imports below
+
 import wx
 import numpy as np
 import pandas as pd
 import os
 from lib.tame_gui import mainWindow, newProjectDialog, fixedLevelsDialog, propertiesDialog, lostLinesDialog
 import os.path
-import bisect
 import configparser
-import subprocess
-from lib.ObjectListView import ColumnDefn, OLVEvent
-from matplotlib.backends.backend_wxagg import NavigationToolbar2WxAgg as NavigationToolbar
+import re
+import logging
+import threading
+from lib.ObjectListView import ColumnDefn, OLVEvent, BatchedUpdate
+from lib.CellEditor import CompletionIndex, MakeAutoCompleteTextBox
+from lib import Filter
+from lib.engine import Project, ProjectError
+from lib.line_store import store_path, copy_store
+from lib.autosave import atomic_open
+from lib import linelist_export
+from lib.spectrum_store import SpectrumStore, open_spectrum_store, spectrum_store_path, copy_spectrum_store
+from lib.line_tags import RINGING, INCORR_ASSIGN, NOISE, BLEND, set_tags, has_tag
 from shutil import copy
 
 import warnings  # only here to stop deprecation warning of objectlistview from clogging up terminal
@@ -19,31 +30,56 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 TAME_VERSION_STRING = 'Version: 0.0.1'
 
-class MyFrame(mainWindow):
-    """The main TAME window. Everything is run within this class."""
+log = logging.getLogger('tame')
+COMMENT_JOURNAL_DELAY = 1000  # ms after the last keystroke in a comment box before the comment is journaled
+
+class MyFrame(mainWindow, Project):
+    """The main TAME window. The project is read and computed by lib/engine.py, this class shows it and handles the
+    user's edits."""
     def __init__(self, *args, **kwds):
         """Initialise mainWindow, set constants etc. and then load the configs for tame."""
         mainWindow.__init__(self, *args, **kwds)
+        Project.__init__(self)
         
         self.set_constants()
         self.configure_layout()
         self.configure_listviews()
         
+        self.project_loaded = False
+        self.autosave_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_autosave, self.autosave_timer)
+        
+        # comments typed into the LOPT comment boxes are journaled once the user pauses or leaves the box
+        self.comment_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_comment_timer, self.comment_timer)
+        self.lopt_level_comments.Bind(wx.EVT_KILL_FOCUS, self.on_comment_kill_focus)
+        self.lopt_line_comments_txtctrl.Bind(wx.EVT_KILL_FOCUS, self.on_comment_kill_focus)
+        
         try:
             self.load_main_config()
-            self.load_project()
-            self.project_loaded = True          
-        except:
-            self.project_loaded = False
+        except (configparser.Error, ValueError) as error:  # the window is shown without a project
+            log.error(f'The main config file {self.main_config_file} could not be read: {error}')
+            self.frame_statusbar.SetStatusText('Could not read the main config file')
+            return
+        
+        if self.autosave_minutes > 0:
+            self.autosave_timer.Start(int(self.autosave_minutes * 60000))
+        
+        # the project is read on a worker thread so that the window can be shown straight away
+        self.frame_statusbar.SetStatusText('Loading project')
+        self.enable_controls(False)  # the project must not be opened, saved or used while it is still being read
+        threading.Thread(target=self.read_project_in_background, daemon=True).start()
         
     def set_constants(self):
         """Set the constants that are used throughout TAME."""
         self.cm_1 = 'cm\u207B\u00B9'  # unicode for inverse centimetres
-        self.blank_strans_lev = {'label': '', 'j':0.0 , 'energy':0.0 , 'parity':0}
-        self.levhams_selected_levs = {}
+        self.levhams_levels_key = None  # levels last shown in the LEVHAMS level list
         self.groupHeaderColour = wx.Colour(159, 185, 250, 249)  # BLUE
         self.evenRowsBackColour = wx.Colour(240, 248, 255)  # ALICE BLUE
         self.oddRowsBackColour = wx.Colour(255, 250, 205)  # LEMON CHIFFON
+        self.level_labels = None  # CompletionIndex of all level labels, see get_level_labels()
+        self.shown_lopt_lev_desigs = {}  # energy: designation of the levels in the LOPT GroupListView
+        self.pending_comments = {}  # {('line', wavenumber) or ('lev', designation): comments} not yet journaled
     
    
     def configure_layout(self):
@@ -51,10 +87,7 @@ class MyFrame(mainWindow):
         self.window_2.SetSashPosition(780)
         self.window_1.SetSashPosition(380)
 
-        self.toolbar = NavigationToolbar(self.matplotlib_canvas)
-        self.toolbar.Realize()
-        self.matplotlib_sizer.Add(self.toolbar, 0, wx.ALIGN_CENTRE, border=5)
-        self.toolbar.update()
+        # the matplotlib canvas and its navigation toolbar are created when the first line is plotted
         
         self.lopt_level_panel.Hide()
         self.lopt_line_panel.Hide()
@@ -64,7 +97,7 @@ class MyFrame(mainWindow):
     def configure_listviews(self):
         """Set column definitions and settings for all object and group listviews and basic wx.listctrls."""
         self.strans_lev_ojlv.SetColumns([
-            ColumnDefn("Level", "left", 100, 'label', isEditable=True),
+            ColumnDefn("Level", "left", 100, 'label', isEditable=True, cellEditorCreator=self.make_level_label_editor),
             ColumnDefn("J", "left", 50, 'j', stringConverter="%.1f", isEditable=True),
             ColumnDefn(f"Energy ({self.cm_1})", "left", 120, 'energy', stringConverter="%.4f", isEditable=True),           
             ColumnDefn("Parity", "left", 50, 'parity', stringConverter="%d", isSpaceFilling=True, isEditable=True)])
@@ -79,11 +112,11 @@ class MyFrame(mainWindow):
             ColumnDefn(f'Wavenumber ({self.cm_1})', 'left', 150, 'wavenumber', stringConverter="%.4f"),
             ColumnDefn('SNR', 'left', 40, 'peak', stringConverter="%d"),
             ColumnDefn('FHWM (mK)', 'left', 90, 'width', stringConverter="%d"),
-            ColumnDefn('log(Eq. Width)', 'left', 110, 'eq width', stringConverter="%.2f"),
+            ColumnDefn('log(Eq. Width)', 'left', 110, 'log_eq_width', stringConverter="%.2f"),
             ColumnDefn('Fit', 'left', 30, 'tags'),
             ColumnDefn(f'Unc. ({self.cm_1})', 'left', 90, 'unc', stringConverter="%.4f"),
-            ColumnDefn('Main Element Transitions', 'left', 500, 'main_desig'),
-            ColumnDefn('Other Element Transitions', 'left', 500, 'other_desig', isSpaceFilling=True)])
+            ColumnDefn('Main Element Transitions', 'left', 500, 'main_desig', stringConverter=self.main_desig_converter),
+            ColumnDefn('Other Element Transitions', 'left', 500, 'other_desig', stringConverter=self.other_desig_converter, isSpaceFilling=True)])
         
         self.strans_lines_ojlv.SetEmptyListMsg("Run Line Matching")
         
@@ -118,7 +151,19 @@ class MyFrame(mainWindow):
             ColumnDefn(f'Separation ({self.cm_1})', 'left', 170, 'sep', stringConverter=self.levhams_float_converter_4)])        
                 
         self.lopt_line_listctrl.EnableCheckBoxes(True)
-        self.levhams_level_listctrl.EnableCheckBoxes(True)
+        
+        # line filters set from the View menu. Each filter keeps its mask, so changing one only recomputes that mask
+        self.strans_line_filters = {'wavenumber': Filter.Range('wavenumber'),
+                                    'snr': Filter.Range('peak'),
+                                    'element': Filter.Element(),
+                                    'tagged': Filter.TagBits('line_tags', NOISE | RINGING, present=False, enabled=False),
+                                    'multiply_identified': Filter.MultiplyIdentified(enabled=False)}
+        self.lopt_line_filters = {'wavenumber': Filter.Range('wavenumber'),
+                                  'snr': Filter.Range('peak'),
+                                  'starred': Filter.Truth('star', enabled=False)}
+        self.strans_lines_ojlv.SetFilter(Filter.MaskChain(*self.strans_line_filters.values()))
+        self.strans_lines_batch = BatchedUpdate(self.strans_lines_ojlv, 0.2)  # coalesces refreshes after line edits
+        self.lopt_lev_ojlv.SetFilter(Filter.MaskChain(*self.lopt_line_filters.values()))
         
         
         
@@ -136,10 +181,19 @@ class MyFrame(mainWindow):
         except:
             return ''
     
+    def desig_string(self, desigs, sep):
+        """Returns the designations of a line as a single string."""
+        return sep.join(f"{x['element_name']}: {x['upper_level']} - {x['lower_level']}" for x in desigs)
+    
+    def main_desig_converter(self, desigs):
+        return self.desig_string(desigs, ';  \t')
+    
+    def other_desig_converter(self, desigs):
+        return self.desig_string(desigs, ',     ')
+    
     def loptGroupKeyConverter(self, energy):
         """Convert energy of group to the level designation."""
-        selected_line_index = self.lopt_levs.loc[self.lopt_levs['Energy'] == energy].index.values[0]
-        return self.lopt_levs.at[selected_line_index, 'Designation']
+        return self.lopt_lev_desigs[energy]
     
     def log_ew_converter(self, log_ew):
         """Convert equivalent width (from .lin file) to log(ew)."""  # XXX Check that this is right? log_ew to log(ew)?
@@ -195,445 +249,168 @@ class MyFrame(mainWindow):
     
     ############################################################################
     
-    def load_main_config(self):
-        """Reads the main TAME config file and sets variables accordingly"""
-        self.main_config_file = 'config/tame.ini'
-        self.main_config = configparser.ConfigParser()
-        self.main_config.read(self.main_config_file)
-        
-        self.project_config_file = self.main_config.get('project', 'project_config')
-        self.lopt_default_unc = self.main_config.getfloat('lopt', 'default_unc')
-         
-    def load_project_config(self):
-        """Reads the project config file and sets variables accordingly"""
-        self.project_config = configparser.ConfigParser()
-        self.project_config.read(self.project_config_file)
-
-        self.strans_lev_file = self.project_config.get('files', 'strans_lev_file')
-        self.strans_lin_file = self.project_config.get('files', 'strans_lin_file')
-        self.df_file = self.project_config.get('files', 'df_file')
-        self.plot_df_file = self.project_config.get('files', 'plot_file')
-        self.lopt_lev_comments_file = self.project_config.get('files', 'lopt_lev_comments_file')
-        self.other_lev_list = self.project_config.get('files', 'other_lev_files').split('\n')
-
-        self.lopt_fixed_levels = self.project_config.get('lopt', 'fixed_levels').split(',')
-        self.star_discrim = self.project_config.getfloat('lopt', 'star_discrim')
-        self.lopt_plot_width = self.project_config.getfloat('lopt', 'plot_width')
-        
-        self.strans_wn_discrim = self.project_config.getfloat('strans', 'wn_discrim')
-      
-        self.main_element_name = self.project_config.get('tame', 'main_element_name').strip("'")        
-        self.project_title = self.project_config.get('tame', 'project_title').strip("'")
-     
-    def load_df(self):
-        """Loads the main lines df from file. Creates a new df if this is a new project."""
-        if not os.path.isfile(self.df_file):  # if no existing DataFrame is present
-            self.create_df(self.strans_lin_file)
-            
-        self.df = pd.read_pickle(self.df_file)  
-    
     def load_project(self):
         """Set all filenames and variables and load/reload all listctrls."""
-        self.load_project_config()
-        
-        self.lopt_inp_file = f'lopt/{self.main_element_name}_lopt.inp'
-        self.lopt_par_file = f'lopt/{self.main_element_name}_lopt.par'
-        self.lopt_fixed_file = f'lopt/{self.main_element_name}_lopt.fixed'
-        self.lopt_lev_file = f'lopt/{self.main_element_name}_lopt.lev'
-        self.lopt_lin_file = f'lopt/{self.main_element_name}_lopt.lin'
-          
-        self.load_df() 
-        self.load_plot_df()         
-        self.strans_levs = list(pd.read_csv(self.strans_lev_file, dtype={'parity':float}).transpose().to_dict().values())                 
+        self.read_project()
+        self.display_project()
+        
+    def read_project(self):
+        """Reads the project config and all project files, and opens the spectra for the plot. Nothing here touches
+        the GUI, so it can be run on a worker thread."""
+        Project.read_project(self)
+        self.load_spectra()
+        self.level_labels = None  # built again from the new levels when a label is next edited
+        
+    def display_project(self):
+        """Shows a project that has been read by read_project()."""
         self.display_strans_levs() 
-        self.load_lopt_lev_comments()
         self.SetTitle(f"Term Analysis Made Easy (TAME) - {self.project_title}")
+        
+    def read_project_in_background(self):
+        """Reads the startup project. Runs on a worker thread, the GUI is updated from the main thread once the project
+        has been read."""
+        try:
+            self.read_project()
+            wx.CallAfter(self.on_project_read, True)
+        except Exception as e:
+            log.exception('Could not load project')
+            wx.CallAfter(self.on_project_read, False, f'Could not load project: {e}')
+            
+    def on_project_read(self, success, message=''):
+        """Shows the startup project once it has been read, a stage at a time so that the window stays responsive.
+        message is shown in the status bar if the project could not be read."""
+        self.enable_controls(True)
+        self.project_loaded = success
+        
+        if not success:
+            self.frame_statusbar.SetStatusText(message)
+            return
+        
+        self.SetTitle(f"Term Analysis Made Easy (TAME) - {self.project_title}")
+        wx.CallAfter(self.display_strans_levs)
+        wx.CallAfter(self.on_project_displayed)
+        
+    def on_project_displayed(self):
+        """Reports how long TAME took to start up."""
+        load_time = time.perf_counter() - START_TIME
+        self.frame_statusbar.SetStatusText(f'Project loaded in {load_time:.2f} s')
+        log.info(f'Project loaded {load_time:.2f} s after startup')
+        
+    def enable_controls(self, enable):
+        """Enables/disables the menus, the toolbar and the STRANS, LOPT and LEVHAMS panels, used while the startup
+        project is being read."""
+        menubar = self.GetMenuBar()
+        
+        for i in range(menubar.GetMenuCount()):
+            menubar.EnableTop(i, enable)
+            
+        self.frame_toolbar.Enable(enable)
+        self.main_panel.Enable(enable)
+        
+    def status(self, message):
+        """Shows progress messages from the engine in the status bar. The project is read on a worker thread, so
+        messages from other threads are passed to the main thread."""
+        if wx.IsMainThread():
+            self.frame_statusbar.SetStatusText(message)
+        else:
+            wx.CallAfter(self.frame_statusbar.SetStatusText, message)
+            
+    def show_project_error(self, error):
+        """Shows a ProjectError raised by the engine in a message box."""
+        wx.MessageBox(str(error), error.title, wx.OK | wx.ICON_EXCLAMATION)
+        
+    def save_failed(self, error):
+        """Reports a background save that failed. Called on the worker thread, so the message box is shown by the
+        main thread."""
+        Project.save_failed(self, error)
+        wx.CallAfter(self.frame_statusbar.SetStatusText, 'Project not saved')
+        wx.CallAfter(self.show_project_error, ProjectError(f'The project could not be saved:\n\n{error}', 'Save Failed'))
     
         
-    def load_plot_df(self):
-        """Loads plot_df for the matplotlib plot from the user-selected Xgremlin ascii linelist files.
-        The plot_df file is created as part of the new project process."""
-        # path=os.path.dirname(self.plot_df_file)
-
-        # if not os.path.isfile(self.plot_df_file):  # if no existing DataFrame is present
-        #     self.plot_df = pd.concat([pd.read_csv(f, skiprows=4, delim_whitespace=True, names=['wavenumber', f'{f.split("/")[-1].split(".")[0]}']) for f in glob.glob(path + "/*.asc")], ignore_index=True)
-        #     self.plot_df.to_pickle(self.plot_df_file) 
-        # else:
-        #     self.plot_df = pd.read_pickle(self.plot_df_file) 
-        self.plot_df = pd.read_pickle(self.plot_df_file) 
-        # self.plot_df.sort_values(by=['wavenumber'], ascending=True, inplace=True)
-        # self.plot_df.set_index('wavenumber', inplace=True, drop=True)
-
+    def load_spectra(self):
+        """Opens the spectrum store for the matplotlib plot. The store holds the user-selected Xgremlin ascii linelist
+        files and is created as part of the new project process. Spectra are only read from disk when plotted."""
+        self.spectra = open_spectrum_store(self.plot_df_file, self.plot_dtype)
           
     
-    def create_df(self, lines_file):
-        """Creates a new pandas DataFrame from a list of lines in 'lines_file' and saves to a pickle file."""
-        self.df = pd.read_csv(lines_file, float_precision='high')  # create new dataframe from the input lines file 
-        self.df['main_desig'] = np.empty((len(self.df), 0)).tolist()  # append column of empty lists.
-        self.df['other_desig'] = np.empty((len(self.df), 0)).tolist()  # append column of empty lists.
-        self.df['user_desig'] = ''
-        self.df['line_tags'] = [{'ringing': False, 'incorr_assign': False, 'noise': False, 'blend': False, 'user_unc': False, 'multiple_lines':False} for x in range(self.df.shape[0])]
-        self.df['comments'] = ''
-        self.save_df()
-        
-    def save_df(self):
-        """Saves the main pandas DataFrame self.df to the pickle file."""
-        self.df = self.df.sort_values(by=['wavenumber'])
-        self.df.to_pickle(self.df_file)    
-    
     def main_strans(self, strans_levs):
         """Runs strans for the main element under study"""
         
         self.strans_levs = self.strans_lev_ojlv.GetObjects()
         
-        if self.blank_strans_lev in strans_levs:
-            wx.MessageBox('STRANS input contains blank levels. \n\nPlease edit or delete these before running STRANS.', 'Blank Levels Found', 
-                          wx.OK | wx.ICON_EXCLAMATION)
-            self.frame_statusbar.SetStatusText('')
-            return False
-        
-        if not all(len(label) <= 10 for label in [lev['label'] for lev in strans_levs]):
-            wx.MessageBox('One or more level labels are too long. The maximum label length is 10 characters. \n\nPlease edit or delete these before running STRANS.', 'Level Label(s) Too Long', 
-                          wx.OK | wx.ICON_EXCLAMATION)
+        try:
+            self.match_main_element(strans_levs)
+        except ProjectError as error:
+            self.show_project_error(error)
             self.frame_statusbar.SetStatusText('')
             return False
         
-        self.df['main_desig'] = np.empty((len(self.df), 0)).tolist()  # replaces any values in main_desig column with empty lists
-        tag_sep_linelist = self.get_tag_sep_linelist()
-        desig_list = self.df[['wavenumber', 'main_desig', 'line_tags']].values.tolist()  # list of all lines in the linelist
-          
-        matched_lines = self.strans(strans_levs, desig_list, self.main_element_name, tag_sep_linelist)          
-        self.df.update(matched_lines)  # update the main df with designations from strans
         self.display_strans_lines()
 
         return True    
     
-    def get_tag_sep_linelist(self):
-        """returns a dictionary of lists of lines separated by tag type"""        
-        desig_list = {}
-        tags = self.df.tags.unique()  # get list of all tags for lines (L, G, P etc.)
-        
-        for tag in tags:
-            desig_list[tag] = self.df[['wavenumber', 'main_desig', 'line_tags']].loc[self.df['tags'] == tag].values.tolist()    
-            
-        return desig_list
-    
     def other_strans(self, other_lev_list):
         """Runs strans for all other elements that could be present in the linelist"""                     
-        self.df['other_desig'] = np.empty((len(self.df), 0)).tolist()  # replaces any values in other_desig column with empty lists
-        desig_list = self.df[['wavenumber', 'other_desig', 'line_tags']].values.tolist()
-        tag_sep_linelist = self.get_tag_sep_linelist()
-        
-        for other_lev in other_lev_list:
-            element_name, level_file = other_lev.split(',')
-            strans_levs = list(pd.read_csv(level_file).transpose().to_dict().values())
-            matched_lines = self.strans(strans_levs, desig_list, element_name, tag_sep_linelist)
-
-        self.df.update(matched_lines)  # update the main df with designations from strans  
+        self.match_other_elements(other_lev_list)
         self.display_strans_lines()
 
-    def strans(self, strans_levs, desig_list, element_name, tag_sep_linelist):
-        """Creates list of all possible transitions between levels of opposite parity that obey
-        the J selection rule. The list is then compared to all lines in the self.df database and lines with 
-        wavenumbers that match within self.strans_wn_discrim are assigned the labels of the even and odd level.
-        Inputs:
-            strans_levs: list of levels to be used in strans
-            desig_list: dict of lists of line dicts separated into tags to be matched by strans
-            element_name: name of level's element'
-        """     
-        self.frame_statusbar.SetStatusText(f'Running Line Matching for {element_name}')
-                
-        strans_levs_even = [x for x in strans_levs if x['parity']==1]
-        strans_levs_odd = [x for x in strans_levs if x['parity']==0]
-        
-        strans_levs_even = sorted(strans_levs_even, key=lambda x: x['j'])  # sorting by j value.
-        strans_levs_odd = sorted(strans_levs_odd, key=lambda x: x['j'])
-        
-        self.strans_wn_discrim = {'P': 0.1, 'L': 0.02, 'G': 0.02, 'I': 0.02, 'F': 0.02}
-        
-        for even_lev in strans_levs_even:    
-            j_even = even_lev['j']
-            
-            if j_even == 0.0:  # J selection rule J != 0 to 0
-                left_j = bisect.bisect_left(KeyList(strans_levs_odd, key=lambda x: x['j']), j_even + 1)  # returns index of leftmost match
-            else:  # the other J selection 
-                left_j = bisect.bisect_left(KeyList(strans_levs_odd, key=lambda x: x['j']), j_even - 1)
-                
-            right_j = bisect.bisect_right(KeyList(strans_levs_odd, key=lambda x: x['j']), j_even + 1)  # returns index of leftmost match
-               
-            for odd_lev in strans_levs_odd[left_j:right_j]:  # strans_levs_odd now reduced to levels with J values in line with selection rules.             
-                label_even = even_lev['label']
-                label_odd = odd_lev['label']
-                energy_even = even_lev['energy']
-                energy_odd = odd_lev['energy']                   
-                match_wn = abs(energy_even - energy_odd)
-                
-                matched_lines = []
-                
-                for tag in tag_sep_linelist:  # find all matched lines, with wn matching tolerance set by tag type
-                    wn_discrim = self.strans_wn_discrim[tag]  # get wn_discrim for the type of tag
-                                        
-                    left = bisect.bisect_left(KeyList(tag_sep_linelist[tag], key=lambda x: x[0]), match_wn - wn_discrim)  # x[0] is line wavenumber
-                    right = bisect.bisect_left(KeyList(tag_sep_linelist[tag], key=lambda x: x[0]), match_wn + wn_discrim)
-                
-                    matched_lines += tag_sep_linelist[tag][left:right]  # add the list of matched lines to the main matched_lines list
-
-                for matched_line in matched_lines:
-                    #matched line is a list of:[line wavenumber, [level assignment dicts], {line tags}]
-                    
-                    desig_index = next(i for i,v in enumerate(desig_list) if matched_line[0] in v)  # this gives the index of matched_line in the main desig_list
-                    
-                    if len(matched_lines) > 1:  # multiple lines match this transtion
-                        desig_list[desig_index][2]['multiple_lines'] = True
-                    
-                    if energy_even > energy_odd:  # assign upper and lower levels correctly (LOPT needs them in lower-upper format)
-                        upper_lev = label_even
-                        lower_lev = label_odd
-                    else:
-                        upper_lev = label_odd
-                        lower_lev = label_even    
-                    
-                    # because we found the desig_list index, we can modify the desig_list item directly                        
-                    desig_list[desig_index][1].append({'upper_level':upper_lev, 'lower_level':lower_lev, 'element_name': element_name})  # this is being added to the lines in desig_list that were matched.
-            
-        return desig_list
-    
-             
     def display_strans_levs(self):
         """Writes values from self.strans_levs list to the strans_lev_ojlv ObjectListView"""
         self.strans_lev_ojlv.SetObjects(self.strans_levs)
        
     def display_strans_lines(self):
-        """Writes lines with designations from self.df to the strans_lines_ojlv ObjectListView"""   
-        strans_lines = list(self.df.loc[self.df.main_desig.str.len() > 0 ].transpose().to_dict().values())  # convert to list of dicts
-        
-        for line in strans_lines:
-            main_level_string = ''
-            other_level_string = ''
-            for lev_pair in line['main_desig']:
-                if not main_level_string:
-                    sep = ''
-                else:
-                    sep = ';  \t'
-                main_level_string += sep + lev_pair['element_name'] + ': ' + lev_pair['upper_level'] + ' - ' + lev_pair['lower_level']
-                
-            for lev_pair in line['other_desig']:
-                if not other_level_string:
-                    sep = ''
-                else:
-                    sep = ',     '
-                other_level_string += sep + lev_pair['element_name'] + ': ' + lev_pair['upper_level'] + ' - ' + lev_pair['lower_level']
-                
-            line['eq width'] = float(np.log(line['eq width']))
-            line['main_desig'] = main_level_string
-            line['other_desig'] = other_level_string
-            
-        self.strans_lines_ojlv.SetObjects(strans_lines)   
+        """Writes lines with designations from self.df to the strans_lines_ojlv DataFrameListView. The list shows the
+        columns of self.df directly, so the text of a row is only formatted when the row is drawn."""   
+        lines = self.df.loc[self.df.main_desig.str.len() > 0 ]
+        columns = {x: lines[x].values for x in ('wavenumber', 'peak', 'width', 'tags', 'unc', 'main_desig', 'other_desig', 'line_tags')}
+        columns['log_eq_width'] = np.log(lines['eq width'].values)
+        
+        self.strans_lines_ojlv.SetObjects(columns)   
     
     def save_project(self):
-        """Saves the project."""
-        self.save_project_config()
+        """Saves the project and the main TAME config. The project files are written in the background."""
+        self.journal_pending_comments()
+        Project.save_project(self, background=True)
         self.save_main_config()
-        self.save_df()
-        self.save_strans_levs()
-        self.save_lev_comments_df()
-    
-    def save_lev_comments_df(self):
-        """Saves the lopt level comments to the correct pickle file."""
-        self.lopt_lev_comments.to_pickle(self.lopt_lev_comments_file) 
-   
-    def save_strans_levs(self):
-        """Writes the levels in TAME to the .lev file. This is needed for user changes that have been made within TAME."""
-        with open(self.strans_lev_file, 'w') as lev_file:
-            lev_file.write('label,j,energy,parity\n')
-            
-            for lev in self.strans_levs:
-                lev_file.write(f"{lev['label']},{lev['j']},{lev['energy']},{lev['parity']}\n")
-               
-    def save_project_config(self):
-        """Save the project config."""  
-        print(self.project_config_file)
-        with open(self.project_config_file, 'w') as configfile:
-            self.project_config.write(configfile)
-                                      
-        print('project config saved')
+                
+    def on_autosave(self, event):
+        """Timer event. Writes self.df to the autosave if line matching has changed it since the project was saved.
+        Only the copy is made here, it is written on a worker thread."""
+        if self.project_loaded and self.df_dirty:
+            if self.autosave.save(self.df.copy()):
+                self.frame_statusbar.SetStatusText('Autosaved')
         
     def save_main_config(self):  
         """Saves the main TAME config."""
-        with open(self.main_config_file, 'w') as configfile:
+        with atomic_open(self.main_config_file) as configfile:
             self.main_config.write(configfile)
             
-    def write_lopt_inp(self):
-        """Writes the LOPT input file. Taking into account user selected tags, uncertainties and multiply identified lines."""
-        with open(self.lopt_inp_file, 'w') as inp_file:
-            lines = self.df.loc[self.df.main_desig.str.len() > 0 ].values.tolist()  # create list of all lines with a main designation
-
-            if lines == []:  # no lines have a main_designation in self.df ie strans has not been run
-                wx.MessageBox('No lines found for LOPT input. Please run STRANS first', 'No Matched Lines', 
-                      wx.OK | wx.ICON_EXCLAMATION)
-                return False                
-            else:
-                for line in lines:
-                    snr = f'{line[1]:9.0f}'
-                    wn = f'{line[0]:15.4f}'
-                    tag = '       '
-                    main_desigs = line[6]
-                    other_desigs = line[7] 
-                    user_desig = line[8]
-                    tags = line[9] 
-                         
-                    if user_desig != '':  # there is a user selected level for the line
-                        if user_desig['element_name'] == self.main_element_name:  # only if the user selected transition is of the main element
-                            upper_level = f'{user_desig["upper_level"]:>12}'
-                            lower_level = f'{user_desig["lower_level"]:>12}'
-                            
-                            if all(value == False for value in tags.values()): # no user defined tags for the line
-                                unc = f'{line[5]:.4f}'
-                            elif tags['user_unc'] != False:
-                                unc = f"{tags['user_unc']:.4f}"
-                                tag = '       B'
-                            elif tags['multiple_lines'] == True:  # multiple lines could have been a transition, but the user has selected one. 
-                                unc = f'{line[5]:.4f}'
-                            else:
-                                unc = f'{self.lopt_default_unc:.4f}'
-                                tag = '       B'
-                            
-                            lopt_str = f'{snr}{wn} cm-1 {unc}{lower_level}{upper_level}{tag}\n'
-                            inp_file.writelines(lopt_str)
-                        
-                    else:  # no user label for line
-                        if len(main_desigs) != 1 or len(other_desigs) !=0:  # multiple identifications for line
-                            unc = f'{self.lopt_default_unc:.4f}'
-                            tag = '       Q'
-                        elif all(value == False for value in tags.values()): # no user defined tags for the line
-                            unc = f'{line[5]:.4f}'
-                        elif tags['user_unc'] != False:
-                            unc = f"{tags['user_unc']:.4f}"
-                            tag = '       B'
-                        else:
-                            unc = f'{self.lopt_default_unc:.4f}'
-                            tag = '       B'
-                            
-                        for desig in main_desigs:
-                            upper_level = f'{desig["upper_level"]:>12}'
-                            lower_level = f'{desig["lower_level"]:>12}'
-                        
-                            lopt_str = f'{snr}{wn} cm-1 {unc}{lower_level}{upper_level}{tag}\n'
-                            inp_file.writelines(lopt_str)
-                            
-            # for level in self.lopt_fixed_levels[1:]:  # skip ground
-            #     strans_lev = next((item for item in self.strans_levs if item['label']==level))
-            #     lev_energy = strans_lev['energy'] 
-                
-            #     lopt_str = f'     9999{lev_energy:>15} cm-1 0.0000{self.lopt_fixed_levels[0]:>12}{level:>12}\n'
-            #     inp_file.writelines(lopt_str)
-                
-        return True
-               
-    def write_lopt_par(self):
-        """Gets text from the LOPT .par template file and writes .par file for the project."""
-        with open('lopt/lopt_template.par', 'r') as temp_par_file:
-            par_lines = temp_par_file.readlines()
-            par_lines[0] = f'{self.main_element_name}_lopt.inp{par_lines[0]}'
-            par_lines[1] = f'{self.main_element_name}_lopt.fixed{par_lines[1]}'
-            par_lines[2] = f'{self.main_element_name}_lopt.lev{par_lines[2]}'
-            par_lines[3] = f'{self.main_element_name}_lopt.lin{par_lines[3]}'
-            
-        with open(self.lopt_par_file, 'w') as par_file:
-            par_file.writelines(par_lines)
-                
-    def write_lopt_fixed(self):
-        """Writes the fixed levels for LOPT. If the ground level is selected, then unc = 0, otherwise = 2.0."""
-        with open(self.lopt_fixed_file, 'w') as fixed_file:
-            fixed_strings = []
-            
-            for level in self.lopt_fixed_levels:
-                strans_lev = next((item for item in self.strans_levs if item['label']==level))
-                lev_energy = strans_lev['energy'] 
-                if lev_energy == 0.0:
-                    lev_unc = f'{0.0:.4f}'
-                else:
-                    lev_unc = f'{2.0:.4f}'
-                             
-                fixed_strings.append(f'{level:>9}{lev_energy:>13.4f}{lev_unc:>13}\n')
-            
-            fixed_file.writelines(fixed_strings)    
-            
-    def get_lopt_output(self):
-        """Gets output from the LOPT output files. Puts these into dataframes. Duplicates lines so that the line appears
-        in the output GroupListView twice - once for each level in the transition."""
+    def display_lopt_output(self):
+        """Shows the lines and levels from the last LOPT run in the LOPT GroupListView, keeping the scroll position,
+        the focused row and the expanded groups of the previous run."""
         self.lopt_lev_pos = self.lopt_lev_ojlv.GetTopItem()
         self.lopt_lev_select_row = self.lopt_lev_ojlv.GetFocusedRow()          
-        self.lopt_lev_groups_expanded = []
-        
-        if self.lopt_lev_ojlv.groups:
-            for i, group in enumerate(self.lopt_lev_ojlv.groups):
-                self.lopt_lev_groups_expanded.append((i, group.isExpanded))
+        # groups are keyed by level energy, which LOPT changes on every run, so the state is kept by designation
+        self.lopt_lev_groups_expanded = {self.shown_lopt_lev_desigs[energy]: is_expanded  # designation: isExpanded
+                                         for energy, is_expanded in self.lopt_lev_ojlv.GetExpansionState().items()
+                                         if energy in self.shown_lopt_lev_desigs}
 
-        self.lopt_levs = pd.read_csv(self.lopt_lev_file, delimiter='\t')
-        lopt_lines_df = pd.read_csv(self.lopt_lin_file, delimiter='\t')
-        merged_lines = pd.merge_asof(lopt_lines_df[['W_obs', 'S', 'Wn_c', 'E1', 'E2', 'L1', 'L2', 'F', 'uncW_o']].sort_values('W_obs'), 
-                                     self.df[['wavenumber', 'peak', 'eq width', 'tags']].sort_values('wavenumber'), 
-                                     left_on='W_obs', 
-                                     right_on='wavenumber',
-                                     tolerance=0.005,
-                                     direction='nearest') # match lopt lines to main df file based on nearest wavenumber
-        
-        merged_lines['dWO-C'] = merged_lines['W_obs'] - merged_lines['Wn_c']
-        merged_lines['star'] = np.where((merged_lines['dWO-C'].abs() > (merged_lines['uncW_o']*self.star_discrim)), True, False)
-        merged_lines['log_ew'] = np.log(merged_lines['eq width'])
-        merged_lines['main_level'] = ''
-        merged_lines['other_level'] = ''
-        merged_lines['F'] = np.where(merged_lines['F'] == None, ' ', merged_lines['F'])
-                
-        duplicated_lines = pd.DataFrame(np.repeat(merged_lines.copy().values,2,axis=0))
-        duplicated_lines.columns = merged_lines.columns  
-                
-        t1 = duplicated_lines.iloc[0::2].copy()
-        t1['main_level'] = t1['E1']
-        t1['other_level'] = t1['L2'] 
-        t2 = duplicated_lines.iloc[1::2].copy()
-        t2['main_level'] = t2['E2'] 
-        t2['other_level'] = t2['L1'] 
-        
-        duplicated_lines.update(t1)
-        duplicated_lines.update(t2)
-             
-        duplicated_lines = list(duplicated_lines.transpose().to_dict().values())
-        self.lopt_lev_ojlv.SetObjects(duplicated_lines)         
-        self.lopt_output_lines = duplicated_lines        
+        self.lopt_lev_ojlv.SetObjects(self.lopt_output_lines)         
+        self.shown_lopt_lev_desigs = self.lopt_lev_desigs
         # self.load_lopt_lev_comments()    
+        self.lopt_lev_ojlv.SetExpansionState({energy: self.lopt_lev_groups_expanded.get(self.lopt_lev_desigs.get(energy))
+                                              for energy in self.lopt_lev_ojlv.GetExpansionState()})  # new levels stay expanded
         self.lopt_lev_ojlv.EnsureVisible(min(self.lopt_lev_pos + self.lopt_lev_ojlv.GetCountPerPage() - 1, self.lopt_lev_ojlv.GetItemCount() - 1))  # ensures that the levels stay in the same scrolled position after lopt has run.
-           
-        for group in self.lopt_lev_groups_expanded:
-            if not group[1]:
-                self.lopt_lev_ojlv.Collapse(self.lopt_lev_ojlv.groups[group[0]])
                 
         if self.lopt_lev_select_row != -1:  # -1 means no row was focussed.
             self.lopt_lev_ojlv.Select(self.lopt_lev_select_row)  # puts the focus back on the line that was focussed before lopt ran.
         
         
         
-    def load_lopt_lev_comments(self):
-        """Load the comments for each level. If the pkl file is missing - create it from the strans levels"""        
-        if not os.path.isfile(self.lopt_lev_comments_file):  # if no existing DataFrame is present
-            strans_desigs = [lev['label'] for lev in self.strans_levs]
-            self.lopt_lev_comments = pd.DataFrame(strans_desigs, columns=['Designation'])
-            self.lopt_lev_comments['Comments'] = ''
-            self.lopt_lev_comments.to_pickle(self.lopt_lev_comments_file) 
-        else:
-            self.lopt_lev_comments = pd.read_pickle(self.lopt_lev_comments_file)
-            # old_lopt_levs = self.lopt_lev_comments['Designation'].values.tolist()        
-            # current_lopt_levs= self.lopt_levs['Designation'].values.tolist()            
-            # new_levs = [{'Designation':x, 'Comments':''} for x in current_lopt_levs if x not in old_lopt_levs]
-
-            # for lev in new_levs:
-            #     self.lopt_lev_comments = self.lopt_lev_comments.append(lev, ignore_index=True)
-      
     def display_lopt_line(self, line):  
         """Sets values for the various controls and the line plot in the LOPT line panel.""" 
         
-        line_dict = list(line.transpose().to_dict().values()).pop()  
+        line_dict = line.to_dict('records')[-1]  
         self.user_unc_txtctrl.SetValue('')  # sets back to empty when new line selected        
         self.lopt_line_panel_header.SetLabel(f"Line: {line_dict['wavenumber']:.4f} {self.cm_1}")
         
@@ -641,7 +418,7 @@ class MyFrame(mainWindow):
         self.lopt_line_listctrl.DeleteAllItems()
         
         
-        for i, desig in enumerate(line_dict['main_desig'] + line_dict['other_desig']):
+        for i, desig in enumerate([*line_dict['main_desig'], *line_dict['other_desig']]):
             list_ctrl_list = [desig['element_name'], 
                               desig['upper_level'], 
                               desig['lower_level'],
@@ -654,14 +431,14 @@ class MyFrame(mainWindow):
 
         ### Update the checkboxes ###   
         line_tags = line_dict['line_tags']   
-        self.incorr_assign_chkbox.SetValue(line_tags['incorr_assign'])
-        self.ringing_chkbox.SetValue(line_tags['ringing'])
-        self.noise_chkbox.SetValue(line_tags['noise'])
-        self.blend_chkbox.SetValue(line_tags['blend'])
+        self.incorr_assign_chkbox.SetValue(has_tag(line_tags, INCORR_ASSIGN))
+        self.ringing_chkbox.SetValue(has_tag(line_tags, RINGING))
+        self.noise_chkbox.SetValue(has_tag(line_tags, NOISE))
+        self.blend_chkbox.SetValue(has_tag(line_tags, BLEND))
         
-        if line_tags['user_unc'] != False:  # if not False
+        if not np.isnan(line_dict['user_unc']):  # NaN if the user has not set an uncertainty
             self.user_unc_chkbox.SetValue(True)
-            self.user_unc_txtctrl.SetValue(str(line_tags['user_unc']))
+            self.user_unc_txtctrl.SetValue(str(line_dict['user_unc']))
         else:
             self.user_unc_chkbox.SetValue(False)
             self.user_unc_txtctrl.SetValue('')
@@ -678,24 +455,26 @@ class MyFrame(mainWindow):
         
      
     def plot_lopt_line(self, wavenumber, peak, width):   
-        """Plots the spectra from self.plot_df to the matplotlib plot. There are scaling factors that can be changed to show
+        """Plots the spectra from self.spectra to the matplotlib plot. There are scaling factors that can be changed to show
         more/less of the plot area."""
 
-        if not self.plot_df.empty:  # plot_df will be empty if the user did not select any plot files at project creation
+        if len(self.spectra):  # spectra will be empty if the user did not select any plot files at project creation
             plot_width = self.lopt_plot_width / 2  # as this is total width
             # plot_y_scale = 1.1
             # plot_x_scale = 5.
-            self.matplotlib_canvas.clear()  
             ax = self.matplotlib_canvas.gca()   
+            ax.clear()  # the canvas is drawn once below, not here as well
             
-            low = abs(self.plot_df['wavenumber'] - (wavenumber-plot_width)).idxmin() + 1
-            high = abs(self.plot_df['wavenumber'] - (wavenumber+plot_width)).idxmin() + 1
-            df_part = self.plot_df.iloc[low:high]
-               
-            spectras = df_part.columns[df_part.notna().any()].tolist()[1:]  # gives columns that do not contain only NaN.
+            low = wavenumber - plot_width
+            high = wavenumber + plot_width
+            max_points = 2 * max(int(ax.bbox.width), 1)  # min/max of each pixel column, more can not be seen
     
-            for spectra in spectras:
-                df_part.plot(kind='line', x='wavenumber', y=spectra, ax=ax)
+            for spectrum in self.spectra.names_between(low, high):  # only spectra that cover the plotted window are read
+                spectrum_wn, spectrum_int = self.spectra.query(spectrum, low, high, max_points)
+                ax.plot(spectrum_wn, spectrum_int, label=spectrum)
+                
+            if ax.lines:
+                ax.legend()
     
             self.matplotlib_canvas.axes.set_xlabel('Wavenumber (cm-1)')
             self.matplotlib_canvas.axes.set_ylabel('SNR')
@@ -709,7 +488,7 @@ class MyFrame(mainWindow):
     def display_lopt_lev(self, level):
         """Display info about the LOPT level. Also the user comments."""
         
-        lev_dict = list(level.transpose().to_dict().values()).pop()         
+        lev_dict = level.to_dict('records')[-1]         
         self.lopt_lev_panel_header.SetLabel(f"Level: {lev_dict['Designation']}")
         self.lopt_level_listctrl.DeleteAllItems()
         
@@ -727,8 +506,8 @@ class MyFrame(mainWindow):
         self.lopt_level_listctrl.Append(lopt_level_list)   
          
         next_row = self.lopt_lev_ojlv.GetObjectAt(self.lopt_lev_ojlv.GetFocusedRow()+1)  # gives the first line row in the group      
-        selected_lev = self.group_column.GetGroupKeyAsString(self.group_column.GetGroupKey(next_row))  # gives the group title of the selected level, i.e. the level designation
-        self.selected_lev_index = self.lopt_lev_comments.loc[self.lopt_lev_comments['Designation'] == selected_lev].index.values[0]  # get index of the level     
+        selected_lev = self.lopt_lev_ojlv.GetGroupKeyAsString(self.group_column, self.group_column.GetGroupKey(next_row))  # gives the group title of the selected level, i.e. the level designation
+        self.selected_lev_index = self.lev_comment_index(selected_lev)  # get index of the level     
         
         with wx.EventBlocker(self):  # prevents the textctrl event from firing and writing this value to the df
             self.lopt_level_comments.SetValue(self.lopt_lev_comments.at[self.selected_lev_index, 'Comments']) 
@@ -738,17 +517,22 @@ class MyFrame(mainWindow):
         self.sizer_8.Layout()
        
         
-    def update_df_cell(self, wavenumber, column, value):
-        """Updates a cell of the main self.df dataframe, specified by wavenumber and column, with value."""   
-        selected_line_index = self.df.loc[self.df['wavenumber'] == wavenumber].index.values[0]
-        self.df.at[selected_line_index, column] = value  # just updates a single value
-        print(self.df.iloc[selected_line_index])
+    def lines_changed(self, wavenumbers, column):
+        """Brings the STRANS line list up to date after a column of self.df has been edited for the given lines. Only
+        the line tags are used by the list (by its tag filter), and the list is refreshed once the edits stop."""
+        if column != 'line_tags' or 'line_tags' not in self.strans_lines_ojlv.columnData:
+            return
+        
+        list_wavenumbers = self.strans_lines_ojlv.GetColumnData('wavenumber')
+        positions = np.minimum(np.searchsorted(list_wavenumbers, wavenumbers), max(len(list_wavenumbers) - 1, 0))
+        shown = list_wavenumbers[positions] == wavenumbers if len(list_wavenumbers) else np.zeros(0, dtype=bool)
+        
+        self.strans_lines_ojlv.GetColumnData('line_tags')[positions[shown]] = self.df['line_tags'].values[self.line_positions(wavenumbers[shown])[0]]
+        self.strans_line_filters['tagged'].Invalidate()
+        
+        if self.strans_line_filters['tagged'].IsActive():
+            self.strans_lines_batch.RepopulateList()
         
-    def get_df_cell(self, wavenumber, column):
-        """Gets the value of a cell in the main self.df dataframe for a given wavenumber and column."""
-        selected_line_index = self.df.loc[self.df['wavenumber'] == wavenumber].index.values[0]
-        return self.df.at[selected_line_index, column]    
-
     def search_listview(self, event, listview):
         """Searches the primary column of the listview with the string typed into the search ctrl. If the entered
         text is not found, the serachctrl background turns red."""
@@ -785,75 +569,41 @@ class MyFrame(mainWindow):
     def export_linelist(self, full_list):
         """Exports the STRANS output linelist with matched transitions. full_list determines whether only lines with
         transitions involving the main element are outputted, or the entire linelist is regardless of whether a 
-        transition has been found by STRANS or not."""
-        with wx.FileDialog(self, "Export Matched Linelist", wildcard="Linelist Files (*.lin)|*.lin",
+        transition has been found by STRANS or not. The linelist can be saved as a .lin CSV file, fixed width text or
+        Parquet, and is written in chunks by lib/linelist_export.py."""
+        linelist_type = 'Complete' if full_list else 'Matched'
+        formats = linelist_export.available_formats()
+        
+        with wx.FileDialog(self, f"Export {linelist_type} Linelist", wildcard='|'.join(linelist_export.EXPORT_FORMATS[x][0] for x in formats),
                        style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as fileDialog:
 
             if fileDialog.ShowModal() == wx.ID_CANCEL:
                 return     # the user changed their mind
     
             filename = fileDialog.GetPath()
-
-            with open(filename, 'w') as file:
-                
-                if full_list:  # user has selected that all lines should be in the outputted linelist
-                    lines = self.df.values.tolist()
-                    linelist_type = 'Complete'
-                else:
-                    lines = self.df.loc[self.df.main_desig.str.len() > 0 ].values.tolist()
-                    linelist_type = 'Matched'
-                    
-                file.writelines('wavenumber,snr,fwhm,eq_width,fit,unc,main_element,other_elements\n')  # header
-                
-                for line in lines:
-                    main_level_string = ''
-                    other_level_string = ''
-                    
-                    for lev_pair in line[6]:
-                        if not main_level_string:
-                            sep = ''
-                        else:
-                            sep = '\t'                                
-                        main_level_string += sep + lev_pair['element_name'] + ': ' + lev_pair['upper_level'] + ' - ' + lev_pair['lower_level']
-                        
-                    for lev_pair in line[7]:
-                        if not other_level_string:
-                            sep = ''
-                        else:
-                            sep = '\t'                                
-                        other_level_string += sep + lev_pair['element_name'] + ': ' + lev_pair['upper_level'] + ' - ' + lev_pair['lower_level']
-                    
-                    line[0] = f'{line[0]:.4f}'
-                    line[1] = f'{line[1]:.0f}' 
-                    line[2] = f'{line[2]:.0f}' 
-                    line[3] = f'{line[3]:.0f}' 
-                    line[5] = f'{line[5]:.4f}' 
-                    line[6] = main_level_string
-                    line[7] = other_level_string
-                    
-                    file.writelines(','.join(line[:8]) + '\n') 
+            fmt = formats[fileDialog.GetFilterIndex()]
+            
+        if not os.path.splitext(filename)[1]:
+            filename += linelist_export.EXPORT_FORMATS[fmt][1]
+            
+        self.frame_statusbar.SetStatusText(f'Exporting {linelist_type.lower()} linelist ...')
+        
+        try:
+            with wx.BusyCursor():
+                self.write_linelist(filename, fmt, full_list)
+        except OSError as error:
+            wx.MessageBox(str(error), 'Export Error', wx.OK | wx.ICON_EXCLAMATION)
+            self.frame_statusbar.SetStatusText('')
+            return
+        except ProjectError as error:
+            self.show_project_error(error)
+            self.frame_statusbar.SetStatusText('')
+            return
                     
         self.frame_statusbar.SetStatusText(f'{linelist_type} linelist exported to {filename}')   
       
         
       
-    def levhams_match_tol(self, line_list, tol):
-        """Generator function to split predicted lines into groups with each element separated from its neighbour 
-        by a maximium given tolerance.
-        """
-        matches = []
-        last = line_list[0]['pred_energy']
-        
-        for element in line_list:
-            if element['pred_energy'] - last > tol:
-                yield matches
-                matches = []
-                
-            matches.append(element)
-            last = element['pred_energy']
-        yield matches    
-        
-    
     def display_levhams_levs(self, levels):
         """Add the list of grouped level lines from levhams to the listctrl if there are >= the number of selected lines
         in each group. Also highlights the summary row."""
@@ -889,11 +639,7 @@ class MyFrame(mainWindow):
         """Handles clicks on the columns 0 and 10 which otherwise raise exceptions due to TypeErrors."""
         if event.GetSortColumn() == 0:  # group expand/contract column
             event.Veto()
-            num_expanded = 0
-            
-            for group in self.lopt_lev_ojlv.groups:  # works out if more than 10 groups are expanded
-                if group.isExpanded == True:
-                    num_expanded +=1
+            num_expanded = sum(self.lopt_lev_ojlv.GetExpansionState().values())  # works out if more than 10 groups are expanded
                     
             if num_expanded <= 10:
                 self.lopt_lev_ojlv.ExpandAll()
@@ -917,44 +663,30 @@ class MyFrame(mainWindow):
         up to date level values.
         """
         if self.main_panel.GetSelection() == 2:  # Update LEVHAMS level listctrl with the latest strans values            
-            with wx.EventBlocker(self):  # prevents the event from firing            
-                self.levhams_level_listctrl.DeleteAllItems()  # otherwise just appends to prev. values
-                
-                if not self.levhams_selected_levs:  # populate dict if doesn't exist already
-                    for level in self.strans_levs:
-                        self.levhams_selected_levs[level['label']] = False
-                
-                for i, level in enumerate(self.strans_levs):                    
-                    levhams_level_list = [
-                        level['label'],
-                        level['j'],
-                        level['energy'],
-                        level['parity']]          
-                    self.levhams_level_listctrl.Append(levhams_level_list)  
-                    
-                    if level['label'] in self.levhams_selected_levs:  # set checkboxes
-                        self.levhams_level_listctrl.CheckItem(i, self.levhams_selected_levs[level['label']])
-                    else:
-                        self.levhams_selected_levs[level['label']] = False
-                        
-    def on_levhams_lev_checked(self, event):  
-        """Updates levhams_selected_lines based on user checkbox selection"""           
-        level_label = self.levhams_level_listctrl.GetItem(event.GetIndex(), 0).GetText()
-        self.levhams_selected_levs[level_label] = True
+            self.refresh_levhams_levels()
+            
+    def refresh_levhams_levels(self):
+        """Show the current strans levels in the LEVHAMS level list. The list is only rebuilt if the levels have 
+        changed since it was last shown, and levels keep their checkboxes by label."""
+        levels_key = [(x['label'], x['j'], x['energy'], x['parity']) for x in self.strans_levs]
         
-
-    def on_levhams_lev_unchecked(self, event): 
-        """Updates levhams_selected_lines based on user checkbox selection"""        
-        level_label = self.levhams_level_listctrl.GetItem(event.GetIndex(), 0).GetText()
-        self.levhams_selected_levs[level_label] = False
+        if levels_key == self.levhams_levels_key:
+            return
+        
+        listctrl = self.levhams_level_listctrl
+        checked_labels = {self.levhams_levels_key[i][0] for i in listctrl.GetCheckedIndexes()} if self.levhams_levels_key else set()
         
+        listctrl.SetRows([[x[i] for x in levels_key] for i in range(4)], 
+                         checked=[x[0] in checked_labels for x in levels_key])
+        self.levhams_levels_key = levels_key
         
     def on_levhams(self, event): 
         """Runs the main levhams code when the user selects run."""
         
         if self.main_panel.GetSelection() != 2:
             self.main_panel.ChangeSelection(2)
-            self.on_notebook_page_change(None)
+        
+        self.refresh_levhams_levels()
             
         self.frame_statusbar.SetStatusText('Predicting Levels ...') 
         
@@ -964,40 +696,13 @@ class MyFrame(mainWindow):
         self.levhams_wn_max = self.levhams_wn_max_spinctrl.GetValue()
         self.levhams_wn_min = self.levhams_wn_min_spinctrl.GetValue()
                 
-        selected_levs = [lev for lev in self.strans_levs if self.levhams_selected_levs[lev['label']]]
+        selected_levs = [self.strans_levs[i] for i in self.levhams_level_listctrl.GetCheckedIndexes()]
         
         if selected_levs:  
+            pred_levels = self.predict_levels(selected_levs, self.levhams_tol, self.levhams_use_all_lines, 
+                                              self.levhams_wn_min, self.levhams_wn_max)
             
-            pred_lines = []
-            all_lines = list(self.df[['wavenumber','peak','eq width','unc', 'main_desig']].transpose().to_dict().values()) # xxx here is where you would run a query for all lines without a desig if you wanted to implement that
-            
-            if not self.levhams_use_all_lines:
-                all_lines = [x for x in all_lines if not x['main_desig']]
-            
-            for level in selected_levs:  
-                for line in all_lines:
-                    pred_lines.append({'pred_energy':level['energy'] - line['wavenumber'], 
-                                       'level':level['label'], 
-                                       'j':level['j'],
-                                       'energy':level['energy'],
-                                       'wavenumber':line['wavenumber'],
-                                       'peak':line['peak'],
-                                       'eq width':line['eq width'],
-                                       'unc':line['unc']})
-                    pred_lines.append({'pred_energy':level['energy'] + line['wavenumber'], 
-                                       'level':level['label'], 
-                                       'j':level['j'],
-                                       'energy':level['energy'],
-                                       'wavenumber':line['wavenumber'],
-                                       'peak':line['peak'],
-                                       'eq width':line['eq width'],
-                                       'unc':line['unc']})
-            
-            pred_lines = sorted(pred_lines, key=lambda k: k['pred_energy'])  # sort by wavenumber            
-            pred_lines = [x for x in pred_lines if x['pred_energy'] >= self.levhams_wn_min and x['pred_energy'] <= self.levhams_wn_max]
-            
-            if pred_lines:  # if there are any predicted lines
-                pred_levels = list(self.levhams_match_tol(pred_lines, self.levhams_tol))  # separates predicted lines into groups
+            if pred_levels:  # if there are any predicted lines
                 self.display_levhams_levs(pred_levels)
             else:
                 wx.MessageBox('No predicted levels found. Please add more levels or change search parameters.', 'No Predicted Levels Found', 
@@ -1011,51 +716,125 @@ class MyFrame(mainWindow):
 
     def on_export_lopt_levs(self, event):    
         """Exports a sorted and formatted list of all LOPT levels and their lines."""
+        if self.lopt_output_lines is None:  # LOPT has not been run
+            self.show_project_error(ProjectError('No levels found from LOPT output. Please run LOPT first', 'No Levels Found'))
+            return
+        
         with wx.FileDialog(self, "Export LOPT Sorted Levels", wildcard="Linelist Files (*.llf)|*.llf",
                        style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as fileDialog:
            
-            # if 'self.lopt_levs' in globals():  # LOPT has been run            
-            try:
-                if fileDialog.ShowModal() == wx.ID_CANCEL:
-                    return     # the user changed their mind        
-                filename = fileDialog.GetPath()
-                
-                if filename.split('.')[-1] != 'llf':   #if user types new filename in dialog
-                    filename += '.llf'                
-                lopt_levels = list(self.lopt_levs.transpose().to_dict().values())
-    
-                with open(filename, 'w') as file:            
-                    for level in lopt_levels: 
-                        file.write('--------------------------------------------\n')
-                        file.write('Config      Energy (cm-1)   D1        D2        D3        No. of Lines  Comments\n')
-                        file.write(f"{level['Designation']:<12}{level['Energy']:<16}{level['D1']:<10}{level['D2']:<10}{level['D3']:<10}{level['N_lines']:<14}{level['Comments']}\n\n")
-                        file.write('   Fit  log(EW) SNR     Wn_Obs (cm-1)  Unc_Wn_obs  del_Wn(Obs-C)  Level       Tags\n')
-                        
-                        lopt_lines = [x for x in self.lopt_output_lines if x['other_level'] == level['Designation']]
-                        
-                        for line in lopt_lines:
-                            if line['star']:
-                                star = '*'
-                            else:
-                                star= ' '
-                            
-                            if line['L1'] == line['other_level']:
-                                trans_lev = line['L2']
-                            else:
-                                trans_lev = line['L1']
-                                
-                            if line['F'] == 'Q':
-                                flag = 'M'
-                            else:
-                                flag = ' '
-                            
-                            file.write(f"{star:<3}{line['tags']:<5}{line['log_ew']:<8.2f}{line['peak']:<8.0f}{line['wavenumber']:<15.4f}{line['uncW_o']:<12.4f}{line['dWO-C']:>7.4f}        {trans_lev:<12}{flag}\n")
-                        
-                        file.write('--------------------------------------------\n')
-                        
-            except AttributeError:
-                wx.MessageBox('No levels found from LOPT output. Please run LOPT first', 'No Levels Found', 
-                              wx.OK | wx.ICON_EXCLAMATION)
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return     # the user changed their mind        
+            filename = fileDialog.GetPath()
+            
+        if filename.split('.')[-1] != 'llf':   #if user types new filename in dialog
+            filename += '.llf'                
+            
+        progress_dialog = wx.ProgressDialog('Export LOPT Sorted Levels', 'Writing levels ...', maximum=100, parent=self,
+                                            style=wx.PD_APP_MODAL | wx.PD_AUTO_HIDE)
+        percent_done = [0]
+        
+        def progress(levels_done, num_levels):
+            """Only updates the dialog when the percentage changes, there can be thousands of levels"""
+            percent = levels_done * 100 // max(num_levels, 1)
+            if percent != percent_done[0]:
+                percent_done[0] = percent
+                progress_dialog.Update(percent)
+        
+        try:
+            self.write_lopt_levels(filename, progress)
+        except OSError as error:
+            wx.MessageBox(str(error), 'Export Error', wx.OK | wx.ICON_EXCLAMATION)
+        else:
+            self.frame_statusbar.SetStatusText(f'LOPT levels exported to {filename}')
+        finally:
+            progress_dialog.Destroy()
+        
+    def on_filter_wavenumber(self, event):
+        """Asks the user for the range of wavenumbers of the lines shown in the STRANS and LOPT line lists."""
+        text = self.ask_filter_value('Show the lines between two wavenumbers, e.g. 15000-16000.\nLeave empty to show all lines.', 
+                                     'Wavenumber Range')
+        if text is None:
+            return
+        
+        numbers = [float(x) for x in re.findall(r'\d+\.?\d*', text)]
+        
+        if len(numbers) not in (0, 2):
+            wx.MessageBox('Please enter two wavenumbers, e.g. 15000-16000', 'Wavenumber Range', wx.OK | wx.ICON_EXCLAMATION)
+            return
+        
+        low, high = (min(numbers), max(numbers)) if numbers else (None, None)
+        self.strans_line_filters['wavenumber'].SetRange(low, high)
+        self.lopt_line_filters['wavenumber'].SetRange(low, high)
+        self.apply_line_filters()
+        
+    def on_filter_snr(self, event):
+        """Asks the user for the minimum SNR of the lines shown in the STRANS and LOPT line lists."""
+        text = self.ask_filter_value('Show the lines with at least this SNR.\nLeave empty to show all lines.', 'Minimum SNR')
+        if text is None:
+            return
+        
+        if text and not self.is_float(text):
+            wx.MessageBox('Please enter a number', 'Minimum SNR', wx.OK | wx.ICON_EXCLAMATION)
+            return
+        
+        low = float(text) if text else None
+        self.strans_line_filters['snr'].SetRange(low)
+        self.lopt_line_filters['snr'].SetRange(low)
+        self.apply_line_filters()
+        
+    def on_filter_element(self, event):
+        """Asks the user for an element. Only lines with a transition of that element are shown in the STRANS lines."""
+        text = self.ask_filter_value('Show the lines with a transition of this element, e.g. Fe II.\nLeave empty to show all lines.',
+                                     'Element')
+        if text is not None:
+            self.strans_line_filters['element'].SetName(text)
+            self.apply_line_filters()
+        
+    def on_filter_tagged(self, event):
+        """Hides or shows the STRANS lines tagged as noise or ringing."""
+        self.strans_line_filters['tagged'].SetEnabled(event.IsChecked())
+        self.apply_line_filters()
+        
+    def on_filter_multiply_identified(self, event):
+        """Shows only the STRANS lines with more than one transition, or all the lines."""
+        self.strans_line_filters['multiply_identified'].SetEnabled(event.IsChecked())
+        self.apply_line_filters()
+        
+    def on_filter_starred(self, event):
+        """Shows only the starred LOPT lines (obs-calc larger than the uncertainty allows), or all the lines."""
+        self.lopt_line_filters['starred'].SetEnabled(event.IsChecked())
+        self.apply_line_filters()
+        
+    def on_clear_filters(self, event):
+        """Shows all lines in the STRANS and LOPT line lists."""
+        for line_filter in ('wavenumber', 'snr'):
+            self.strans_line_filters[line_filter].SetRange()
+            self.lopt_line_filters[line_filter].SetRange()
+            
+        self.strans_line_filters['element'].SetName(None)
+        
+        for line_filter, menu_item in ((self.strans_line_filters['tagged'], self.frame_menubar.filter_tagged_item),
+                                       (self.strans_line_filters['multiply_identified'], self.frame_menubar.filter_multiply_identified_item),
+                                       (self.lopt_line_filters['starred'], self.frame_menubar.filter_starred_item)):
+            line_filter.SetEnabled(False)
+            menu_item.Check(False)
+            
+        self.apply_line_filters()
+        
+    def ask_filter_value(self, message, caption):
+        """Asks the user for the value of a line filter. Returns None if the user cancelled."""
+        with wx.TextEntryDialog(self, message, caption) as dialog:
+            if dialog.ShowModal() == wx.ID_CANCEL:
+                return None
+            return dialog.GetValue().strip()
+        
+    def apply_line_filters(self):
+        """Redisplays the STRANS and LOPT line lists with the current line filters."""
+        self.strans_lines_ojlv.RepopulateList()
+        
+        if self.lopt_lev_ojlv.GetObjects():
+            self.lopt_lev_ojlv.RebuildGroups()
         
     def on_preferences(self, event):
         """Display TAME preferences dialog and set global variables accordingly."""
@@ -1071,54 +850,70 @@ class MyFrame(mainWindow):
             self.project_config.set('lopt', 'wn_discrim', str(self.strans_wn_discrim))
                        
     def on_lopt_lev_comments(self, event):
-        """Updates the lopt_lev_comments df with the user entered comments."""
+        """Updates the lopt_lev_comments df with the user entered comments. The edit is journaled by
+        journal_pending_comments() rather than on every keystroke."""
         text = self.lopt_level_comments.GetValue()   
-        self.lopt_lev_comments.at[self.selected_lev_index, 'Comments'] = text  # updates level with the comments
-
+        designation = self.lopt_lev_comments.at[self.selected_lev_index, 'Designation']
+        
+        if text != self.lopt_lev_comments.at[self.selected_lev_index, 'Comments']:  # not just a new level being shown
+            self.set_lev_comment(designation, text, journal=False)
+            self.pending_comments[('lev', designation)] = text
+            self.comment_timer.StartOnce(COMMENT_JOURNAL_DELAY)
+        
     def on_lopt_line_comments(self, event):
-        """Updates the main df with the user entered comments."""
+        """Updates the main df with the user entered comments. The edit is journaled by journal_pending_comments()
+        rather than on every keystroke."""
         text = self.lopt_line_comments_txtctrl.GetValue()
-        selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']
-        self.update_df_cell(selected_wn, 'comments', text)
+        wavenumber = self.focused_lopt_wavenumber()
+        
+        if text != self.get_df_cell(wavenumber, 'comments'):  # not just a new line being shown
+            self.update_df_cell(wavenumber, 'comments', text, journal=False)
+            self.pending_comments[('line', wavenumber)] = text
+            self.comment_timer.StartOnce(COMMENT_JOURNAL_DELAY)
+            
+    def on_comment_timer(self, event):
+        """Timer event. The user has stopped typing in a comment box."""
+        self.journal_pending_comments()
+        
+    def on_comment_kill_focus(self, event):
+        """The user has left a comment box."""
+        self.journal_pending_comments()
+        event.Skip()
+        
+    def journal_pending_comments(self):
+        """Records the comments that have been typed since they were last journaled, one record per line or level."""
+        self.comment_timer.Stop()
+        pending, self.pending_comments = self.pending_comments, {}
+        
+        for (kind, key), text in pending.items():
+            if kind == 'line':
+                self.journal.append('line', wavenumber=float(key), column='comments', value=text)
+            else:
+                self.journal.append('lev_comment', designation=key, comments=text)
              
     def on_incorr_assign_tag(self, event): 
         """Updates the main df with the user selected tag."""
-        selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']         
-        line_tags = self.get_df_cell(selected_wn, 'line_tags')
-        line_tags['incorr_assign'] = self.incorr_assign_chkbox.GetValue()
-        self.update_df_cell(selected_wn, 'line_tags', line_tags)
+        self.tag_selected_lines(INCORR_ASSIGN, self.incorr_assign_chkbox.GetValue())
 
     def on_ringing_tag(self, event):   
         """Updates the main df with the user selected tag."""
-        selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']         
-        line_tags = self.get_df_cell(selected_wn, 'line_tags')
-        line_tags['ringing'] = self.ringing_chkbox.GetValue()
-        self.update_df_cell(selected_wn, 'line_tags', line_tags)
+        self.tag_selected_lines(RINGING, self.ringing_chkbox.GetValue())
 
     def on_noise_tag(self, event): 
         """Updates the main df with the user selected tag.""" 
-        selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']         
-        line_tags = self.get_df_cell(selected_wn, 'line_tags')
-        line_tags['noise'] = self.noise_chkbox.GetValue()
-        self.update_df_cell(selected_wn, 'line_tags', line_tags)
+        self.tag_selected_lines(NOISE, self.noise_chkbox.GetValue())
 
     def on_blend_tag(self, event):  
         """Updates the main df with the user selected tag."""
-        selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']         
-        line_tags = self.get_df_cell(selected_wn, 'line_tags')
-        line_tags['blend'] = self.blend_chkbox.GetValue()
-        self.update_df_cell(selected_wn, 'line_tags', line_tags)
+        self.tag_selected_lines(BLEND, self.blend_chkbox.GetValue())
 
     def on_user_unc_tag(self, event):
-        """Updates the main df with the user selected tag and its uncertainty."""
-        selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']         
-        line_tags = self.get_df_cell(selected_wn, 'line_tags')
-        
+        """Updates the main df with the user selected tag and its uncertainty, for all the selected lines."""
         if self.user_unc_chkbox.GetValue():
             user_unc = self.user_unc_txtctrl.GetLineText(0)
             
             if self.is_float(user_unc) and float(user_unc) > 0.0 and float(user_unc) < 10.0:
-                line_tags['user_unc'] = float(user_unc)
+                user_unc = float(user_unc)
             else:
                 wx.MessageBox('User uncertainty must be a number between 0.0 and 9.9999', 'Incorrect Uncertainty', 
                       wx.OK | wx.ICON_EXCLAMATION)
@@ -1126,9 +921,27 @@ class MyFrame(mainWindow):
                 self.user_unc_txtctrl.SetValue('')
                 return            
         else:
-            line_tags['user_unc'] = False
-        
-        self.update_df_cell(selected_wn, 'line_tags', line_tags)
+            user_unc = np.nan
+        
+        self.update_df_cells(self.selected_lopt_wavenumbers(), 'user_unc', user_unc)
+        
+    def tag_selected_lines(self, tag, value):
+        """Sets or clears a tag for all the lines selected in the LOPT GroupListView, with a single write to self.df."""
+        wavenumbers = self.selected_lopt_wavenumbers()
+        positions, found = self.line_positions(wavenumbers)
+        tags = set_tags(self.df['line_tags'].values[positions], tag, value)
+        self.update_df_cells(wavenumbers[found], 'line_tags', tags)
+        
+    def selected_lopt_wavenumbers(self):
+        """Returns an array of the wavenumbers of the lines selected in the LOPT GroupListView. Virtual lines, which
+        are not in the linelist, are left out."""
+        wavenumbers = np.array([x['wavenumber'] for x in self.lopt_lev_ojlv.GetSelectedObjects()], dtype=float)
+        return wavenumbers[~np.isnan(wavenumbers)]
+    
+    def focused_lopt_wavenumber(self):
+        """Returns the wavenumber of the line with the focus in the LOPT GroupListView, which is the line shown in the
+        LOPT line panel. Raises TypeError if a group header or blank row has the focus."""
+        return self.lopt_lev_ojlv.GetObjectAt(self.lopt_lev_ojlv.GetFocusedRow())['wavenumber']
         
     def on_lopt_trans_checked(self, event): 
         """Updates the main df with the user selected line transition."""
@@ -1144,14 +957,12 @@ class MyFrame(mainWindow):
                 if i != line_index:
                     self.lopt_line_listctrl.CheckItem(i, False)
                     
-        selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']       
-        self.update_df_cell(selected_wn, 'user_desig', user_desig)
+        self.update_df_cell(self.focused_lopt_wavenumber(), 'user_desig', user_desig)
         
 
     def on_lopt_trans_unchecked(self, event):
         """Updates the main df with the user selected tag."""
-        selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']       
-        self.update_df_cell(selected_wn, 'user_desig', '')
+        self.update_df_cell(self.focused_lopt_wavenumber(), 'user_desig', '')
 
     def on_partial_strans(self, event):
         """Runs STRANS only for the main element. Could save user time for large numbers of impurity files, that do
@@ -1181,6 +992,12 @@ class MyFrame(mainWindow):
         
             if wx.MessageBox(message, title, wx.YES_NO | wx.NO_DEFAULT | wx.ICON_EXCLAMATION) == wx.YES:                  
                 self.strans_levs = [x for x in self.strans_levs if x not in selected_levs]            
+                
+                if self.level_labels is not None:
+                    for lev in selected_levs:
+                        self.level_labels.Remove(lev['label'])
+                        
+                self.journal_strans_levs()
                 self.display_strans_levs()
             else:
                 return
@@ -1188,12 +1005,34 @@ class MyFrame(mainWindow):
     def on_strans_add(self, event):  
         """Add a blank line to the STRANS input levels and display it."""
         self.strans_levs.insert(0, {'label': '', 'j':0.0 , 'energy':0.0 , 'parity':0})  # inserts blank line at head of the table
+        self.journal_strans_levs()
         self.display_strans_levs()
         
     def on_strans_save(self, event):  
         print("Event handler 'on_strans_save' not implemented!")
         event.Skip()
         
+    def make_level_label_editor(self, olv, row_index, column_index):
+        """Cell editor for level labels. Completes the label being typed from the labels of all known levels."""
+        return MakeAutoCompleteTextBox(olv, column_index, completionIndex=self.get_level_labels())
+    
+    def get_level_labels(self):
+        """Returns the CompletionIndex of the labels of the STRANS levels and of the levels of the other elements in
+        the project. It is built the first time it is needed and kept up to date as the user edits levels."""
+        if self.level_labels is None:
+            labels = [x['label'] for x in self.strans_levs]
+            
+            for other_lev in self.other_lev_list:
+                try:
+                    element_name, level_file = other_lev.split(',')
+                    labels.extend(pd.read_csv(level_file, usecols=['label'])['label'].astype(str))
+                except (ValueError, OSError):  # blank entry or missing level file
+                    continue
+                
+            self.level_labels = CompletionIndex(labels)
+            
+        return self.level_labels
+        
     def on_start_strans_lev_edit(self, event):
         """Triggers when a user double clicks a cell. Keeps previous cell value so dfs can be updated."""
         self.edited_cell_prev_value = event.cellValue    
@@ -1203,14 +1042,15 @@ class MyFrame(mainWindow):
         the designation of a level or creates a new row if a new level is added."""
         if not self.is_float(self.edited_cell_prev_value):  # is the level designation (as all other values are floats)
             new_desig = self.strans_lev_ojlv.GetLastEditedObject()['label'] 
-            
-            try:  # this will work if the level being edited is in self.lopt_lev_comments
-                selected_line_index = self.lopt_lev_comments.loc[self.lopt_lev_comments['Designation'] == self.edited_cell_prev_value].index.values[0]
-                self.lopt_lev_comments.at[selected_line_index, 'Designation'] = new_desig # just updates a single value
-            except IndexError:  # a newly added level has been edited by the user
-                self.lopt_lev_comments = self.lopt_lev_comments.append({'Designation': new_desig, 'Comments': ''}, ignore_index=True)
+            self.rename_lev_comment(self.edited_cell_prev_value, new_desig)
         
         self.strans_levs = self.strans_lev_ojlv.GetObjects()  # updates the edited cells to strans_levs
+        
+        key = self.strans_lev_ojlv.columns[event.subItemIndex].valueGetter
+        if key == 'label' and self.level_labels is not None:
+            self.level_labels.Replace(self.edited_cell_prev_value, event.rowModel['label'])
+        lev_index = next(i for i, lev in enumerate(self.strans_levs) if lev is event.rowModel)
+        self.journal.append('lev_set', index=lev_index, key=key, value=event.rowModel[key])
             
     def on_export_matched_linelist(self, event):
         """Export matched linelist."""
@@ -1225,10 +1065,14 @@ class MyFrame(mainWindow):
         if self.project_loaded:
             save_dlg = wx.MessageBox(f'Do you want to save changes to {self.project_title}', 'Save Changes?', 
                                      wx.YES_NO | wx.CANCEL | wx.CANCEL_DEFAULT | wx.ICON_INFORMATION)
-            if save_dlg == wx.ID_YES:
+            if save_dlg == wx.YES:
                 self.save_project()
-            elif save_dlg == wx.ID_CANCEL:
+            elif save_dlg == wx.CANCEL:
                 return
+            elif save_dlg == wx.NO:
+                self.pending_comments = {}
+                self.journal.rollback()  # discard the unsaved edits
+                self.autosave.discard()
         
         with wx.FileDialog(self, "Open TAME project file", wildcard="project files (*.ini)|*.ini",
                        style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
@@ -1262,19 +1106,26 @@ class MyFrame(mainWindow):
             if project_title.split('.')[-1] != 'ini':   #if user types new filename in dialog
                 sa_ini_file = project_file + '.ini'
                 
+        self.compact_journal()  # so that the copied project files include all user edits
+                
         sa_project_config_file =  sa_folder + sa_ini_file      
         sa_strans_lev_file = sa_folder + project_file + '_input.lev'
         sa_strans_lin_file = sa_folder + project_file + '_input.lin'
-        sa_main_df_file = sa_folder + project_file + '.pkl'
-        sa_plot_df_file = sa_folder + project_file + '_plot.pkl'
+        sa_plot_df_file = sa_folder + project_file + '_plot.spectra'
         sa_lev_comments_file = sa_folder + project_file + '_lev_comments.pkl'
         
         copy(self.project_config_file, sa_project_config_file)
         copy(self.strans_lev_file, sa_strans_lev_file)
         copy(self.strans_lin_file, sa_strans_lin_file)
-        copy(self.df_file, sa_main_df_file)
-        copy(self.plot_df_file, sa_plot_df_file)
-        copy(self.lopt_lev_comments_file, sa_lev_comments_file)
+        copy_spectrum_store(spectrum_store_path(self.plot_df_file), sa_plot_df_file)
+        
+        if self.project_db:  # lines, levels and level comments are all in the one file
+            sa_main_df_file = sa_folder + project_file + '.db'
+            self.project_db.copy_to(sa_main_df_file)
+        else:
+            sa_main_df_file = sa_folder + project_file + '.store'
+            copy_store(store_path(self.df_file), sa_main_df_file)
+            copy(self.lopt_lev_comments_file, sa_lev_comments_file)
         
         self.project_config.set('files', 'strans_lev_file', sa_strans_lev_file)
         self.project_config.set('files', 'strans_lin_file',sa_strans_lin_file)
@@ -1295,41 +1146,20 @@ class MyFrame(mainWindow):
     
     def on_lopt(self, event):
         """Create/update all neccessary files for LOPT input and then call LOPT"""        
-        if self.lopt_fixed_levels == [''] or self.lopt_fixed_levels == []:  # no fixed levels have been selected
+        if self.lopt_fixed_levels == [''] or self.lopt_fixed_levels == [] or self.unknown_fixed_levels():  # no fixed levels have been selected
             if not self.set_fixed_levels():  # if cancel button pressed on fixed level dialog
                 return
         
-        self.frame_statusbar.SetStatusText('Writing LOPT input files...')
-        
-        if self.write_lopt_inp():  # if there are lines in the strans linelist
-            self.write_lopt_par()
-            try:
-                self.write_lopt_fixed()   
-            except:
-                self.set_fixed_levels()
-                self.write_lopt_fixed()
-                
-            self.frame_statusbar.SetStatusText('Running LOPT...')   
+        try:
+            rss, tot_time = self.run_lopt()
+        except ProjectError as error:
+            self.frame_statusbar.SetStatusText('LOPT error') 
+            self.show_project_error(error)
+            return
             
-            try:
-                p = subprocess.run(['java', '-jar', 'Lopt.jar', self.lopt_par_file.split('/')[-1]], cwd='lopt/', capture_output=True, text=True).stdout.split('\n')  # run LOPT and get output as a list of lines
-                rss = [x for x in p if 'RSS' in x]  # gives the RSS\degrees_of_freedom line
-                tot_time = [x for x in p if 'Total time' in x]  # gives the total time line
-                self.frame_statusbar.SetStatusText(f'LOPT ran successfully:  {rss[0]}. {tot_time[0]}.')  
-                
-                self.get_lopt_output()
-                self.main_panel.ChangeSelection(1)  # changes the notebook tab to LOPT
-            except FileNotFoundError as fnf:                
-                if 'java' in str(fnf):
-                    self.frame_statusbar.SetStatusText('LOPT error') 
-                    wx.MessageBox('Java Runtime Environment (JRE) is not installed on this machine. \n\nPlease install and restart Tame.', 'Missing Java runtime', 
-                          wx.OK | wx.ICON_EXCLAMATION)
-                    
-            # except:  # XXX this needs work - put it in a scrolled dialog
-            #     wx.MessageBox('\n'.join(p), 'LOPT Issue', 
-            #               wx.OK | wx.ICON_EXCLAMATION)
-        else:
-            self.frame_statusbar.SetStatusText('Run Line Matching first') 
+        self.frame_statusbar.SetStatusText(f'LOPT ran successfully:  {rss}. {tot_time}.')  
+        self.display_lopt_output()
+        self.main_panel.ChangeSelection(1)  # changes the notebook tab to LOPT
                         
     def on_Save(self, event):  
         """Saves all user changes for the project."""
@@ -1343,8 +1173,14 @@ class MyFrame(mainWindow):
                                      wx.YES_NO | wx.CANCEL | wx.CANCEL_DEFAULT | wx.ICON_INFORMATION)
             if save_dlg == wx.YES:
                 self.save_project()
+                self.journal.close()  # waits for the save to finish
+                self.autosave.close()
                 self.Destroy()
             elif save_dlg == wx.NO:
+                self.pending_comments = {}
+                self.journal.rollback()  # discard the unsaved edits
+                self.journal.close()
+                self.autosave.discard()
                 self.Destroy() 
             else:
                 return   
@@ -1353,8 +1189,8 @@ class MyFrame(mainWindow):
     def on_click_lopt_levs(self, event):  
         """Event for user selecting a line,level or blank line in the LOPT GroupListView."""
         try:
-            selected_wn = self.lopt_lev_ojlv.GetSelectedObject()['wavenumber']
-            selected_line = self.df.loc[self.df['wavenumber'] == selected_wn]              
+            selected_wn = self.focused_lopt_wavenumber()
+            selected_line = self.df.loc[[self.line_index(selected_wn)]]              
             self.display_lopt_line(selected_line)
 
         except TypeError: # group header or blank row selected
@@ -1362,7 +1198,7 @@ class MyFrame(mainWindow):
             
             if not next_row == None:  # group header selected and not the blank line above it         
                 next_row_lev = next_row['main_level']
-                selected_lev = self.lopt_levs.loc[self.lopt_levs['Energy'] == next_row_lev]                
+                selected_lev = self.lopt_levs.iloc[[self.lopt_lev_rows[next_row_lev]]]                
                 self.display_lopt_lev(selected_lev)    
             else:
                 self.lopt_level_panel.Hide()
@@ -1384,13 +1220,24 @@ class MyFrame(mainWindow):
         self.search_listview(event, self.strans_lev_ojlv)
         
     def on_strans_line_search(self, event): 
-        """User has entered text to search the STRANS lines for."""
-        search_bar = event.GetEventObject()
-        try:
-            self.search_listview(event, self.strans_lines_ojlv)
+        """User has entered text to search the STRANS lines for. Numbers are looked for in the wavenumber column, e.g.
+        15234.1 or 15234.1 +- 0.05, and any text in the main and other element transitions."""
+        self.find_strans_line(event.GetEventObject(), include_current=True)
+        
+    def on_strans_line_search_next(self, event):
+        """User has pressed enter in the line search. Goes to the next matching line, or the previous one if shift is
+        held down."""
+        self.find_strans_line(event.GetEventObject(), forward=not wx.GetKeyState(wx.WXK_SHIFT))
+        
+    def find_strans_line(self, search_bar, forward=True, include_current=False):
+        """Selects the next line in strans_lines_ojlv that matches the text of the search bar. The background of the
+        search bar turns red if no line matches."""
+        search_str = search_bar.GetValue().strip()
+        columns = [x for x in self.strans_lines_ojlv.columns if x.valueGetter in ('wavenumber', 'main_desig', 'other_desig')]
+        
+        if not search_str or self.strans_lines_ojlv.FindNext(columns, search_str, forward, include_current):
             search_bar.SetBackgroundColour(wx.WHITE)
-        except:
-            search_bar.Clear()
+        else:
             search_bar.SetBackgroundColour(wx.RED)
             
     def on_New(self, event):  
@@ -1405,8 +1252,11 @@ class MyFrame(mainWindow):
         
         self.new_config.set('files', 'strans_lev_file', self.new_proj.main_element_lev_file)
         self.new_config.set('files', 'strans_lin_file', self.new_proj.linelist_file)
-        self.new_config.set('files', 'df_file', self.new_proj.df_file)
-        self.plot_df_file = self.new_proj.project_file_name + '_plot.pkl'
+        if self.new_config.getboolean('files', 'project_database', fallback=False):  # single file SQLite project
+            self.new_config.set('files', 'df_file', os.path.splitext(self.new_proj.df_file)[0] + '.db')
+        else:
+            self.new_config.set('files', 'df_file', self.new_proj.df_file)
+        self.plot_df_file = self.new_proj.project_file_name + '_plot.spectra'
         self.new_config.set('files', 'plot_file', self.plot_df_file)              
         self.new_config.set('files', 'lopt_lev_comments_file', self.new_proj.project_file_name + '_lev_comments.pkl')
        
@@ -1425,14 +1275,14 @@ class MyFrame(mainWindow):
 
         self.frame_statusbar.SetStatusText('Writing project configuration')  
         
+        spectra = SpectrumStore(self.plot_df_file)
+        spectra.add_files([])  # creates the store even if the user did not select any plot files
+        plot_dtype = np.float32 if self.new_config.getboolean('files', 'plot_float32', fallback=False) else np.float64
+        self.frame_statusbar.SetStatusText('Creating line plot database')
+        
         if self.new_proj.plot_files:  # if plot files have been selected by the user
-            self.plot_df = pd.concat([pd.read_csv(f, skiprows=4, delim_whitespace=True, names=['wavenumber', f'{f.split("/")[-1].split(".")[0]}']) for f in self.new_proj.plot_files], ignore_index=True)
-            self.frame_statusbar.SetStatusText('Creating line plot database')
-
-        else:
-            self.plot_df = pd.DataFrame(columns=['wavenumber', 'file'])  # blank dataframe
-            
-        self.plot_df.to_pickle(self.plot_df_file) 
+            spectra.add_asc_files(self.new_proj.plot_files, plot_dtype, progress=self.on_spectrum_progress)
+                
         self.frame_statusbar.SetStatusText('Saving line plot database to file')
         
         self.project_config_file = self.new_config_file
@@ -1451,6 +1301,11 @@ class MyFrame(mainWindow):
         #     print('uh oh')
         #     event.Skip()
   
+    def on_spectrum_progress(self, num_done, num_files, name):
+        """Shows the progress of reading the plot files of a new project in the status bar."""
+        self.frame_statusbar.SetStatusText(f'Creating line plot database: read {name} ({num_done}/{num_files})')
+        self.frame_statusbar.Update()  # the event loop is not running while the files are read
+  
     def on_about(self, event):  
         """Displays the about dialog."""
         description = """
@@ -1486,35 +1341,21 @@ class fixedLevels(fixedLevelsDialog):
         """Initilise and set the checkboxes of the current fixed levels."""
         fixedLevelsDialog.__init__(self, *args, **kwds)  
         strans_levs = self.GetParent().strans_levs
-        self.fixed_levels = [x for x in self.GetParent().lopt_fixed_levels if x != '']
-        self.fixed_levels = [x['label'] for x in strans_levs if x['label'] in self.fixed_levels]  # needed in case a user changes the label of a fixed level.
-        self.fixed_level_lc.EnableCheckBoxes(True)
-        self.fixed_level_lc.DeleteAllItems()
-                
-        for level in strans_levs:
-            self.fixed_level_lc.Append([level['label'], f"{level['energy']:.4f}"])
-
-        ticked_lev_idx = [strans_levs.index(x) for x in strans_levs if x['label'] in self.fixed_levels]
-        with wx.EventBlocker(self):  # stops item checked event from firing
-            for idx in ticked_lev_idx:
-                self.fixed_level_lc.CheckItem(idx)    
+        fixed_levels = set(self.GetParent().lopt_fixed_levels)  # by label, so renamed levels are no longer fixed
         
+        self.fixed_level_lc.SetRows([[x['label'] for x in strans_levs], [f"{x['energy']:.4f}" for x in strans_levs]],
+                                    checked=[x['label'] in fixed_levels for x in strans_levs])
         
-            
-    def on_fixed_lev_checked(self, event):
-        """User has checked the checkbox of a level. Update fixed_levels"""
-        level = self.fixed_level_lc.GetItem(event.GetIndex(), 0).GetText()
-        self.fixed_levels.append(level)
-               
-    def on_fixed_lev_unchecked(self, event):
-        """User has unhecked the checkbox of a level. Update fixed_levels"""
-        level = self.fixed_level_lc.GetItem(event.GetIndex(), 0).GetText()
-        self.fixed_levels = [x for x in self.fixed_levels if x != level]
+    @property
+    def fixed_levels(self):
+        """The labels of the checked levels"""
+        labels = self.fixed_level_lc.columnValues[0]
+        return [labels[i] for i in self.fixed_level_lc.GetCheckedIndexes()]
     
     def on_fixed_lev_ok(self, event):
         """User has clicked OK button. Check that at least one level has been selected to be fixed."""
                 
-        if self.fixed_levels == []:  # no fixed level(s) selected
+        if not self.fixed_level_lc.GetChecked().any():  # no fixed level(s) selected
             wx.MessageBox('At least one level must be fixed.', 'Fixed Level Error', 
                           wx.OK | wx.ICON_EXCLAMATION)
         else:
@@ -1530,32 +1371,28 @@ class lostLines(lostLinesDialog):
         strans input levels file."""
         lostLinesDialog.__init__(self, *args, **kwds)  
         
-        self.lost_lines_lc.EnableCheckBoxes(True)
-        self.lost_lines_lc.DeleteAllItems()
-        self.checked_lines = []
-        
-        strans_levs = [x['label'] for x in self.GetParent().strans_levs]
-        lines = self.GetParent().df.loc[self.GetParent().df.user_desig.str.len() > 0 ].values.tolist()
+        strans_levs = {x['label'] for x in self.GetParent().strans_levs}
+        df = self.GetParent().df
+        lines = df.loc[df.user_desig.str.len() > 0, ['wavenumber', 'user_desig']]
         
+        wavenumbers = []
+        user_desig_strs = []
         
-        for line in lines:
-            wn = line[0]
-            user_desig = dict(line[8])
+        for wn, user_desig in zip(lines['wavenumber'].values, lines['user_desig'].values):
+            user_desig = dict(user_desig)
             
             if user_desig['element_name'] != self.GetParent().main_element_name:  
                 if user_desig['upper_level'] not in strans_levs or user_desig['lower_level'] not in strans_levs:
-                    user_desig_str = f"{user_desig['element_name']}: {user_desig['upper_level']} - {user_desig['lower_level']}" 
-                    self.lost_lines_lc.Append([wn, user_desig_str])
-        
-    def on_lost_lines_checked(self, event):
-        """User has checked the checkbox of a line. Update checked_lines"""
-        line = self.lost_lines_lc.GetItem(event.GetIndex(), 0).GetText()
-        self.checked_lines.append(line)
-               
-    def on_lost_lines_unchecked(self, event):
-        """User has unhecked the checkbox of a line. Update checked_lines"""
-        line = self.lost_lines_lc.GetItem(event.GetIndex(), 0).GetText()
-        self.checked_lines = [x for x in self.checked_lines if x != line]      
+                    wavenumbers.append(wn)
+                    user_desig_strs.append(f"{user_desig['element_name']}: {user_desig['upper_level']} - {user_desig['lower_level']}")
+                    
+        self.lost_lines_lc.SetRows([wavenumbers, user_desig_strs])
+        
+    @property
+    def checked_lines(self):
+        """The wavenumbers of the checked lines"""
+        wavenumbers = self.lost_lines_lc.columnValues[0]
+        return [wavenumbers[i] for i in self.lost_lines_lc.GetCheckedIndexes()]
     
     def on_lost_lines_ok(self, event):           
         self.EndModal(wx.ID_OK)
@@ -1631,7 +1468,7 @@ class newProject(newProjectDialog):
         self.project_name = self.project_name_tc.GetValue()
         self.main_element_name = self.element_name_tc.GetValue()
         self.project_file_name = self.project_path + self.project_name.replace(' ', '_')
-        self.df_file = self.project_file_name + '.pkl'
+        self.df_file = self.project_file_name + '.store'
         
         if not self.project_name or not self.main_element_name or not self.linelist_file:# or not self.plot_files:
             wx.MessageBox('Please fill in all fields before continuing', 'Missing Project Parameters', 
@@ -1687,6 +1524,7 @@ class LevhamsPopupMenu(wx.Menu):
         for level in self.parent.levhams_output_ojlv.GetSelectedObjects():
             if 'avg_energy' in level.keys():
                 self.parent.strans_levs.insert(0, {'label': '', 'j':0.0 , 'energy':level['avg_energy'] , 'parity':0})  # inserts blank line at head of the table
+                self.parent.journal_strans_levs()
                 self.parent.display_strans_levs()
                 self.parent.main_panel.ChangeSelection(0)
             
@@ -1721,22 +1559,12 @@ class preferenceDialog(propertiesDialog):
             self.lopt_plot_width.SetValue(f'{self.parent.strans_wn_discrim}')
          
         
-class KeyList(object):
-    """Key function for bisect search. This allows bisect to work on specific elements within lists of iterable objects"""
-    def __init__(self, l, key):
-        self.l = l
-        self.key = key
-    def __len__(self):
-        return len(self.l)
-    def __getitem__(self, index):
-        return self.key(self.l[index])
-
-
 class MyApp(wx.App):
     def OnInit(self):
         self.frame = MyFrame(None, wx.ID_ANY, "")
         # self.SetTopWindow(self.frame)
         self.frame.Show()
+        log.info(f'TAME window shown {time.perf_counter() - START_TIME:.2f} s after startup')
         return True
 
 
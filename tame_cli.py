@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+"""
+Command line interface to TAME. Runs line matching, LOPT, level prediction and exports on a project without the GUI,
+e.g. on a compute server or in a batch job:
+
+    python tame_cli.py match ni2.ini
+    python tame_cli.py lopt ni2.ini
+    python tame_cli.py levhams ni2.ini --levels '3d9 2D5' '3d9 2D3' --tol 0.005 -o predicted.csv
+    python tame_cli.py export ni2.ini matched ni2_matched.lin
+    python tame_cli.py export ni2.ini levels ni2.llf
+    python tame_cli.py batch projects.txt batch_output --workers 4
+"""
+
+import os
+import sys
+import logging
+import argparse
+import configparser
+import pandas as pd
+
+from lib.engine import Project, ProjectError, MAIN_CONFIG_FILE, LOPT_DIR
+from lib.linelist_export import EXPORT_FORMATS, available_formats
+from lib import batch as batch_runner
+
+log = logging.getLogger('tame')
+
+
+def match(project, args):
+    """Runs line matching and saves the project."""
+    project.match(full=not args.main_only)
+    project.save_project()
+
+    num_matched = (project.df.main_desig.str.len() > 0).sum()
+    log.info(f'{num_matched} of {len(project.df)} lines matched to {project.main_element_name} transitions')
+
+
+def lopt(project, args):
+    """Runs LOPT on the matched lines."""
+    if args.fixed_levels:
+        project.lopt_fixed_levels = args.fixed_levels
+        project.project_config.set('lopt', 'fixed_levels', ','.join(args.fixed_levels))
+        project.save_project_config()
+
+    rss, tot_time = project.run_lopt()
+    log.info(f'LOPT ran successfully:  {rss}. {tot_time}.')
+    log.info(f'{len(project.lopt_levs)} levels written to {project.lopt_lev_file}')
+
+
+def levhams(project, args):
+    """Runs LEVHAMS and writes the predicted levels with at least the given number of lines."""
+    if args.levels:
+        labels = set(args.levels)
+        levels = [x for x in project.strans_levs if x['label'] in labels]
+        unknown_labels = labels - {x['label'] for x in levels}
+
+        if unknown_labels:
+            raise ProjectError(f'Levels not in the STRANS input levels: {", ".join(sorted(unknown_labels))}')
+    else:
+        levels = project.strans_levs
+
+    pred_levels = [x for x in project.predict_levels(levels, args.tol, not args.unassigned_only, args.wn_min, args.wn_max)
+                   if len(x) >= args.min_matches]
+    rows = []
+
+    for i, level in enumerate(pred_levels):
+        avg_energy = sum(x['pred_energy'] for x in level) / len(level)
+        sep = level[-1]['pred_energy'] - level[0]['pred_energy']  # the separation in the level (highest predicted energy minus the lowest)
+        rows += [dict(x, group=i, avg_energy=avg_energy, sep=sep) for x in level]
+        log.info(f'{avg_energy:15.4f} cm-1  {len(level):3d} lines  separation {sep:.4f}')
+
+    log.info(f'{len(pred_levels)} predicted levels found.')
+
+    if args.output:
+        columns = ['group', 'avg_energy', 'sep', 'pred_energy', 'level', 'j', 'energy', 'wavenumber', 'peak', 'eq width', 'unc']
+        pd.DataFrame(rows, columns=columns).to_csv(args.output, index=False)
+
+
+def export(project, args):
+    """Exports the complete or matched linelist, or the LOPT level report."""
+    if args.what == 'levels':
+        project.write_lopt_levels(args.output)
+        log.info(f'LOPT levels exported to {args.output}')
+        return
+
+    fmt = args.format or next((fmt for fmt, (wildcard, ext) in EXPORT_FORMATS.items()
+                               if os.path.splitext(args.output)[1] == ext), 'csv')
+    num_lines = project.write_linelist(args.output, fmt, full_list=args.what == 'complete')
+    log.info(f'{num_lines} lines exported to {args.output}')
+
+
+def batch(args):
+    """Runs match -> LOPT -> export for every project in a manifest. Returns the exit status."""
+    project_files = batch_runner.read_manifest(args.manifest)
+
+    def progress(num_done, num_projects, result):
+        status = 'ok' if result['status'] == 'ok' else f'failed at {result["step"]}, see {result["log"]}'
+        log.info(f'[{num_done}/{num_projects}] {result["name"]}: {status}')
+
+    results = batch_runner.run_batch(project_files, args.output_dir, args.main_config, args.lopt_dir, lopt=not args.no_lopt,
+                                     fmt=args.format, max_workers=args.workers, progress=progress)
+    log.info(batch_runner.format_summary(results))
+    return 0 if all(x['status'] == 'ok' for x in results) else 1
+
+
+def make_parser():
+    """Returns the parser of the command line arguments."""
+    parser = argparse.ArgumentParser(description='Term Analysis Made Easy (TAME) without the GUI.')
+    parser.add_argument('--main-config', default=MAIN_CONFIG_FILE, help='main TAME config file (default: %(default)s)')
+    parser.add_argument('--lopt-dir', default=LOPT_DIR, help='directory with Lopt.jar and the LOPT files (default: %(default)s)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only report warnings and errors')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, run, help):
+        command = commands.add_parser(name, help=help)
+        command.add_argument('project', help='project .ini file')
+        command.set_defaults(run=run)
+        return command
+
+    command = add_command('match', match, 'run line matching (STRANS) and save the project')
+    command.add_argument('--main-only', action='store_true', help='only match the main element')
+
+    command = add_command('lopt', lopt, 'run LOPT on the matched lines')
+    command.add_argument('--fixed-levels', nargs='+', help='labels of the fixed levels, saved to the project')
+
+    command = add_command('levhams', levhams, 'predict levels (LEVHAMS)')
+    command.add_argument('--levels', nargs='+', help='labels of the known levels to use (default: all levels)')
+    command.add_argument('--tol', type=float, default=0.005, help='grouping tolerance in cm-1 (default: %(default)s)')
+    command.add_argument('--min-matches', type=int, default=5, help='fewest lines for a predicted level (default: %(default)s)')
+    command.add_argument('--unassigned-only', action='store_true', help='only use lines without a main element designation')
+    command.add_argument('--wn-min', type=float, default=0.0, help='lowest predicted energy (default: %(default)s)')
+    command.add_argument('--wn-max', type=float, default=float('inf'), help='highest predicted energy')
+    command.add_argument('-o', '--output', help='CSV file for the lines of the predicted levels')
+
+    command = add_command('export', export, 'export a linelist or the LOPT level report')
+    command.add_argument('what', choices=['complete', 'matched', 'levels'], help='what to export')
+    command.add_argument('output', help='output file')
+    command.add_argument('--format', choices=available_formats(), help='linelist format (default: from the file extension)')
+
+    command = commands.add_parser('batch', help='run match, LOPT and export for every project in a manifest')
+    command.add_argument('manifest', help='text file with one project .ini file per line')
+    command.add_argument('output_dir', help='directory for the exports, logs and summary.csv')
+    command.add_argument('--workers', type=int, help='number of worker processes (default: one per CPU)')
+    command.add_argument('--no-lopt', action='store_true', help='only match and export the matched linelists')
+    command.add_argument('--format', choices=available_formats(), default='csv', help='linelist format (default: %(default)s)')
+    command.set_defaults(run=batch)
+
+    return parser
+
+
+def main(argv=None):
+    """Runs a TAME command. Returns the exit status."""
+    args = make_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format='%(message)s', stream=sys.stdout)
+
+    if args.command == 'batch':
+        return args.run(args)
+
+    try:
+        project = Project.open(args.project, args.main_config, args.lopt_dir)
+    except (OSError, configparser.Error) as error:
+        print(f'Could not load project {args.project}: {error}', file=sys.stderr)
+        return 1
+
+    try:
+        args.run(project, args)
+    except ProjectError as error:
+        print(f'{error.title}: {error}', file=sys.stderr)
+        return 1
+    finally:
+        project.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
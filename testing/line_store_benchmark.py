@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Times opening a large project: loads a synthetic linelist from the line store and from a pickle, and checks the line
+store load takes less than a second.
+
+Run from the TAME directory:
+    python testing/line_store_benchmark.py [num_lines]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.line_store import LineStore
+
+NUM_LINES = 1000000
+MAX_LOAD_TIME = 1.0  # seconds
+
+
+def make_df(num_lines, seed=0):
+    """Returns a DataFrame laid out like a TAME project df, with 40 % of the lines matched to the main element, 20 % to
+    another element and a few percent with several designations."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'wavenumber': np.sort(rng.uniform(1e4, 5e4, num_lines)),
+                       'peak': rng.uniform(1, 1e3, num_lines),
+                       'width': rng.uniform(1, 300, num_lines),
+                       'eq width': rng.uniform(1, 1e4, num_lines),
+                       'tags': rng.choice(['G', 'L', 'P'], num_lines),
+                       'unc': rng.uniform(0, 0.01, num_lines)})
+
+    for column, element, fraction in (('main_desig', 'Ni2', 0.4), ('other_desig', 'Fe1', 0.2)):
+        desigs = [[] for x in range(num_lines)]
+        for i in np.flatnonzero(rng.random(num_lines) < fraction).tolist():
+            for j in range(1 + (i % 50 == 0)):
+                desigs[i].append({'element_name': element, 'upper_level': f'U{(i + j) % 997}',
+                                  'lower_level': f'L{(i + j) % 991}'})
+        df[column] = desigs
+
+    df['user_desig'] = pd.Series('', index=df.index, dtype=object)
+    df['line_tags'] = np.zeros(num_lines, dtype=np.uint8)
+    df['comments'] = pd.Series('', index=df.index, dtype=object)
+    df['user_unc'] = np.nan
+    return df
+
+
+def best_time(func, repeat=3):
+    """Returns the shortest of repeat runs of func, in seconds."""
+    times = []
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+        del result
+
+    return min(times)
+
+
+if __name__ == '__main__':
+    num_lines = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_LINES
+    df = make_df(num_lines)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store_dir = os.path.join(temp_dir, 'lines.store')
+        pickle_file = os.path.join(temp_dir, 'lines.pkl')
+        LineStore(store_dir).save(df)
+        df.to_pickle(pickle_file)
+
+        loaded = LineStore(store_dir).load()
+        assert loaded.dtypes.equals(df.dtypes), 'dtypes differ after the round trip'
+        assert all(list(x) == y for x, y in zip(loaded['main_desig'].values, df['main_desig'].values))
+        del loaded
+
+        store_time = best_time(lambda: LineStore(store_dir).load())
+        pickle_time = best_time(lambda: pd.read_pickle(pickle_file))
+
+    print(f'{num_lines} lines: line store {store_time:.3f} s, pickle {pickle_time:.3f} s')
+
+    if store_time > MAX_LOAD_TIME:
+        sys.exit(f'Line store load took {store_time:.3f} s, more than {MAX_LOAD_TIME} s')